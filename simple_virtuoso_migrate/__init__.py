@@ -1,3 +1,4 @@
 from version import SIMPLE_VIRTUOSO_MIGRATE_VERSION
+from migrator import Migrator
 
-__all__ = ['cli', 'run']
+__all__ = ['cli', 'run', 'Migrator']
@@ -0,0 +1,48 @@
+import json
+import os
+import tempfile
+import time
+
+# a day
+CAPABILITIES_TTL = 24 * 60 * 60
+
+
+class CapabilityStore(object):
+    """ Keep what was learned about each Virtuoso server (server_root,
+    DirsAllowed, version, bulk loader) on disk, so it is asked again only
+    once the entry is older than the ttl (in seconds) """
+
+    def __init__(self, cache_dir, ttl=CAPABILITIES_TTL):
+        self._servers_dir = os.path.join(os.path.expanduser(cache_dir),
+                                         "servers")
+        self._ttl = ttl
+
+    def _server_file(self, host, port):
+        return os.path.join(self._servers_dir, "%s_%s.json" % (host, port))
+
+    def get(self, host, port):
+        """ Get the capabilities of a server, or None if they were never
+        stored or are expired """
+        file_name = self._server_file(host, port)
+        if not os.path.exists(file_name):
+            return None
+        f = open(file_name)
+        try:
+            entry = json.load(f)
+        except ValueError:
+            return None
+        finally:
+            f.close()
+        if time.time() - entry.get('checked', 0) > self._ttl:
+            return None
+        return entry.get('capabilities')
+
+    def put(self, host, port, capabilities):
+        if not os.path.exists(self._servers_dir):
+            os.makedirs(self._servers_dir)
+        # write and rename, so concurrent readers never see half an entry
+        fd, temp_name = tempfile.mkstemp(dir=self._servers_dir)
+        f = os.fdopen(fd, 'w')
+        json.dump({'checked': time.time(), 'capabilities': capabilities}, f)
+        f.close()
+        os.rename(temp_name, self._server_file(host, port))
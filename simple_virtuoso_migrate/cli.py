@@ -76,6 +76,153 @@ class CLI(object):
                 default=None,
                 help="Load TTL file"),
 
+        make_option("--compile",
+                action="store_true",
+                dest="compile",
+                default=False,
+                help="Compute and cache the deltas between consecutive git\
+                      tags, to be used by later migrations. Needs a cache dir."),
+
+        make_option("--compile-all-pairs",
+                action="store_true",
+                dest="compile_all_pairs",
+                default=False,
+                help="Used with --compile, cache the deltas between all pairs\
+                      of git tags instead of only the consecutive ones."),
+
+        make_option("--verify",
+                action="store_true",
+                dest="verify",
+                default=False,
+                help="Check whether the graph on the server still matches the\
+                      ontology version recorded on the migration graph."),
+
+        make_option("--reconcile",
+                action="store_true",
+                dest="reconcile",
+                default=False,
+                help="Make the migration from the graph as it is on the\
+                      server instead of from the recorded version."),
+
+        make_option("--export",
+                dest="export",
+                default=None,
+                metavar="DIR",
+                help="Write the graph on the server in TTL files in DIR."),
+
+        make_option("--export-compress",
+                action="store_true",
+                dest="export_compress",
+                default=False,
+                help="Used with --export, gzip the files."),
+
+        make_option("--skolemize",
+                action="store_true",
+                dest="skolemize",
+                default=False,
+                help="Replace the blank nodes of the ontology (and of the\
+                      files loaded with -a) by IRIs derived from their\
+                      content, so they are deleted without pattern matching."),
+
+        make_option("--skolemize-server",
+                action="store_true",
+                dest="skolemize_server",
+                default=False,
+                help="Replace the blank nodes of the graph on the server by\
+                      the IRIs --skolemize gives them (once, before using\
+                      --skolemize on a graph migrated without it)."),
+
+        make_option("--bulk",
+                action="store_true",
+                dest="bulk",
+                default=False,
+                help="Load and migrate without the transaction log (each\
+                      statement is committed on its own) and with a single\
+                      checkpoint at the end. Faster for big runs, but a\
+                      server crash before the checkpoint loses the changes."),
+
+        make_option("--load-include",
+                action="append",
+                dest="load_include",
+                default=None,
+                metavar="PATTERN",
+                help="Only load the files (found under the directory given\
+                      with -a) matching this glob pattern. Can be repeated."),
+
+        make_option("--load-exclude",
+                action="append",
+                dest="load_exclude",
+                default=None,
+                metavar="PATTERN",
+                help="Don't load the files matching this glob pattern. Can\
+                      be repeated."),
+
+        make_option("--load-graph",
+                action="append",
+                dest="load_graph",
+                default=None,
+                metavar="PATTERN=GRAPH",
+                help="Load the files matching this glob pattern into GRAPH\
+                      instead of the database graph (a file's .graph or its\
+                      directory's global.graph file can name it too). Can\
+                      be repeated."),
+
+        make_option("--load-parallel",
+                dest="load_parallel",
+                default=None,
+                metavar="N",
+                help="Load the files given with -a from N parallel TTLP\
+                      calls, splitting the big ones in chunks."),
+
+        make_option("--load-chunk-size",
+                dest="load_chunk_size",
+                default=None,
+                metavar="MB",
+                help="Used with --load-parallel, size of the chunks big\
+                      files are split in (default 256)."),
+
+        make_option("--replace",
+                action="store_true",
+                dest="replace",
+                default=False,
+                help="Replace the graph by the files given with -a: they\
+                      are loaded into a staging graph, which is then moved\
+                      to the graph in one statement."),
+
+        make_option("--validate",
+                action="store_true",
+                dest="validate",
+                default=False,
+                help="Check the syntax of all the files given with -a, in\
+                      parallel, before loading any of them."),
+
+        make_option("--target-latency",
+                dest="target_latency",
+                default=None,
+                metavar="SECONDS",
+                help="Execute the migration in batches, growing or shrinking\
+                      them to keep each batch under this latency."),
+
+        make_option("--max-statements-per-second",
+                dest="max_statements_per_second",
+                default=None,
+                help="Used with --target-latency, limit the rate of\
+                      executed statements."),
+
+        make_option("--watch",
+                action="store_true",
+                dest="watch",
+                default=False,
+                help="Used with -f, keep running and apply the changes of the\
+                      file to the graph every time it is saved."),
+
+        make_option("--serve",
+                dest="serve",
+                default=None,
+                metavar="[HOST:]PORT",
+                help="Keep running and serve plan/apply/status/verify\
+                      requests over HTTP (on 127.0.0.1 if no host is given)."),
+
         make_option("--color",
                 action="store_true",
                 dest="show_colors",
@@ -156,6 +303,12 @@ class CLI(object):
                 default=None,
                 help="Set the migration graph name."),
 
+        make_option("--cache-dir",
+                dest="cache_dir",
+                default=None,
+                help="Directory to keep cached data between executions\
+                      (e.g. the deltas between ontology versions)."),
+
         make_option("--run-after",
                 dest="run_after",
                 default=None,
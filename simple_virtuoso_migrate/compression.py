@@ -0,0 +1,79 @@
+import os
+import shutil
+
+# formats TTLP reads (N-Triples is a subset of turtle)
+RDF_EXTENSIONS = ('.ttl', '.nt')
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.xz')
+
+
+def compression(path):
+    """ Extension of the compression of a file, or None """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in COMPRESSED_EXTENSIONS:
+        return extension
+    return None
+
+
+def uncompressed_name(path):
+    """ Name of the file without its compression extension """
+    if compression(path):
+        return os.path.splitext(path)[0]
+    return path
+
+
+def is_rdf_file(path):
+    """ Whether it is a turtle or N-Triples file, compressed or not """
+    return uncompressed_name(path).lower().endswith(RDF_EXTENSIONS)
+
+
+def _lzma():
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            raise Exception("reading xz files needs the backports.lzma "
+                            "package")
+    return lzma
+
+
+def open_file(path):
+    """ Open a file for reading, decompressing it on the fly """
+    extension = compression(path)
+    if extension == '.gz':
+        import gzip
+        return gzip.open(path, 'rb')
+    if extension == '.bz2':
+        import bz2
+        return bz2.BZ2File(path, 'rb')
+    if extension == '.xz':
+        return _lzma().LZMAFile(path, 'rb')
+    return open(path, 'rb')
+
+
+def read_file(path):
+    """ Content of a file, compressed or not, with universal newlines """
+    f = open_file(path)
+    try:
+        content = f.read()
+    finally:
+        f.close()
+    return content.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def decompress(path, directory):
+    """ Write the file decompressed (streaming it) in the directory and
+    return the path of the copy """
+    decompressed = os.path.join(directory,
+                                os.path.basename(uncompressed_name(path)))
+    source = open_file(path)
+    try:
+        destination = open(decompressed, 'wb')
+        try:
+            shutil.copyfileobj(source, destination)
+        finally:
+            destination.close()
+    finally:
+        source.close()
+    return decompressed
@@ -1,5 +1,4 @@
 import os
-from git import Git, Repo, NoSuchPathError, InvalidGitRepositoryError
 
 
 class SimpleVirtuosoMigrate(object):
@@ -12,6 +11,7 @@ class SimpleVirtuosoMigrate(object):
         if self.all_migrations:
             return self.all_migrations
 
+        from git import Repo, NoSuchPathError, InvalidGitRepositoryError
         migrations = []
 
         try:
@@ -31,11 +31,42 @@ class SimpleVirtuosoMigrate(object):
         self.all_migrations = migrations
         return self.all_migrations
 
+    def _git(self):
+        from git import Git
+        return Git(self._migrations_dir)
+
     def check_if_version_exists(self, version):
+        if version in self.get_all_migrations():
+            return True
+        # the tags are kept once read, a tag made since then is looked for
+        self.all_migrations = None
         return version in self.get_all_migrations()
 
     def latest_version_available(self):
-        return Git(self._migrations_dir).execute(["git",
-                                                  "describe",
-                                                  "--abbrev=0",
-                                                  "--tags"])
+        return self._git().execute(["git",
+                                    "describe",
+                                    "--abbrev=0",
+                                    "--tags"])
+
+    def get_ordered_migrations(self):
+        """ Get the git tags ordered by creation date """
+        output = self._git().execute(["git",
+                                      "for-each-ref",
+                                      "--sort=creatordate",
+                                      "--format=%(refname:short)",
+                                      "refs/tags"])
+        return output.splitlines()
+
+    def get_migrations_path(self, current_version, destination_version):
+        """ Get the consecutive tags from current_version to
+        destination_version (both included), going backwards when
+        destination_version is older """
+        migrations = self.get_ordered_migrations()
+        if current_version not in migrations or\
+                destination_version not in migrations:
+            return None
+        current = migrations.index(current_version)
+        destination = migrations.index(destination_version)
+        if current <= destination:
+            return migrations[current:destination + 1]
+        return list(reversed(migrations[destination:current + 1]))
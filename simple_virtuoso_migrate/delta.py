@@ -0,0 +1,163 @@
+import codecs
+import os
+import tempfile
+
+from virtuoso import Virtuoso
+
+REMOVED_MARKER = "# removed"
+# deltas are kept under a directory of this version: bump it whenever what a
+# delta holds for the same ontologies changes (e.g. how literals are
+# normalized), so deltas cached before are not reused
+# 1: literals normalized the way Virtuoso stores them
+DELTA_FORMAT = 1
+
+
+def compute_delta(job):
+    """ Compute the delta of a (key, current ontology, destination ontology)
+    job, with the skolem base as an optional fourth item. Being a module
+    function it can run in a process pool """
+    key, current_ontology, destination_ontology = job[:3]
+    skolem_base = job[3] if len(job) > 3 else None
+    return key, Delta.from_graphs(
+                    Virtuoso._parse_ontology(current_ontology, skolem_base),
+                    Virtuoso._parse_ontology(destination_ontology, skolem_base))
+
+
+class Delta(object):
+    """ Triples added and removed between two versions of the ontology """
+
+    def __init__(self, added=None, removed=None):
+        self.added = set(added or [])
+        self.removed = set(removed or [])
+
+    def __len__(self):
+        return len(self.added) + len(self.removed)
+
+    @staticmethod
+    def from_graphs(current_graph, destination_graph):
+        current = set(current_graph)
+        destination = set(destination_graph)
+        return Delta(destination - current, current - destination)
+
+    def compose(self, other):
+        """ Delta of applying this delta and then the other one. A triple
+        added and later removed (or the opposite) cancels out """
+        return Delta((self.added - other.removed) | (other.added - self.removed),
+                     (self.removed - other.added) | (other.removed - self.added))
+
+    def reverse(self):
+        return Delta(self.removed, self.added)
+
+    def has_blank_nodes(self):
+        from rdflib.term import BNode
+        for triple in self.added | self.removed:
+            for term in triple:
+                if isinstance(term, BNode):
+                    return True
+        return False
+
+    def graphs(self):
+        """ Return (removed, added) graphs, which can be given to
+        Virtuoso.get_sparql as current and destination ontologies """
+        from rdflib.graph import ConjunctiveGraph
+        removed_graph = ConjunctiveGraph()
+        added_graph = ConjunctiveGraph()
+        for triple in self.removed:
+            removed_graph.add(triple)
+        for triple in self.added:
+            added_graph.add(triple)
+        return removed_graph, added_graph
+
+    def serialize(self):
+        return u"%s\n%s\n%s" % (Delta._to_nt(self.added), REMOVED_MARKER,
+                                Delta._to_nt(self.removed))
+
+    @staticmethod
+    def parse(content):
+        added, _, removed = content.partition("\n%s\n" % REMOVED_MARKER)
+        return Delta(Delta._from_nt(added), Delta._from_nt(removed))
+
+    @staticmethod
+    def _to_nt(triples):
+        from rdflib.graph import Graph
+        graph = Graph()
+        for triple in triples:
+            graph.add(triple)
+        return graph.serialize(format='nt').decode('utf-8').strip()
+
+    @staticmethod
+    def _from_nt(content):
+        from rdflib.graph import Graph
+        graph = Graph()
+        if content.strip():
+            graph.parse(data=content.encode('utf-8') + '\n', format='nt')
+        return set(graph)
+
+
+class DeltaStore(object):
+    """ Keep the deltas between ontology versions on disk. Versions are
+    identified by the git object id of the ontology, so a moved tag never
+    reuses a stale delta, and deltas of another DELTA_FORMAT are ignored """
+
+    def __init__(self, cache_dir, name="deltas"):
+        self._deltas_dir = os.path.join(os.path.expanduser(cache_dir), name,
+                                        "v%d" % DELTA_FORMAT)
+
+    def _delta_file(self, current_id, destination_id):
+        return os.path.join(self._deltas_dir, "%s-%s.nt" % (current_id,
+                                                            destination_id))
+
+    def has(self, current_id, destination_id):
+        return current_id == destination_id or\
+            os.path.exists(self._delta_file(current_id, destination_id)) or\
+            os.path.exists(self._delta_file(destination_id, current_id))
+
+    def get(self, current_id, destination_id):
+        """ Get the delta between two ontology ids. A stored delta of the
+        opposite direction is reversed; returns None when there is none """
+        if current_id == destination_id:
+            return Delta()
+        file_name = self._delta_file(current_id, destination_id)
+        if os.path.exists(file_name):
+            return Delta.parse(DeltaStore._read(file_name))
+        file_name = self._delta_file(destination_id, current_id)
+        if os.path.exists(file_name):
+            return Delta.parse(DeltaStore._read(file_name)).reverse()
+        return None
+
+    def put(self, current_id, destination_id, delta):
+        """ Store a delta. Deltas touching blank nodes can't be composed
+        (their ids change on every parse) so they are not stored """
+        if current_id == destination_id or delta.has_blank_nodes():
+            return False
+        if not os.path.exists(self._deltas_dir):
+            os.makedirs(self._deltas_dir)
+        # write and rename, so concurrent readers never see half a delta
+        fd, temp_name = tempfile.mkstemp(dir=self._deltas_dir)
+        os.close(fd)
+        f = codecs.open(temp_name, 'w', encoding='utf-8')
+        f.write(delta.serialize())
+        f.close()
+        os.rename(temp_name, self._delta_file(current_id, destination_id))
+        return True
+
+    def compose(self, ids):
+        """ Get the net delta along a path of ontology ids (the ids of
+        consecutive tags), or None if a step of the path is not cached """
+        delta = self.get(ids[0], ids[-1])
+        if delta is not None:
+            return delta
+        delta = Delta()
+        for current_id, destination_id in zip(ids, ids[1:]):
+            step = self.get(current_id, destination_id)
+            if step is None:
+                return None
+            delta = delta.compose(step)
+        return delta
+
+    @staticmethod
+    def _read(file_name):
+        f = codecs.open(file_name, 'r', encoding='utf-8')
+        content = f.read()
+        f.close()
+        return content
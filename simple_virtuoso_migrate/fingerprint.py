@@ -0,0 +1,188 @@
+from collections import Counter
+from decimal import Decimal
+import hashlib
+
+XSD_BOOLEAN = u"http://www.w3.org/2001/XMLSchema#boolean"
+HEX_DIGITS = "0123456789abcdef"
+XSD_DECIMAL = "http://www.w3.org/2001/XMLSchema#decimal"
+
+# a node of the tree is a prefix of the md5 of the subjects under it, so
+# every level splits a node in 16 children
+LEAF_SIZE = 256
+MAX_DEPTH = 8
+
+# text hashed for each triple, built the same way on the server. Blank nodes
+# get a placeholder since their ids are not the same on both sides
+TRIPLE_TEXT = ('CONCAT(STR(?s), " ", STR(?p), " ", '
+               'IF(isBLANK(?o), "_:", STR(?o)))')
+
+# SPARQL has no order independent hash aggregate, so the first 15 hex
+# digits of the md5 of each triple are turned into a number (the value of a
+# hex digit is the length of what comes before it in "0123456789abcdef") and
+# summed. 15 digits still fit in a server side integer; the sum is made as a
+# decimal so it does not overflow, and both sides compare it modulo 2^60
+HASH_DIGITS = 15
+HASH_MODULUS = 16 ** HASH_DIGITS
+TRIPLE_HASH = "<%s>(%s)" % (
+        XSD_DECIMAL,
+        " + ".join(['%d * STRLEN(STRBEFORE("%s", SUBSTR(?t, %d, 1)))' %
+                    (16 ** (HASH_DIGITS - 1 - i), HEX_DIGITS, i + 1)
+                    for i in range(HASH_DIGITS)]))
+
+CHILDREN_QUERY = """\
+SELECT ?b (COUNT(*) AS ?n) (SUM(?v) AS ?h)
+FROM <%(graph)s>
+WHERE {
+?s ?p ?o .
+FILTER(isIRI(?s))
+BIND(MD5(STR(?s)) AS ?k)
+%(filter)s
+BIND(SUBSTR(?k, 1, %(depth)d) AS ?b)
+BIND(MD5(%(text)s) AS ?t)
+BIND(%(hash)s AS ?v)
+} GROUP BY ?b"""
+
+TRIPLES_QUERY = """\
+SELECT ?s ?p ?o
+FROM <%(graph)s>
+WHERE {
+?s ?p ?o .
+FILTER(isIRI(?s))
+%(filter)s
+}"""
+
+
+def triple_text(subject, predicate, object_):
+    from rdflib.term import BNode, Literal
+    if isinstance(object_, BNode):
+        object_text = u"_:"
+    elif isinstance(object_, Literal) and \
+            unicode(object_.datatype) == XSD_BOOLEAN:
+        # Virtuoso keeps booleans as integers
+        object_text = unicode(int(object_.toPython()))
+    else:
+        object_text = unicode(object_)
+    return u"%s %s %s" % (subject, predicate, object_text)
+
+
+def triple_hash(text):
+    return int(hashlib.md5(text.encode('utf-8')).hexdigest()[:HASH_DIGITS],
+               16)
+
+
+def subject_key(subject):
+    return hashlib.md5(unicode(subject).encode('utf-8')).hexdigest()
+
+
+def _prefix_filter(prefixes, variable):
+    prefixes = [prefix for prefix in prefixes if prefix]
+    if not prefixes:
+        return ""
+    return "FILTER(SUBSTR(%s, 1, %d) IN (%s))" % (
+                        variable,
+                        len(prefixes[0]),
+                        ", ".join(['"%s"' % prefix for prefix in prefixes]))
+
+
+class GraphFingerprint(object):
+    """ Merkle tree of a graph. Triples are grouped by the md5 of their
+    subject and each node of the tree (a prefix of that md5) is summarized by
+    the number of triples under it and the sum of their hashes (modulo
+    HASH_MODULUS). Triples with
+    a blank node as subject are not part of the tree """
+
+    def __init__(self, triples):
+        from rdflib.term import BNode
+        self._triples = {}
+        for subject, predicate, object_ in triples:
+            if isinstance(subject, BNode):
+                continue
+            self._triples.setdefault(subject_key(subject), []).append(
+                                triple_text(subject, predicate, object_))
+
+    def children(self, prefixes):
+        """ Summary (count, hash) of each child of the given nodes """
+        depth = len(prefixes[0]) + 1
+        prefixes = set(prefixes)
+        nodes = {}
+        for key, texts in self._triples.iteritems():
+            if key[:depth - 1] in prefixes:
+                count, hash_ = nodes.get(key[:depth], (0, 0))
+                nodes[key[:depth]] = (count + len(texts),
+                                      (hash_ + sum([triple_hash(text)
+                                                    for text in texts])) %
+                                      HASH_MODULUS)
+        return nodes
+
+    def triples(self, prefixes):
+        """ Text of the triples under the given nodes """
+        depth = len(prefixes[0])
+        prefixes = set(prefixes)
+        texts = []
+        for key, subject_texts in self._triples.iteritems():
+            if key[:depth] in prefixes:
+                texts.extend(subject_texts)
+        return texts
+
+    def compare(self, other, leaf_size=LEAF_SIZE, max_depth=MAX_DEPTH):
+        """ Walk down both trees, one level at a time, only into the nodes
+        whose summary differ. The triples of a differing node are compared
+        once it is small enough. Returns the triples missing in the other
+        fingerprint, the ones it has in excess and the number of calls made
+        to it """
+        missing = []
+        extra = []
+        calls = 0
+        parents = [""]
+        while parents:
+            local = self.children(parents)
+            remote = other.children(parents)
+            calls += 1
+            parents = []
+            leaves = {}
+            for node in set(local) | set(remote):
+                local_summary = local.get(node, (0, 0))
+                remote_summary = remote.get(node, (0, 0))
+                if local_summary == remote_summary:
+                    continue
+                if max(local_summary[0], remote_summary[0]) <= leaf_size or\
+                        len(node) >= max_depth:
+                    leaves.setdefault(len(node), []).append(node)
+                else:
+                    parents.append(node)
+            for nodes in leaves.values():
+                local_triples = Counter(self.triples(nodes))
+                remote_triples = Counter(other.triples(nodes))
+                calls += 1
+                missing.extend((local_triples - remote_triples).elements())
+                extra.extend((remote_triples - local_triples).elements())
+        return sorted(missing), sorted(extra), calls
+
+
+class LiveGraphFingerprint(object):
+    """ The same Merkle tree, computed by the Virtuoso server with one
+    aggregate query per level of the tree """
+
+    def __init__(self, virtuoso, graph):
+        self._virtuoso = virtuoso
+        self._graph = graph
+
+    def children(self, prefixes):
+        query = CHILDREN_QUERY % {'graph': self._graph,
+                                  'filter': _prefix_filter(prefixes, "?k"),
+                                  'depth': len(prefixes[0]) + 1,
+                                  'text': TRIPLE_TEXT,
+                                  'hash': TRIPLE_HASH}
+        return dict([(unicode(node),
+                      (int(count),
+                       long(Decimal(unicode(hash_))) % HASH_MODULUS))
+                     for node, count, hash_ in
+                     self._virtuoso.query_endpoint(query)])
+
+    def triples(self, prefixes):
+        query = TRIPLES_QUERY % {'graph': self._graph,
+                                 'filter': _prefix_filter(prefixes,
+                                                          "MD5(STR(?s))")}
+        return [triple_text(subject, predicate, object_)
+                for subject, predicate, object_ in
+                self._virtuoso.query_endpoint(query)]
@@ -3,10 +3,8 @@ import sys
 import tempfile
 import codecs
 
-from rdflib import Literal, URIRef
-
-XSD_NON_NEGATIVE_INTEGER = URIRef("http://www.w3.org/2001/XMLSchema#nonNegativeInteger")
-XSD_BOOLEAN = URIRef("http://www.w3.org/2001/XMLSchema#boolean")
+XSD_NON_NEGATIVE_INTEGER = u"http://www.w3.org/2001/XMLSchema#nonNegativeInteger"
+XSD_BOOLEAN = u"http://www.w3.org/2001/XMLSchema#boolean"
 
 class Utils(object):
 
@@ -70,7 +68,8 @@ class Utils(object):
     def get_normalized_n3(object_value):
         # Virtuoso converts "0"^^xsd:nonNegativeInteger to "0"^^xsd:integer
         # Virtuoso also converts boolean to "0"^^xsd:integer
+        from rdflib import Literal
         if type(object_value) == Literal and \
-           (object_value.datatype == XSD_BOOLEAN or object_value.datatype == XSD_NON_NEGATIVE_INTEGER):
+           unicode(object_value.datatype) in (XSD_BOOLEAN, XSD_NON_NEGATIVE_INTEGER):
             return Literal(int(object_value.toPython())).n3()
         return object_value.n3()
@@ -0,0 +1,153 @@
+import math
+import re
+
+# with "set echo on" isql prints each statement before running it, and its
+# result ends with the time the server took, e.g. "1 Rows. -- 3 msec."
+ISQL_TIMING = re.compile(r"--\s*(\d+)\s*msec\.")
+SPARQL_DELETE_WHERE = re.compile(r"^SPARQL\s+DELETE\b.*\}\s*WHERE\s*\{",
+                                 re.IGNORECASE | re.DOTALL)
+# rdflib writes literals with line breaks between triple quotes
+ESCAPE = re.compile(r"\\.")
+LONG_QUOTE = '"""'
+
+# upper bounds (in msec) of the histogram buckets
+BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+SLOWEST = 5
+STATEMENT_WIDTH = 200
+BAR_WIDTH = 40
+
+
+def statement_type(statement):
+    """ INSERT, DELETE, DELETE WHERE (the blank node deletes) or OTHER """
+    if SPARQL_DELETE_WHERE.match(statement):
+        return "DELETE WHERE"
+    words = statement.split(None, 2)
+    if len(words) > 1 and words[0].upper() == "SPARQL" and\
+            words[1].upper() in ("INSERT", "DELETE"):
+        return words[1].upper()
+    return "OTHER"
+
+
+def _in_long_literal(line, inside):
+    """ Whether a multi-line literal is still open after the line """
+    return (ESCAPE.sub("", line).count(LONG_QUOTE) % 2 == 1) != inside
+
+
+def split_statements(sparql):
+    """ Split SPARQL statements. get_sparql writes one per line, starting
+    with SPARQL, but a statement with a multi-line literal goes on over the
+    next lines """
+    statements = []
+    inside = False
+    for line in sparql.splitlines():
+        if inside:
+            statements[-1] += "\n" + line
+        elif line.strip():
+            if line.strip().upper().startswith("SPARQL") or not statements:
+                statements.append(line.strip())
+            else:
+                statements[-1] += "\n" + line
+        inside = _in_long_literal(line, inside)
+    return statements
+
+
+def parse_isql_output(output):
+    """ Get (statement, msec) for each SPARQL statement echoed by isql that
+    has a timing """
+    timings = []
+    statement = None
+    inside = False
+    for line in output.splitlines():
+        if inside:
+            # the echo of a statement with a multi-line literal
+            statement += "\n" + line
+            inside = _in_long_literal(line, inside)
+            continue
+        if line.strip().upper().startswith("SPARQL"):
+            statement = line.strip()
+            inside = _in_long_literal(line, inside)
+            continue
+        match = ISQL_TIMING.search(line)
+        if match and statement is not None:
+            timings.append((statement, int(match.group(1))))
+            statement = None
+    return timings
+
+
+class LatencyReport(object):
+    """ Latency of the executed statements, by statement type """
+
+    def __init__(self):
+        self.timings = []
+        # (statements, seconds) of each batch, when executed in batches
+        self.batches = []
+
+    def __len__(self):
+        return len(self.timings)
+
+    def add_isql_output(self, output):
+        self.timings.extend(parse_isql_output(output))
+
+    def by_type(self):
+        latencies = {}
+        for statement, msec in self.timings:
+            latencies.setdefault(statement_type(statement), []).append(msec)
+        return latencies
+
+    @staticmethod
+    def percentile(latencies, percent):
+        latencies = sorted(latencies)
+        # nearest rank
+        rank = int(math.ceil(percent / 100.0 * len(latencies)))
+        return latencies[max(0, rank - 1)]
+
+    @staticmethod
+    def histogram(latencies):
+        """ Number of latencies in each bucket, as (label, count) """
+        counts = [0] * (len(BUCKETS) + 1)
+        for msec in latencies:
+            index = 0
+            while index < len(BUCKETS) and msec >= BUCKETS[index]:
+                index += 1
+            counts[index] += 1
+        labels = ["< %dms" % bound for bound in BUCKETS] +\
+                 [">= %dms" % BUCKETS[-1]]
+        return zip(labels, counts)
+
+    def slowest(self, count=SLOWEST):
+        return sorted(self.timings, key=lambda timing: -timing[1])[:count]
+
+    def summary(self):
+        """ One line per statement type: count, p50, p99, max and total """
+        lines = []
+        for type_, latencies in sorted(self.by_type().items()):
+            lines.append("%-12s %6d statements  p50 %5dms  p99 %5dms  "
+                         "max %5dms  total %7dms" % (
+                                type_,
+                                len(latencies),
+                                LatencyReport.percentile(latencies, 50),
+                                LatencyReport.percentile(latencies, 99),
+                                max(latencies),
+                                sum(latencies)))
+        return "\n".join(lines)
+
+    def details(self):
+        """ Histogram of each statement type and the slowest statements """
+        lines = []
+        for type_, latencies in sorted(self.by_type().items()):
+            lines.append("%s:" % type_)
+            histogram = LatencyReport.histogram(latencies)
+            highest = max([count for _, count in histogram])
+            for label, count in histogram:
+                if count:
+                    lines.append("  %9s %6d %s" % (
+                                        label,
+                                        count,
+                                        "#" * max(1, count * BAR_WIDTH /
+                                                     highest)))
+        lines.append("slowest statements:")
+        for statement, msec in self.slowest():
+            if len(statement) > STATEMENT_WIDTH:
+                statement = statement[:STATEMENT_WIDTH] + "..."
+            lines.append("  %6dms %s" % (msec, statement))
+        return "\n".join(lines)
@@ -0,0 +1,142 @@
+import datetime
+import decimal
+import re
+
+XSD = u"http://www.w3.org/2001/XMLSchema#"
+XSD_INTEGER = XSD + u"integer"
+XSD_DECIMAL = XSD + u"decimal"
+XSD_DATETIME = XSD + u"dateTime"
+
+# Virtuoso keeps all of them as integers
+INTEGER_TYPES = ["integer", "nonNegativeInteger", "positiveInteger",
+                 "nonPositiveInteger", "negativeInteger", "long", "int",
+                 "short", "byte", "unsignedLong", "unsignedInt",
+                 "unsignedShort", "unsignedByte"]
+
+DATETIME = re.compile(r"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d+)?"
+                      r"(Z|[+-]\d\d:\d\d)?$")
+
+# normalized literals are memoized, the cache is emptied past this size
+LITERAL_CACHE_SIZE = 100000
+
+
+def _integer(lexical):
+    return unicode(int(lexical)), XSD_INTEGER
+
+
+def _boolean(lexical):
+    # Virtuoso also converts booleans to integers
+    values = {"true": u"1", "1": u"1", "false": u"0", "0": u"0"}
+    return values[lexical.strip()], XSD_INTEGER
+
+
+def _decimal(lexical):
+    value = decimal.Decimal(lexical.strip())
+    if not value.is_finite():
+        raise ValueError(lexical)
+    text = format(value, "f") if value else "0"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return unicode(text) + u".0" * ("." not in text), XSD_DECIMAL
+
+
+def _string(lexical):
+    # "x"^^xsd:string and "x" are the same literal
+    return lexical, None
+
+
+def _datetime(lexical):
+    """ Times with a timezone are kept in UTC """
+    match = DATETIME.match(lexical.strip())
+    if not match:
+        raise ValueError(lexical)
+    value, fraction, zone = match.groups()
+    fraction = (fraction or "").rstrip("0").rstrip(".")
+    if zone and zone != "Z":
+        offset = datetime.timedelta(hours=int(zone[1:3]),
+                                    minutes=int(zone[4:6]))
+        moment = datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
+        moment = moment - offset if zone[0] == "+" else moment + offset
+        value = moment.isoformat()
+    return u"%s%s%s" % (value, fraction, "Z" if zone else ""), XSD_DATETIME
+
+
+# datatype: function giving the (lexical form, datatype) Virtuoso stores
+NORMALIZERS = dict([(XSD + type_, _integer) for type_ in INTEGER_TYPES])
+NORMALIZERS.update({
+    XSD + u"boolean": _boolean,
+    XSD_DECIMAL: _decimal,
+    XSD + u"string": _string,
+    XSD_DATETIME: _datetime,
+})
+
+_normalized = {}
+
+
+def _normalize(literal):
+    """ The literal as Virtuoso stores it, or None if it is stored as it
+    is. Values invalid for their datatype are kept as they are """
+    from rdflib.term import Literal
+    lexical = unicode(literal)
+    datatype = literal.datatype and unicode(literal.datatype)
+    language = literal.language
+    if datatype in NORMALIZERS:
+        try:
+            lexical, datatype = NORMALIZERS[datatype](lexical)
+        except (ValueError, ArithmeticError, KeyError):
+            return None
+    elif language:
+        language = language.lower()
+    if (lexical, datatype, language) == (unicode(literal),
+                                         literal.datatype and
+                                         unicode(literal.datatype),
+                                         literal.language):
+        return None
+    return Literal(lexical, lang=language, datatype=datatype)
+
+
+def normalize_literal(literal):
+    """ Get the literal as Virtuoso stores it, so semantically equal
+    literals are equal """
+    normalized = _normalized_literal(literal)
+    return literal if normalized is None else normalized
+
+
+def _normalized_literal(literal):
+    # shared between threads: another one may clear it at any time, so it is
+    # read once and what is computed here is what is returned
+    key = (unicode(literal), literal.datatype, literal.language)
+    try:
+        return _normalized[key]
+    except KeyError:
+        pass
+    normalized = _normalize(literal)
+    if len(_normalized) >= LITERAL_CACHE_SIZE:
+        _normalized.clear()
+    _normalized[key] = normalized
+    return normalized
+
+
+def normalize_graph(graph, in_place=False):
+    """ Get the graph with its literals as Virtuoso stores them. The graph
+    itself is returned if nothing changes, or changed if in_place is set,
+    else a normalized copy """
+    from rdflib.graph import ConjunctiveGraph
+    from rdflib.term import Literal
+    changes = []
+    for subject, predicate, object_ in graph:
+        if isinstance(object_, Literal):
+            normalized = _normalized_literal(object_)
+            if normalized is not None:
+                changes.append(((subject, predicate, object_), normalized))
+    if not changes:
+        return graph
+    if not in_place:
+        copy = ConjunctiveGraph()
+        for triple in graph:
+            copy.add(triple)
+        graph = copy
+    for triple, normalized in changes:
+        graph.remove(triple)
+        graph.add((triple[0], triple[1], normalized))
+    return graph
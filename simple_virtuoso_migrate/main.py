@@ -1,16 +1,35 @@
+import datetime
+import fnmatch
+import hashlib
 import os
 import sys
+import time
 from cli import CLI
 from log import LOG
 from core import SimpleVirtuosoMigrate
-from virtuoso import Virtuoso
+from virtuoso import Virtuoso, LOAD_CHUNK_SIZE
+from compression import is_rdf_file, uncompressed_name
 from config import Config
+from core.exceptions import MigrationException
+from delta import Delta, DeltaStore, compute_delta
+from fingerprint import GraphFingerprint, LiveGraphFingerprint
+from skolem import genid_base, skolemize
+
+# MB per second loaded by each parallel load, to estimate how long a load
+# takes (LOAD_RATE in the config file)
+LOAD_RATE = 10
+
+# seconds between two checks of the watched file, and how long it must stay
+# unchanged (editors often save in several writes) before it is read
+WATCH_INTERVAL = 0.2
+WATCH_DEBOUNCE = 0.3
 
 
 class Main(object):
     """ Call all execution modules """
 
-    def __init__(self, config):
+    def __init__(self, config, virtuoso=None, virtuoso_migrate=None,
+                 log=None):
 
         if not Main._valid_version():
             print "You need to upgrade your Python version from %s to 2.7.x" % sys.version
@@ -18,9 +37,24 @@ class Main(object):
 
         Main._check_configuration(config)
         self.config = config
-        self.virtuoso = Virtuoso(config)
-        self.virtuoso_migrate = SimpleVirtuosoMigrate(config)
-        self.log = LOG(self.config.get("log_dir", None))
+        # objects kept by the caller between executions can be given
+        self.virtuoso = virtuoso or Virtuoso(config)
+        self.virtuoso_migrate = (virtuoso_migrate or
+                                 SimpleVirtuosoMigrate(config))
+        self.log = log or LOG(self.config.get("log_dir", None))
+        self.delta_store = None
+        # automatic checkpoints to restore at the end of a bulk run
+        self._checkpoint_interval = None
+        if self.config.get("skolemize", False) and\
+                self.config.get("cache_dir", None):
+            # deltas between skolemized ontologies are kept apart, per
+            # authority of the graph as the skolem IRIs are made from it
+            skolem_base = genid_base(self.config.get("database_graph"))
+            self.delta_store = DeltaStore(
+                    self.config.get("cache_dir"),
+                    "skolem-deltas-%s" % hashlib.md5(skolem_base).hexdigest())
+        elif self.config.get("cache_dir", None):
+            self.delta_store = DeltaStore(self.config.get("cache_dir"))
 
     @staticmethod
     def _valid_version():
@@ -33,11 +67,29 @@ class Main(object):
                             "PINK",
                             log_level_limit=1)
 
-        if self.config.get("load_ttl", None) is not None:
-            operation_result = self._load_triples()
+        try:
+            if self.config.get("compile", False):
+                operation_result = self._compile()
 
-        else:
-            operation_result = self._migrate()
+            elif self.config.get("verify", False):
+                operation_result = self._verify()
+
+            elif self.config.get("watch", False):
+                operation_result = self._watch()
+
+            elif self.config.get("export", None):
+                operation_result = self._export()
+
+            elif self.config.get("skolemize_server", False):
+                operation_result = self._skolemize_server()
+
+            elif self.config.get("load_ttl", None) is not None:
+                operation_result = self._load_triples()
+
+            else:
+                operation_result = self._migrate()
+        finally:
+            self._end_bulk()
 
         run_after_script = self.config.get('RUN_AFTER', None)
         if run_after_script:
@@ -47,26 +99,39 @@ class Main(object):
             self._run_after(run_after_script, operation_result)
 
         self._execution_log("\nDone.\n", "PINK", log_level_limit=1)
+        return operation_result
 
     def _load_triples(self):
         """ Called if the -a option is passed in the command line """
+        if self.config.get("replace", False) and\
+                self.config.get("bulk", False):
+            # bulk mode commits row by row, the MOVE would not be atomic
+            raise Exception("--replace can't be used with --bulk")
 
-        current_version, origen = self.virtuoso.get_current_version()
-
-        files_to_load = self.config.get("load_ttl")
-        basepath = os.path.dirname(files_to_load)
-        if os.path.isdir(files_to_load):
-            files = []
-            for i in os.listdir(files_to_load):
-                files.append(os.path.join(basepath, i))
-        else:
-            files = [files_to_load]
-
-        files = [i for i in files if i.endswith('.ttl')]
+        files = self._find_files_to_load(self.config.get("load_ttl"))
 
         self._execution_log("- TTL(s) to upload: %r" % files,
                             "GREEN",
                             log_level_limit=1)
+        self._log_load_estimate(files)
+        if self.config.get("validate", False):
+            self._validate(files)
+
+        # graph of each file, None for the database graph
+        graphs = self._find_graphs_of_files(files,
+                                            self.config.get("load_ttl"))
+        targets = sorted(set(graphs.values()))
+        if targets != [None]:
+            for graph in targets:
+                self._execution_log("- Files to load into %s: %d" % (
+                                    graph or self.config.get("database_graph"),
+                                    graphs.values().count(graph)),
+                                    "GREEN",
+                                    log_level_limit=1)
+
+        # each graph has its own history
+        versions = dict([(graph, self.virtuoso.get_current_version(graph))
+                         for graph in targets])
 
         out_list = []
         ok_list = []
@@ -79,7 +144,27 @@ class Main(object):
         }
 
         if not self.config.get("show_sparql_only", False):
-            response_dict = self.virtuoso.upload_ttls_to_virtuoso(files)
+            staging_graphs = {}
+            if self.config.get("replace", False):
+                # the graphs are replaced only once all the files are loaded
+                for graph in targets:
+                    staging_graphs[graph] = self.virtuoso.staging_graph(graph)
+                    self.virtuoso.clear_graph(staging_graphs[graph])
+            self._begin_bulk()
+            try:
+                response_dict = self.virtuoso.upload_ttls_to_virtuoso(
+                                files,
+                                execution_log=self._execution_log,
+                                graphs=dict([(fname, staging_graphs.get(graph,
+                                                                        graph))
+                                             for fname, graph in
+                                             graphs.items()]))
+            except:
+                # what was loaded before the failure is not kept
+                for staging_graph in sorted(staging_graphs.values()):
+                    self.virtuoso.clear_graph(staging_graph)
+                raise
+            self._write_load_report()
             for filename, (out, err) in response_dict.items():
                 if err:
                     err_list.append("File %s with err %s" % (filename, err))
@@ -90,17 +175,36 @@ class Main(object):
                 self._execution_log("ERRORS %r" % err_list,
                                     "RED",
                                     log_level_limit=1)
-
-            if origen is None:
-                origen = "insert"
+                if staging_graphs:
+                    for staging_graph in sorted(staging_graphs.values()):
+                        self.virtuoso.clear_graph(staging_graph)
+                    raise MigrationException("%d file(s) not loaded, the "
+                                             "graph was not replaced" %
+                                                                len(err_list))
 
             if ok_list:
-                sparql_up, sparql_down = self.virtuoso.get_sparql(None,
-                                                                  None,
-                                                                  current_version,
-                                                                  None,
-                                                                  origen,
-                                                                  ok_list)
+                # a record for each graph, executed in the same script
+                sparql_up = sparql_down = ""
+                for graph in targets:
+                    loaded = [filename for filename in ok_list
+                              if graphs[filename] == graph]
+                    if not loaded:
+                        continue
+                    current_version, origen = versions[graph]
+                    if origen is None:
+                        origen = "insert"
+                    up, down = self.virtuoso.get_sparql(
+                                                    None,
+                                                    None,
+                                                    current_version,
+                                                    None,
+                                                    origen,
+                                                    loaded,
+                                                    staging_graphs.get(graph),
+                                                    graph)
+                    sparql_up += up
+                    sparql_down += down
+                current_version = versions[targets[0]][0]
                 self._execute_migrations(sparql_up,
                                          sparql_down,
                                          current_version,
@@ -115,13 +219,252 @@ class Main(object):
 
         return operation_result
 
+    def _compile(self):
+        """ Called if the --compile option is passed in the command line.
+        Compute and cache the deltas between the git tags, so migrations only
+        have to compose cached deltas """
+        if self.delta_store is None:
+            raise Exception("--compile needs a cache dir (CACHE_DIR or "
+                            "--cache-dir)")
+
+        versions = self.virtuoso_migrate.get_ordered_migrations()
+        ids = self.virtuoso.get_ontology_ids(versions)
+        if self.config.get("compile_all_pairs", False):
+            pairs = [(i, j) for i in range(len(versions))
+                            for j in range(i + 1, len(versions))]
+        else:
+            pairs = [(i, i + 1) for i in range(len(versions) - 1)]
+        pairs = [(i, j) for (i, j) in pairs
+                 if not self.delta_store.has(ids[i], ids[j])]
+
+        self._execution_log("- Versions: %s" % ", ".join(versions),
+                            "GREEN",
+                            log_level_limit=1)
+        self._execution_log("- Deltas to compile: %d" % len(pairs),
+                            "GREEN",
+                            log_level_limit=1)
+
+        ontologies = {}
+        for (i, j) in pairs:
+            for k in (i, j):
+                if k not in ontologies:
+                    ontologies[k] = self.virtuoso.get_ontology_by_version(
+                                                                versions[k])
+        jobs = [((i, j), ontologies[i], ontologies[j]) for (i, j) in pairs]
+        if self.config.get("skolemize", False):
+            skolem_base = genid_base(self.config.get("database_graph"))
+            jobs = [job + (skolem_base,) for job in jobs]
+
+        compiled = []
+        not_cached = []
+        for (i, j), delta in self._compute_deltas(jobs):
+            pair = "%s -> %s" % (versions[i], versions[j])
+            if self.delta_store.put(ids[i], ids[j], delta):
+                compiled.append(pair)
+                self._execution_log("%s (%d triples)" % (pair, len(delta)))
+            else:
+                not_cached.append(pair)
+                self._execution_log("%s has blank nodes, not cached" % pair)
+
+        if not_cached:
+            self._execution_log("- Deltas with blank nodes (not cached): %s" %
+                                                        ", ".join(not_cached),
+                                "RED",
+                                log_level_limit=1)
+        self._execution_log("- Deltas compiled: %d" % len(compiled),
+                            "GREEN",
+                            log_level_limit=1)
+
+        return {'operation': 'compile',
+                'versions': versions,
+                'compiled': compiled,
+                'not_cached': not_cached}
+
+    def _compute_deltas(self, jobs):
+        """ Compute the deltas in parallel, one process per CPU """
+        if len(jobs) < 2:
+            return [compute_delta(job) for job in jobs]
+        from multiprocessing import Pool
+        pool = Pool()
+        try:
+            return pool.map(compute_delta, jobs)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _verify(self):
+        """ Called if the --verify option is passed in the command line.
+        Check whether the graph on the server still matches the ontology
+        version recorded on the migration graph """
+        current_version, origen = self.virtuoso.get_current_version()
+        if current_version is None:
+            raise Exception("there is no migration to verify the graph "
+                            "against")
+        self._execution_log("- Current version is: %s" % current_version,
+                            "GREEN",
+                            log_level_limit=1)
+
+        if origen == "file":
+            ontology = self.virtuoso.get_ontology_from_file(current_version)
+        else:
+            ontology = self.virtuoso.get_ontology_by_version(current_version)
+        local = GraphFingerprint(self.virtuoso.parse_ontology(ontology))
+        live = LiveGraphFingerprint(self.virtuoso,
+                                    self.config.get("database_graph"))
+        missing, extra, calls = local.compare(live)
+
+        self._execution_log("- Queries made to the server: %d" % calls,
+                            log_level_limit=1)
+        if not missing and not extra:
+            self._execution_log("\nGraph matches version %s." %
+                                                            current_version,
+                                "GREEN",
+                                log_level_limit=1)
+        else:
+            self._execution_log("\nGraph drifted from version %s: %d "
+                                "triple(s) missing, %d triple(s) not in the "
+                                "ontology (data loaded with -a is reported "
+                                "here too)" % (current_version,
+                                               len(missing),
+                                               len(extra)),
+                                "RED",
+                                log_level_limit=1)
+            for text in missing:
+                self._execution_log("- %s" % text, "RED")
+            for text in extra:
+                self._execution_log("+ %s" % text, "RED")
+
+        return {'operation': 'verify',
+                'current_version': current_version,
+                'missing': missing,
+                'extra': extra}
+
+    def _export(self):
+        """ Called if the --export option is passed in the command line.
+        Write the graph on the server in files in the given directory """
+        files = self.virtuoso.export_graph(
+                                self.config.get("export"),
+                                self.config.get("export_compress", False),
+                                execution_log=self._execution_log)
+        self._execution_log("- Files exported: %d" % len(files),
+                            "GREEN",
+                            log_level_limit=1)
+        self._execution_log("\n".join(files), log_level_limit=2)
+        return {'operation': 'export', 'files': files}
+
+    def _watch(self):
+        """ Called if the --watch option is passed in the command line.
+        Keep the last applied graph in memory and, every time the file given
+        with -f changes, apply only its difference to that graph """
+        file_name = self.config.get("file_migration", None)
+        if file_name is None:
+            raise Exception("--watch needs the file to migrate to (-f)")
+
+        current_version, origen = self.virtuoso.get_current_version()
+        if current_version is not None and origen != "file":
+            applied = self.virtuoso.parse_ontology(
+                    self.virtuoso.get_ontology_by_version(current_version))
+        else:
+            # the content of a file version is not kept anywhere
+            self._execution_log("- Reading the graph from the server...",
+                                "GREEN",
+                                log_level_limit=1)
+            applied = self.virtuoso.get_live_graph()
+
+        self._execution_log("- Watching %s (Ctrl+C to stop)" % file_name,
+                            "GREEN",
+                            log_level_limit=1)
+        modified = None
+        while True:
+            if self._get_modified(file_name) != modified:
+                modified = self._wait_until_unchanged(file_name)
+                try:
+                    destination = self.virtuoso.parse_ontology(
+                            self.virtuoso.get_ontology_from_file(file_name))
+                    sparql_up, sparql_down = self.virtuoso.get_sparql(
+                                                            applied,
+                                                            destination,
+                                                            current_version,
+                                                            file_name,
+                                                            "file")
+                    self._execute_migrations(sparql_up,
+                                             sparql_down,
+                                             current_version,
+                                             file_name)
+                except Exception, e:
+                    # keep watching from the last graph that was applied
+                    self._execution_log("[ERROR] %s" % unicode(e),
+                                        "RED",
+                                        log_level_limit=1)
+                else:
+                    applied = destination
+                    current_version = file_name
+                finally:
+                    # a checkpoint after each change
+                    self._end_bulk()
+            time.sleep(WATCH_INTERVAL)
+
+    @staticmethod
+    def _get_modified(file_name):
+        try:
+            stat = os.stat(file_name)
+            # the size too, as the mtime may have a one second resolution
+            return stat.st_mtime, stat.st_size
+        except OSError:
+            # editors may remove the file while saving it
+            return None
+
+    def _wait_until_unchanged(self, file_name):
+        modified = self._get_modified(file_name)
+        while True:
+            time.sleep(WATCH_DEBOUNCE)
+            last_modified = self._get_modified(file_name)
+            if last_modified == modified:
+                return modified
+            modified = last_modified
+
+    def _skolemize_server(self):
+        """ Called if the --skolemize-server option is passed in the command
+        line. Replace the blank nodes of the graph on the server by the same
+        IRIs --skolemize gives them, keeping the recorded version """
+        current_version, origen = self.virtuoso.get_current_version()
+        self._execution_log("- Reading the graph from the server...",
+                            "GREEN",
+                            log_level_limit=1)
+        live_graph = self.virtuoso.get_live_graph()
+        skolemized = skolemize(live_graph,
+                               genid_base(self.config.get("database_graph")))
+        # the blank nodes of the live graph are what has to go, so it is
+        # diffed as it is even with --skolemize
+        skolem_base = self.virtuoso.skolem_base
+        self.virtuoso.skolem_base = None
+        try:
+            sparql_up, sparql_down = self.virtuoso.get_sparql(live_graph,
+                                                              skolemized,
+                                                              current_version,
+                                                              current_version,
+                                                              origen)
+        finally:
+            self.virtuoso.skolem_base = skolem_base
+        self._execute_migrations(sparql_up,
+                                 sparql_down,
+                                 current_version,
+                                 current_version)
+        return {'operation': 'skolemize',
+                'sparql_up': sparql_up,
+                'sparql_down': sparql_down,
+                'current_version': current_version}
+
     def _migrate(self):
         """ Execute migrations based on git tags """
         source = 'git'
         current_ontology = None
         current_version, origen = self.virtuoso.get_current_version()
+        reconcile = self.config.get("reconcile", False)
+        if reconcile:
+            current_ontology = self._get_live_graph()
         # Making the first migration to the database
-        if current_version is None:
+        elif current_version is None:
             if self.config.get("file_migration", None) is not None:
                 self._execution_log(("- Current version is: %s" %
                                                         current_version),
@@ -131,9 +474,9 @@ class Main(object):
                                         self.config.get("file_migration")),
                                     "GREEN",
                                     log_level_limit=1)
-                CLI.error_and_exit("Can't execute migration FROM None TO File "
-                                   "(TIP: version it using git --tag and then "
-                                   "use -m)")
+                raise MigrationException("Can't execute migration FROM None "
+                                         "TO File (TIP: version it using git "
+                                         "--tag and then use -m)")
         else:
             if origen == "file":
                 if self.config.get("file_migration", None) is not None:
@@ -145,20 +488,38 @@ class Main(object):
                                             self.config.get("file_migration")),
                                         "GREEN",
                                         log_level_limit=1)
-                    CLI.error_and_exit("Can't execute migration FROM File TO "
-                                       "File (TIP: version it using git --tag "
-                                       "and then use -m)")
-
-            current_ontology = self.virtuoso.get_ontology_by_version(current_version)
+                    raise MigrationException("Can't execute migration FROM "
+                                             "File TO File (TIP: version it "
+                                             "using git --tag and then use "
+                                             "-m)")
 
         if self.config.get("file_migration", None) is not None:
             source = 'file'
+            if current_version is not None and not reconcile:
+                current_ontology = self.virtuoso.get_ontology_by_version(
+                                                        current_version)
             destination_version = self.config.get("file_migration")
             destination_ontology = self.virtuoso.get_ontology_from_file(
                                                         destination_version)
+            if reconcile:
+                destination_ontology = self._without_blank_nodes(
+                                                    destination_ontology)
         else:
             destination_version = self._get_destination_version()
-            destination_ontology = self.virtuoso.get_ontology_by_version(
+            if reconcile:
+                destination_ontology = self._without_blank_nodes(
+                        self.virtuoso.get_ontology_by_version(
+                                                        destination_version))
+            elif current_version is not None and origen != "file":
+                current_ontology, destination_ontology = (
+                            self._get_ontologies_between_tags(
+                                                        current_version,
+                                                        destination_version))
+            else:
+                if current_version is not None:
+                    current_ontology = self.virtuoso.get_ontology_by_version(
+                                                        current_version)
+                destination_ontology = self.virtuoso.get_ontology_by_version(
                                                         destination_version)
 
         sparql_up, sparql_down = self.virtuoso.get_sparql(current_ontology,
@@ -178,6 +539,75 @@ class Main(object):
                 'current_version': current_version,
                 'destination_version': destination_version}
 
+    def _get_live_graph(self):
+        """ Read the graph from the server, so the migration is made from
+        what really is there instead of from the recorded version """
+        self._execution_log("- Reading the graph from the server...",
+                            "GREEN",
+                            log_level_limit=1)
+        live_graph = self.virtuoso.get_live_graph(blank_nodes=False)
+        self._execution_log("- Triples on the server: %d" % len(live_graph),
+                            "GREEN",
+                            log_level_limit=1)
+        self._execution_log("\nWARNING: the graph will be made equal to the "
+                            "destination version, triples loaded with -a "
+                            "will be deleted ('--reconcile' activated)",
+                            "RED",
+                            log_level_limit=1)
+        return live_graph
+
+    def _without_blank_nodes(self, ontology):
+        """ The blank nodes on the server never match the ones of a parsed
+        ontology, so their triples are left as they are when reconciling
+        (there are none once skolemized) """
+        from rdflib.graph import ConjunctiveGraph
+        from rdflib.term import BNode
+        graph = ConjunctiveGraph()
+        for subject, predicate, object_ in \
+                self.virtuoso.parse_ontology(ontology):
+            if not isinstance(subject, BNode) and \
+                    not isinstance(object_, BNode):
+                graph.add((subject, predicate, object_))
+        return graph
+
+    def _get_ontologies_between_tags(self, current_version,
+                                     destination_version):
+        """ Get what has to be compared to migrate between two git tags: the
+        net delta composed from cached deltas when they are available,
+        otherwise only the ontology modules git reports as changed """
+        ids = None
+        if self.delta_store is not None:
+            versions = self.virtuoso_migrate.get_migrations_path(
+                                                        current_version,
+                                                        destination_version)
+            ids = self.virtuoso.get_ontology_ids(
+                        versions or [current_version, destination_version])
+            delta = self.delta_store.compose(ids)
+            if delta is not None:
+                self._execution_log("- Using cached deltas (%d triples)" %
+                                                                len(delta),
+                                    "GREEN",
+                                    log_level_limit=1)
+                return delta.graphs()
+
+        modules = self.virtuoso.get_changed_ontology_modules(
+                                                        current_version,
+                                                        destination_version)
+        current_ontology = self.virtuoso.get_ontology_by_version(
+                                                        current_version,
+                                                        modules)
+        destination_ontology = self.virtuoso.get_ontology_by_version(
+                                                        destination_version,
+                                                        modules)
+        if ids is not None:
+            current_ontology = self.virtuoso.parse_ontology(current_ontology)
+            destination_ontology = self.virtuoso.parse_ontology(
+                                                        destination_ontology)
+            self.delta_store.put(ids[0], ids[-1],
+                                 Delta.from_graphs(current_ontology,
+                                                   destination_ontology))
+        return current_ontology, destination_ontology
+
     def _get_destination_version(self):
         """ get destination version """
 
@@ -222,6 +652,7 @@ class Main(object):
             if out_list:
                 self._execution_log("\n".join(out_list), log_level_limit=1)
 
+            self._begin_bulk()
             self.virtuoso.execute_change(sparql_up, sparql_down,
                                          execution_log=self._execution_log)
 
@@ -236,6 +667,182 @@ class Main(object):
                             "_____________________________________________",
                             "YELLOW", log_level_limit=1)
 
+    def _find_files_to_load(self, files_to_load):
+        """ Files to load from a file or, recursively, from a directory,
+        filtered by the include and exclude patterns (matched against the
+        path under the directory or the file name) and sorted largest first,
+        so the longest loads start first when loading in parallel """
+        if os.path.isdir(files_to_load):
+            files = []
+            for root, dirs, names in os.walk(files_to_load):
+                dirs.sort()
+                for name in sorted(names):
+                    files.append(os.path.join(root, name))
+        else:
+            files = [files_to_load]
+
+        include = Main._patterns(self.config.get("load_include", None))
+        exclude = Main._patterns(self.config.get("load_exclude", None))
+
+        def matches(path, patterns):
+            return Main._matches(path, files_to_load, patterns)
+
+        files = [i for i in files if is_rdf_file(i) and
+                 (not include or matches(i, include)) and
+                 not matches(i, exclude)]
+        return sorted(files, key=lambda i: -Main._file_size(i))
+
+    def _find_graphs_of_files(self, files, files_to_load):
+        """ Graph each file is loaded into, the way Virtuoso's bulk loader
+        finds it: named in the file's .graph file (data.ttl.graph, and
+        data.ttl.gz.graph or data.ttl.graph for data.ttl.gz), else by the
+        first LOAD_GRAPH mapping (PATTERN=GRAPH) the file matches, else in
+        the global.graph file of its directory. None for the database
+        graph """
+        mappings = []
+        for mapping in Main._patterns(self.config.get("load_graph", None)):
+            pattern, equals, graph = mapping.partition("=")
+            if not equals or not pattern.strip() or not graph.strip():
+                raise Exception("invalid graph mapping '%s', it should be "
+                                "PATTERN=GRAPH" % mapping)
+            mappings.append((pattern.strip(), graph.strip()))
+
+        graphs = {}
+        for path in files:
+            graph = (Main._read_graph_file(path + ".graph") or
+                     Main._read_graph_file(uncompressed_name(path) + ".graph"))
+            if not graph:
+                for pattern, mapped_graph in mappings:
+                    if Main._matches(path, files_to_load, [pattern]):
+                        graph = mapped_graph
+                        break
+            if not graph:
+                graph = Main._read_graph_file(
+                                    os.path.join(os.path.dirname(path),
+                                                 "global.graph"))
+            if graph == self.config.get("database_graph"):
+                graph = None
+            graphs[path] = graph or None
+        return graphs
+
+    @staticmethod
+    def _read_graph_file(path):
+        if not os.path.isfile(path):
+            return None
+        f = open(path)
+        try:
+            return f.read().strip()
+        finally:
+            f.close()
+
+    @staticmethod
+    def _matches(path, files_to_load, patterns):
+        """ Whether the path under the directory files_to_load (or the file
+        name) matches one of the glob patterns """
+        relative_path = os.path.relpath(path, files_to_load)
+        for pattern in patterns:
+            if fnmatch.fnmatch(relative_path, pattern) or\
+                    fnmatch.fnmatch(os.path.basename(path), pattern):
+                return True
+        return False
+
+    @staticmethod
+    def _patterns(patterns):
+        if isinstance(patterns, basestring):
+            return [pattern.strip() for pattern in patterns.split(",")]
+        return patterns or []
+
+    @staticmethod
+    def _file_size(path):
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+        return 0
+
+    def _log_load_estimate(self, files):
+        """ Log the bytes to load and how long it should take, from the
+        LOAD_RATE of each parallel load, chunks being assigned to the least
+        busy load the way they are loaded (largest first) """
+        sizes = [Main._file_size(i) for i in files]
+        parallel = int(self.config.get("load_parallel", None) or 1)
+        chunk_size = int(float(self.config.get("load_chunk_size", None) or
+                               LOAD_CHUNK_SIZE) * 1024 * 1024)
+        pieces = []
+        for size in sizes:
+            while parallel > 1 and size > chunk_size:
+                pieces.append(chunk_size)
+                size -= chunk_size
+            pieces.append(size)
+        loads = [0] * parallel
+        for piece in sorted(pieces, reverse=True):
+            loads[loads.index(min(loads))] += piece
+        rate = float(self.config.get("load_rate", None) or LOAD_RATE)
+        seconds = max(loads) / (rate * 1024 * 1024)
+        self._execution_log("- %d file(s), %.1f MB to load, estimated time "
+                            "%s with %d parallel load(s)" % (
+                                        len(files),
+                                        sum(sizes) / (1024.0 * 1024),
+                                        datetime.timedelta(
+                                                    seconds=int(seconds)),
+                                        parallel),
+                            "GREEN",
+                            log_level_limit=1)
+
+    def _validate(self, files):
+        """ Called if the --validate option is passed with -a. Check the
+        syntax of every file before connecting to the server """
+        from validator import validate_files
+        results = validate_files(files)
+        errors = ["%s:%d: %s" % (name, line, message)
+                  for name in files
+                  for line, message in results[name][1]]
+        self._execution_log("- Files validated: %d, %d triple(s)" % (
+                                len(files),
+                                sum([results[name][0] for name in files])),
+                            "GREEN",
+                            log_level_limit=1)
+        if errors:
+            self._execution_log("\n".join(errors), "RED", log_level_limit=1)
+            raise MigrationException("%d syntax error(s) found, nothing was "
+                                     "loaded" % len(errors))
+
+    def _write_load_report(self):
+        """ Write the timing of each loaded file in the log dir, as JSON and
+        CSV """
+        log_dir = self.config.get("log_dir", None)
+        if log_dir and self.virtuoso.load_report is not None:
+            paths = self.virtuoso.load_report.write(log_dir)
+            self._execution_log("- Load report: %s" % ", ".join(paths),
+                                "GREEN",
+                                log_level_limit=1)
+
+    def _begin_bulk(self):
+        """ Suspend the automatic checkpoints once per run in bulk mode, so
+        the loads and the statements of the run share a single checkpoint,
+        made by _end_bulk """
+        if self.config.get("bulk", False) and\
+                self._checkpoint_interval is None:
+            self._warn_bulk()
+            self._checkpoint_interval = self.virtuoso.begin_bulk()
+
+    def _end_bulk(self):
+        if self._checkpoint_interval is not None:
+            checkpoint_interval = self._checkpoint_interval
+            self._checkpoint_interval = None
+            self.virtuoso.end_bulk(checkpoint_interval)
+
+    def _warn_bulk(self):
+        if self.config.get("bulk", False):
+            self._execution_log("\nWARNING: bulk mode, statements are "
+                                "committed one by one without the transaction "
+                                "log. A failed statement is undone only by "
+                                "running the rollback statements, and a "
+                                "server crash before the final checkpoint "
+                                "loses all the changes (automatic checkpoints "
+                                "stay off if this process is killed, restore "
+                                "them with checkpoint_interval)",
+                                "RED",
+                                log_level_limit=1)
+
     def _execution_log(self, msg, color="CYAN", log_level_limit=2):
         if self.config.get("log_level", 1) >= log_level_limit:
             CLI.msg(msg, color)
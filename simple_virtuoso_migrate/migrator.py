@@ -0,0 +1,209 @@
+from collections import OrderedDict
+import hashlib
+import threading
+
+from config import Config
+from core import SimpleVirtuosoMigrate
+from log import LOG
+from main import Main
+from virtuoso import Virtuoso
+
+ONTOLOGY_CACHE_SIZE = 16
+
+# settings a Virtuoso object is built from; calls sharing all of them share
+# the same object (and its caches and connections)
+VIRTUOSO_SETTINGS = ['database_host', 'database_port', 'database_user',
+                     'database_password', 'database_endpoint',
+                     'database_graph', 'database_ontology',
+                     'database_migrations_dir', 'migration_graph',
+                     'virtuoso_dirs_allowed', 'host_user', 'host_password',
+                     'cache_dir', 'capabilities_ttl', 'target_latency',
+                     'max_statements_per_second', 'skolemize',
+                     'bulk', 'load_parallel', 'load_chunk_size',
+                     'export_segment_size']
+
+
+class OntologyCache(object):
+    """ Parsed ontologies keyed by the md5 of their content, so a version
+    used by many graphs (or many calls) is parsed only once. The least
+    recently used ones are dropped past max_size """
+
+    def __init__(self, max_size=ONTOLOGY_CACHE_SIZE):
+        self._graphs = OrderedDict()
+        self._max_size = max_size
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._graphs)
+
+    @staticmethod
+    def key(ontology):
+        if isinstance(ontology, basestring):
+            ontology = [ontology]
+        md5 = hashlib.md5()
+        for content in ontology:
+            if isinstance(content, unicode):
+                content = content.encode('utf-8')
+            md5.update(hashlib.md5(content).digest())
+        return md5.hexdigest()
+
+    def get(self, ontology, parse, variant=""):
+        """ Get the parsed ontology, parsing it with the given function if
+        it is not cached. Graphs parsed differently (e.g. skolemized) are
+        told apart by the variant. Cached graphs are shared, so they must
+        not be changed """
+        key = (OntologyCache.key(ontology), variant)
+        with self._lock:
+            graph = self._graphs.pop(key, None)
+            if graph is not None:
+                self._graphs[key] = graph
+                return graph
+        graph = parse(ontology)
+        with self._lock:
+            self._graphs[key] = graph
+            while len(self._graphs) > self._max_size:
+                self._graphs.popitem(last=False)
+        return graph
+
+
+class Migrator(object):
+    """ Run migrations from a long running process. The settings given here
+    are used by every call and can be overridden per call (same keys as the
+    config file, in any case). Calls return the result of the operation and
+    raise MigrationException (or Exception) instead of exiting.
+
+    Git readers, server capabilities, parsed ontologies and ssh connections
+    are kept between calls. Calls on the same graph are serialized, calls on
+    different graphs can run in parallel from a thread pool """
+
+    def __init__(self, config=None, ontology_cache_size=ONTOLOGY_CACHE_SIZE):
+        if isinstance(config, Config):
+            config = config._config
+        self._config = dict(config or {})
+        self._ontology_cache = OntologyCache(ontology_cache_size)
+        self._virtuosos = {}
+        self._virtuoso_migrates = {}
+        self._graph_locks = {}
+        self._queued = {}
+        self._logs = {}
+        self._lock = threading.Lock()
+
+    def migrate(self, schema_version=None, **config):
+        """ Migrate to a git tag (the latest one if none is given) """
+        config['schema_version'] = schema_version
+        return self.execute(**config)
+
+    def plan(self, schema_version=None, **config):
+        """ Get the statements a migration would execute, without executing
+        them """
+        config['show_sparql_only'] = True
+        return self.migrate(schema_version, **config)
+
+    def load(self, load_ttl, **config):
+        """ Load a ttl file (or a directory of ttl files) into the graph """
+        config['load_ttl'] = load_ttl
+        return self.execute(**config)
+
+    def verify(self, **config):
+        config['verify'] = True
+        return self.execute(**config)
+
+    def export(self, directory, compressed=False, **config):
+        """ Write the graph in ttl files in a directory (e.g. a backup
+        before a migration) """
+        config['export'] = directory
+        config['export_compress'] = compressed
+        return self.execute(**config)
+
+    def compile(self, compile_all_pairs=False, **config):
+        config['compile'] = True
+        config['compile_all_pairs'] = compile_all_pairs
+        return self.execute(**config)
+
+    def status(self, **config):
+        """ Get the version recorded for the graph and how many calls on it
+        are running or waiting """
+        config = self._make_config(config)
+        current_version, origen = self._get_virtuoso(
+                                            config).get_current_version()
+        with self._lock:
+            queued = self._queued.get(Migrator._graph_key(config), 0)
+        return {'operation': 'status',
+                'database_graph': config.get("database_graph"),
+                'current_version': current_version,
+                'origen': origen,
+                'queued': queued}
+
+    def execute(self, **config):
+        config = self._make_config(config)
+        virtuoso = self._get_virtuoso(config)
+        key = Migrator._graph_key(config)
+        with self._lock:
+            lock = self._graph_locks.setdefault(key, threading.RLock())
+            self._queued[key] = self._queued.get(key, 0) + 1
+        try:
+            with lock:
+                main = Main(config,
+                            virtuoso=virtuoso,
+                            virtuoso_migrate=self._get_virtuoso_migrate(
+                                                                    config),
+                            log=self._get_log(config.get("log_dir", None)))
+                return main.execute()
+        finally:
+            with self._lock:
+                self._queued[key] -= 1
+
+    def close(self):
+        """ Close the connections kept open by the previous calls """
+        with self._lock:
+            virtuosos = self._virtuosos.values()
+            self._virtuosos = {}
+        for virtuoso in virtuosos:
+            virtuoso.close()
+
+    def _make_config(self, config):
+        settings = {}
+        for key, value in self._config.items() + config.items():
+            if value is not None:
+                settings[key.lower()] = value
+        config = Config(settings)
+        config.update("log_level", 0)
+        migrations_dir = config.get("database_migrations_dir", None)
+        if migrations_dir is not None:
+            config.update("database_migrations_dir",
+                          Config._parse_migrations_dir(migrations_dir)[0])
+        Main._check_configuration(config)
+        return config
+
+    def _get_virtuoso(self, config):
+        key = tuple([config.get(setting, None)
+                     for setting in VIRTUOSO_SETTINGS])
+        with self._lock:
+            if key not in self._virtuosos:
+                virtuoso = Virtuoso(config)
+                virtuoso.keep_connections = True
+                virtuoso.ontology_cache = self._ontology_cache
+                self._virtuosos[key] = virtuoso
+            return self._virtuosos[key]
+
+    def _get_virtuoso_migrate(self, config):
+        # keeps the git tags read, per graph and migrations dir
+        key = Migrator._graph_key(config) +\
+            (config.get("database_migrations_dir", None),)
+        with self._lock:
+            if key not in self._virtuoso_migrates:
+                self._virtuoso_migrates[key] = SimpleVirtuosoMigrate(config)
+            return self._virtuoso_migrates[key]
+
+    @staticmethod
+    def _graph_key(config):
+        return (config.get("database_host"), config.get("database_port"),
+                config.get("database_graph"))
+
+    def _get_log(self, log_dir):
+        # every LOG adds a handler to the same logger, so only one is made
+        # per log dir
+        with self._lock:
+            if log_dir not in self._logs:
+                self._logs[log_dir] = LOG(log_dir)
+            return self._logs[log_dir]
@@ -44,7 +44,29 @@ def run(options):
         config.update('file_migration', options.get('file_migration'))
         config.update('migration_graph', options.get('migration_graph'))
         config.update('load_ttl', options.get('load_ttl'))
+        config.update('compile', options.get('compile'))
+        config.update('compile_all_pairs', options.get('compile_all_pairs'))
+        config.update('verify', options.get('verify'))
+        config.update('reconcile', options.get('reconcile'))
+        config.update('export', options.get('export'))
+        config.update('export_compress', options.get('export_compress'))
+        config.update('watch', options.get('watch'))
+        config.update('skolemize', options.get('skolemize'))
+        config.update('skolemize_server', options.get('skolemize_server'))
+        config.update('bulk', options.get('bulk'))
+        config.update('load_include', options.get('load_include'))
+        config.update('load_exclude', options.get('load_exclude'))
+        config.update('load_graph', options.get('load_graph'))
+        config.update('load_parallel', options.get('load_parallel'))
+        config.update('load_chunk_size', options.get('load_chunk_size'))
+        config.update('replace', options.get('replace'))
+        config.update('validate', options.get('validate'))
+        config.update('target_latency', options.get('target_latency'))
+        config.update('max_statements_per_second',
+                      options.get('max_statements_per_second'))
+        config.update('serve', options.get('serve'))
         config.update('log_dir', options.get('log_dir'))
+        config.update('cache_dir', options.get('cache_dir'))
         config.update('database_user', options.get('database_user'))
         config.update('database_password', options.get('database_password'))
         config.update('host_user', options.get('host_user'))
@@ -90,7 +112,11 @@ def run(options):
                 passwd = getpass()
                 config.update('host_password', passwd)
         # If CLI was correctly parsed, execute db-virtuoso.
-        Main(config).execute()
+        if config.get('serve', None):
+            from server import serve
+            serve(config, config.get('serve'))
+        else:
+            Main(config).execute()
     except KeyboardInterrupt:
         CLI.info_and_exit("\nExecution interrupted by user...")
     except Exception, e:
@@ -0,0 +1,57 @@
+import time
+
+INITIAL_BATCH_SIZE = 100
+MIN_BATCH_SIZE = 1
+MAX_BATCH_SIZE = 10000
+# statements added to the batch after a batch under the target latency
+ADDITIVE_INCREASE = 50
+# a batch this many times slower than the target means the server is busy,
+# so the next one waits at least PAUSE seconds
+PAUSE_FACTOR = 4
+PAUSE = 5
+
+
+class BatchScheduler(object):
+    """ Execute statements in batches sized AIMD-style after the latency of
+    the previous batch: a batch under the target latency makes the next one
+    grow by a constant, a slower one halves it. The rate can be limited to
+    max_rate statements per second """
+
+    def __init__(self, target_latency, max_rate=None, batch_size=None,
+                 pause=PAUSE):
+        self.target_latency = target_latency
+        self.max_rate = max_rate
+        self.batch_size = batch_size or INITIAL_BATCH_SIZE
+        self.pause_latency = target_latency * PAUSE_FACTOR
+        self.pause = pause
+        self.batches = []
+
+    def run(self, statements, execute):
+        """ Call execute with each batch of statements, in order """
+        position = 0
+        while position < len(statements):
+            batch = statements[position:position + self.batch_size]
+            start = time.time()
+            execute(batch)
+            latency = time.time() - start
+            position += len(batch)
+            self.batches.append((len(batch), latency))
+            self._adapt(latency)
+            if position < len(statements):
+                self._throttle(len(batch), latency)
+
+    def _adapt(self, latency):
+        if latency > self.target_latency:
+            self.batch_size = max(MIN_BATCH_SIZE, self.batch_size / 2)
+        else:
+            self.batch_size = min(MAX_BATCH_SIZE,
+                                  self.batch_size + ADDITIVE_INCREASE)
+
+    def _throttle(self, count, latency):
+        wait = 0
+        if self.max_rate:
+            wait = count / float(self.max_rate) - latency
+        if latency > self.pause_latency:
+            wait = max(wait, self.pause)
+        if wait > 0:
+            time.sleep(wait)
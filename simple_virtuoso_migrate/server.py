@@ -0,0 +1,166 @@
+import BaseHTTPServer
+import SocketServer
+import json
+import urlparse
+
+from cli import CLI
+from migrator import Migrator
+
+DEFAULT_HOST = "127.0.0.1"
+
+# the only settings a request can override, with their type: none of them
+# names a file, a script to run or a credential
+REQUEST_SETTINGS = {'schema_version': 'string',
+                    'database_graph': 'string',
+                    'migration_graph': 'string',
+                    'show_sparql': 'boolean',
+                    'show_sparql_only': 'boolean',
+                    'reconcile': 'boolean',
+                    'bulk': 'boolean',
+                    'target_latency': 'number',
+                    'max_statements_per_second': 'number'}
+TRUE = ("1", "true", "yes", "on")
+FALSE = ("0", "false", "no", "off", "")
+
+
+def parse_settings(settings):
+    """ Check the settings of a request (from the query string, as strings,
+    or from the JSON body) and convert them to their type. Raises
+    ValueError for the others """
+    parsed = {}
+    for key, value in settings.items():
+        kind = REQUEST_SETTINGS.get(key)
+        if kind is None:
+            raise ValueError("setting not allowed in a request (%s)" % key)
+        if value is None:
+            continue
+        if kind == 'boolean':
+            if isinstance(value, basestring):
+                if value.lower() not in TRUE + FALSE:
+                    raise ValueError("%s should be true or false" % key)
+                value = value.lower() in TRUE
+            elif not isinstance(value, bool):
+                raise ValueError("%s should be true or false" % key)
+        elif kind == 'number':
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError("%s should be a number" % key)
+        elif isinstance(value, (int, long, float, basestring)) and\
+                not isinstance(value, bool):
+            value = unicode(value)
+        else:
+            raise ValueError("%s should be a string" % key)
+        parsed[key] = value
+    return parsed
+
+
+class MigrationServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """ HTTP server keeping a Migrator (and so its git readers, parsed
+    ontologies and server connections) between requests. Each request runs
+    in its own thread and waits for the ones on the same graph """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, migrator):
+        BaseHTTPServer.HTTPServer.__init__(self, address,
+                                           MigrationRequestHandler)
+        self.migrator = migrator
+
+
+class MigrationRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ GET /status, POST /plan, /apply and /verify. Settings (some keys
+    of the config file, see REQUEST_SETTINGS) are given in the query string
+    or as a JSON object in the body, and override the ones the server was
+    started with. POST requests must be sent as application/json, which a
+    web page can't do on another site without its consent. Responses are
+    JSON """
+
+    def do_GET(self):
+        path, settings = self._parse_request()
+        if path != "/status":
+            self._send(404, {'error': "not found (%s)" % path})
+            return
+        try:
+            settings = parse_settings(settings)
+        except ValueError, e:
+            self._send(400, {'error': unicode(e)})
+            return
+        self._call(self.server.migrator.status, settings)
+
+    def do_POST(self):
+        path, settings = self._parse_request()
+        operations = {"/plan": self.server.migrator.plan,
+                      "/apply": self.server.migrator.migrate,
+                      "/verify": self.server.migrator.verify}
+        if path not in operations:
+            self._send(404, {'error': "not found (%s)" % path})
+            return
+        content_type = (self.headers.getheader("content-type") or "")
+        if content_type.split(";")[0].strip().lower() != "application/json":
+            self._send(415, {'error': "the request should be sent as "
+                                      "application/json"})
+            return
+        try:
+            settings.update(self._read_body())
+        except ValueError, e:
+            self._send(400, {'error': "invalid JSON body (%s)" % e})
+            return
+        try:
+            settings = parse_settings(settings)
+        except ValueError, e:
+            self._send(400, {'error': unicode(e)})
+            return
+        self._call(operations[path], settings)
+
+    def _parse_request(self):
+        url = urlparse.urlparse(self.path)
+        settings = dict(urlparse.parse_qsl(url.query))
+        return url.path.rstrip("/") or "/", settings
+
+    def _read_body(self):
+        length = int(self.headers.getheader("content-length") or 0)
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ValueError("expected an object")
+        return dict([(str(key), value) for key, value in body.items()])
+
+    def _call(self, operation, settings):
+        try:
+            result = operation(**settings)
+        except Exception, e:
+            self._send(500, {'error': unicode(e)})
+            return
+        self._send(200, result)
+
+    def _send(self, status, content):
+        body = json.dumps(content)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def parse_address(address):
+    """ Get (host, port) from "port" or "host:port" """
+    host, _, port = str(address).rpartition(":")
+    try:
+        return host or DEFAULT_HOST, int(port)
+    except ValueError:
+        raise Exception("invalid address to serve on ('%s')" % address)
+
+
+def serve(config, address):
+    """ Serve the migrations of the configured server until interrupted """
+    server = MigrationServer(parse_address(address), Migrator(config))
+    CLI.msg("Serving migrations on http://%s:%d/" % server.server_address,
+            "PINK")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        server.migrator.close()
@@ -0,0 +1,78 @@
+import hashlib
+import urlparse
+
+from helpers import Utils
+
+GENID_PATH = "/.well-known/genid/"
+
+
+def genid_base(graph):
+    """ Prefix of the skolem IRIs of a graph: its scheme and authority
+    followed by /.well-known/genid/ """
+    url = urlparse.urlparse(graph)
+    if not url.scheme or not url.netloc:
+        raise Exception("can't skolemize blank nodes of a graph whose name "
+                        "has no authority ('%s')" % graph)
+    return "%s://%s%s" % (url.scheme, url.netloc, GENID_PATH)
+
+
+def _describe(graph, node, descriptions, path=frozenset()):
+    """ Text of a node and, for blank nodes, of everything under it. Objects
+    are normalized the way Virtuoso stores them, so the description of a
+    node read from the server is the same """
+    from rdflib.term import BNode
+    if not isinstance(node, BNode):
+        return Utils.get_normalized_n3(node)
+    if node in descriptions:
+        return descriptions[node]
+    if node in path:
+        return "[]"
+    path = path | frozenset([node])
+    description = "[%s]" % " ; ".join(sorted(
+                        ["%s %s" % (predicate.n3(),
+                                    _describe(graph, object_, descriptions,
+                                              path))
+                         for predicate, object_ in
+                         graph.predicate_objects(node)]))
+    descriptions[node] = description
+    return description
+
+
+def _skolem_id(graph, node, ids, descriptions, path=frozenset()):
+    """ md5 of the content of a blank node and of where it is referenced
+    from, so equal nodes referenced from different places (e.g. the tails
+    of two lists) get different ids """
+    from rdflib.term import BNode
+    if node in ids:
+        return ids[node]
+    path = path | frozenset([node])
+    referrers = []
+    for subject, predicate in graph.subject_predicates(node):
+        if not isinstance(subject, BNode):
+            referrers.append(subject.n3() + predicate.n3())
+        elif subject not in path:
+            referrers.append(_skolem_id(graph, subject, ids, descriptions,
+                                        path) + predicate.n3())
+    text = u"%s %s" % (min(referrers or [u""]),
+                       _describe(graph, node, descriptions))
+    ids[node] = hashlib.md5(text.encode('utf-8')).hexdigest()
+    return ids[node]
+
+
+def skolemize(graph, base):
+    """ Copy of a graph with its blank nodes replaced by IRIs derived from
+    their content, so the same ontology always gets the same IRIs """
+    from rdflib.graph import ConjunctiveGraph
+    from rdflib.term import BNode, URIRef
+    ids = {}
+    descriptions = {}
+
+    def skolem(term):
+        if isinstance(term, BNode):
+            return URIRef(base + _skolem_id(graph, term, ids, descriptions))
+        return term
+
+    skolemized = ConjunctiveGraph()
+    for subject, predicate, object_ in graph:
+        skolemized.add((skolem(subject), predicate, skolem(object_)))
+    return skolemized
@@ -0,0 +1,107 @@
+import os
+import re
+
+from compression import open_file, uncompressed_name
+
+# what can hide or change the end of a statement: strings, IRIs, comments,
+# brackets, and blank node labels (which can't be split, since every load
+# gives the same label a new node)
+TOKENS = re.compile(r'"""|\'\'\'|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|'
+                    r'<[^>\s]*>|#|[\[\]()]|_:')
+LONG_STRING_END = {'"""': re.compile(r'(?:\\.|[^\\])*?"""', re.S),
+                   "'''": re.compile(r"(?:\\.|[^\\])*?'''", re.S)}
+DIRECTIVE = re.compile(r'\s*(@prefix|@base|prefix\s|base\s)', re.IGNORECASE)
+
+
+class UnsplittableTTL(Exception):
+    pass
+
+
+class _Scanner(object):
+    """ Follows the turtle lines of a file to tell where statements end """
+
+    def __init__(self, labels=False):
+        # whether blank node labels are accepted
+        self.labels = labels
+        self.long_string = None
+        self.depth = 0
+
+    def scan(self, line):
+        """ Whether a statement ends at the end of the line """
+        position = 0
+        content_end = len(line)
+        while True:
+            if self.long_string:
+                end = LONG_STRING_END[self.long_string].match(line, position)
+                if not end:
+                    return False
+                self.long_string = None
+                position = end.end()
+            token = TOKENS.search(line, position)
+            if not token:
+                break
+            position = token.end()
+            value = token.group()
+            if value in LONG_STRING_END:
+                self.long_string = value
+            elif value == '#':
+                content_end = token.start()
+                break
+            elif value in '[(':
+                self.depth += 1
+            elif value in '])':
+                self.depth -= 1
+            elif value == '_:' and not self.labels:
+                raise UnsplittableTTL("blank node labels")
+        return self.depth == 0 and line[:content_end].rstrip().endswith('.')
+
+
+def split_ttl(path, chunk_size, directory):
+    """ Split a ttl file in files of about chunk_size bytes, cut at
+    statement ends, each one starting with the prefixes and base declared
+    before it. Compressed files are read decompressing them (their size is
+    the compressed one) and give uncompressed chunks. Returns the paths of
+    the chunks, or the file itself when it is not bigger than chunk_size or
+    can't be split safely """
+    if os.path.getsize(path) <= chunk_size:
+        return [path]
+    name, extension = os.path.splitext(
+                            os.path.basename(uncompressed_name(path)))
+    scanner = _Scanner()
+    header = []
+    statement_start = True
+    chunks = []
+    chunk = None
+    f = open_file(path)
+    try:
+        for line in f:
+            if chunk is None:
+                chunks.append(os.path.join(directory, "%s.%04d%s" % (
+                                            name, len(chunks) + 1, extension)))
+                chunk = open(chunks[-1], 'w')
+                chunk.writelines(header)
+            chunk.write(line)
+            if statement_start and DIRECTIVE.match(line):
+                header.append(line if line.endswith('\n') else line + '\n')
+                continue
+            statement_ended = scanner.scan(line)
+            if line.strip() and not line.lstrip().startswith('#'):
+                statement_start = statement_ended
+            if statement_ended and chunk.tell() >= chunk_size:
+                chunk.close()
+                chunk = None
+    except UnsplittableTTL:
+        if chunk is not None:
+            chunk.close()
+        for chunk_path in chunks:
+            os.remove(chunk_path)
+        return [path]
+    finally:
+        f.close()
+        if chunk is not None:
+            chunk.close()
+    if len(chunks) == 1:
+        # no statement end after chunk_size
+        os.remove(chunks[0])
+        return [path]
+    return chunks
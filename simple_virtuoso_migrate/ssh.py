@@ -2,6 +2,7 @@
 
 import logging
 import os
+import threading
 import paramiko
 
 
@@ -17,6 +18,7 @@ class Connection(object):
                  port=22):
         self._sftp_live = False
         self._sftp = None
+        self._sftp_lock = threading.Lock()
         if not username:
             username = os.environ['LOGNAME']
 
@@ -53,9 +55,16 @@ class Connection(object):
 
     def _sftp_connect(self):
         """Establish the SFTP connection."""
-        if not self._sftp_live:
-            self._sftp = paramiko.SFTPClient.from_transport(self._transport)
-            self._sftp_live = True
+        with self._sftp_lock:
+            if not self._sftp_live:
+                self._sftp = paramiko.SFTPClient.from_transport(
+                                                            self._transport)
+                self._sftp_live = True
+
+    def open_sftp(self):
+        """Open an SFTP client on its own channel of the transport, for a
+        thread to use while others use theirs. The caller closes it."""
+        return paramiko.SFTPClient.from_transport(self._transport)
 
     def get(self, remotepath, localpath=None):
         """Copies a file between the remote host and the local host."""
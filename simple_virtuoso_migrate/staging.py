@@ -0,0 +1,88 @@
+import errno
+import os
+import shutil
+
+# ioctl cloning the extents of a file (btrfs, xfs, ...), _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def _create(destination):
+    """ Create destination, failing if it exists: an existing file may be a
+    link to another file, which writing to it would overwrite """
+    return os.fdopen(os.open(destination,
+                             os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                             0644),
+                     'wb')
+
+
+def _hardlink(origin, destination):
+    os.link(origin, destination)
+
+
+def _reflink(origin, destination):
+    import fcntl
+    source = open(origin, 'rb')
+    try:
+        target = _create(destination)
+        try:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        except IOError:
+            target.close()
+            os.remove(destination)
+            raise
+        target.close()
+    finally:
+        source.close()
+
+
+def _rename(origin, destination):
+    # the empty file reserving the name is the only one replaced
+    _create(destination).close()
+    try:
+        os.rename(origin, destination)
+    except OSError:
+        os.remove(destination)
+        raise
+
+
+def _copy(origin, destination):
+    source = open(origin, 'rb')
+    try:
+        target = _create(destination)
+        try:
+            shutil.copyfileobj(source, target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+
+# the cheapest first; all but the copy need both files on the same
+# filesystem
+METHODS = [('hardlink', _hardlink),
+           ('reflink', _reflink),
+           ('rename', _rename),
+           ('copy', _copy)]
+
+
+def stage(origin, destination):
+    """ Make a file available at destination without copying its content
+    when possible. Returns the method used, to be given to unstage. Raises
+    OSError (EEXIST) if destination exists, which is left untouched """
+    for method, function in METHODS[:-1]:
+        try:
+            function(origin, destination)
+            return method
+        except (OSError, IOError), e:
+            if e.errno == errno.EEXIST:
+                raise OSError(errno.EEXIST, "%s already exists" % destination)
+    _copy(origin, destination)
+    return 'copy'
+
+
+def unstage(origin, destination, method):
+    """ Undo a stage: a renamed file is moved back, the others removed """
+    if method == 'rename':
+        os.rename(destination, origin)
+    else:
+        os.remove(destination)
@@ -0,0 +1,132 @@
+import csv
+import datetime
+import json
+import os
+
+FIELDS = ['file', 'bytes', 'triples', 'transfer_seconds', 'ingest_seconds',
+          'bytes_per_second', 'triples_per_second']
+MB = 1024.0 * 1024
+
+
+def file_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return 0
+
+
+def _rate(amount, seconds):
+    if amount is None or not seconds:
+        return None
+    return amount / seconds
+
+
+class LoadReport(object):
+    """ Time each file took to load: sending it to the server's directory
+    (transfer) and running TTLP on it (ingest), with its size and the
+    triples it added to the graph """
+
+    def __init__(self):
+        self.files = {}
+        # wall time of the whole load, and triples it added to the graph
+        self.seconds = None
+        self.triples = None
+
+    def __len__(self):
+        return len(self.files)
+
+    def add(self, name, size, transfer_seconds, ingest_seconds):
+        """ Add the timing of a file, or of a chunk of it """
+        record = self.files.setdefault(name, {'file': name,
+                                              'bytes': 0,
+                                              'triples': None,
+                                              'transfer_seconds': 0.0,
+                                              'ingest_seconds': 0.0})
+        record['bytes'] += size
+        record['transfer_seconds'] += transfer_seconds
+        record['ingest_seconds'] += ingest_seconds
+
+    def merge(self, source, target):
+        """ Add the timing recorded for source (a chunk) to target """
+        record = self.files.pop(source, None)
+        if record is not None:
+            self.add(target, record['bytes'], record['transfer_seconds'],
+                     record['ingest_seconds'])
+
+    def set_triples(self, name, triples):
+        if name in self.files:
+            self.files[name]['triples'] = triples
+
+    def records(self):
+        """ Records of the files, slowest first, with their throughput """
+        records = []
+        for record in self.files.values():
+            record = dict(record)
+            seconds = record['transfer_seconds'] + record['ingest_seconds']
+            record['bytes_per_second'] = _rate(record['bytes'], seconds)
+            record['triples_per_second'] = _rate(record['triples'], seconds)
+            records.append(record)
+        return sorted(records, key=lambda record: -(
+                                            record['transfer_seconds'] +
+                                            record['ingest_seconds']))
+
+    def summary(self):
+        """ One line with the totals and the throughput of the load """
+        size = sum([record['bytes'] for record in self.files.values()])
+        line = "- Loaded %.1f MB in %s" % (
+                                size / MB,
+                                datetime.timedelta(seconds=int(self.seconds)))
+        if self.seconds:
+            line += " (%.1f MB/s" % (size / MB / self.seconds)
+            if self.triples is not None:
+                line += ", %d triples/s" % (self.triples / self.seconds)
+            line += ")"
+        if self.triples is not None:
+            line += ", %d triple(s) added" % self.triples
+        return line + "; transfer %.1fs, ingest %.1fs" % (
+                    sum([record['transfer_seconds']
+                         for record in self.files.values()]),
+                    sum([record['ingest_seconds']
+                         for record in self.files.values()]))
+
+    def details(self):
+        """ One line per file, slowest first """
+        lines = []
+        for record in self.records():
+            line = "  %s: %.1f MB, transfer %.2fs, ingest %.2fs" % (
+                                                record['file'],
+                                                record['bytes'] / MB,
+                                                record['transfer_seconds'],
+                                                record['ingest_seconds'])
+            if record['bytes_per_second'] is not None:
+                line += ", %.1f MB/s" % (record['bytes_per_second'] / MB)
+            if record['triples'] is not None:
+                line += ", %d triple(s)" % record['triples']
+            lines.append(line)
+        return "\n".join(lines)
+
+    def write(self, directory, now=None):
+        """ Write the report in directory as load-<timestamp>.json and .csv
+        and return their paths """
+        name = os.path.join(os.path.abspath(directory), "load-%s" % (
+                    (now or datetime.datetime.now()).strftime("%Y%m%d%H%M%S")))
+        records = self.records()
+        f = open(name + ".json", 'w')
+        try:
+            json.dump({'seconds': self.seconds,
+                       'triples': self.triples,
+                       'bytes': sum([record['bytes'] for record in records]),
+                       'files': records},
+                      f,
+                      indent=2,
+                      sort_keys=True)
+        finally:
+            f.close()
+        f = open(name + ".csv", 'wb')
+        try:
+            writer = csv.DictWriter(f, FIELDS)
+            writer.writerow(dict(zip(FIELDS, FIELDS)))
+            for record in records:
+                writer.writerow(record)
+        finally:
+            f.close()
+        return name + ".json", name + ".csv"
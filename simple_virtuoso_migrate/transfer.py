@@ -0,0 +1,174 @@
+import hashlib
+import os
+import pipes
+import tempfile
+import zlib
+
+# files are cut in chunks after the lines whose crc32 ends with MASK_BITS
+# zero bits, so a line inserted or removed only changes the chunk around it
+# (fixed size blocks would all shift). Chunks are kept between MIN and MAX
+MASK_BITS = 9
+MIN_CHUNK_SIZE = 16 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+# smaller files are sent whole
+DELTA_MIN_SIZE = 1024 * 1024
+
+# run on the remote host (python 2 or 3, standard library only): print the
+# md5 of the file and then the md5, offset and size of each chunk
+SIGNATURES_SCRIPT = """\
+import hashlib, sys, zlib
+f = open(sys.argv[1], "rb")
+total = hashlib.md5()
+chunk = hashlib.md5()
+offset = size = 0
+lines = []
+for line in f:
+    total.update(line)
+    chunk.update(line)
+    size += len(line)
+    if size >= %(max)d or (size >= %(min)d and zlib.crc32(line) & %(mask)d == 0):
+        lines.append("%%s %%d %%d" %% (chunk.hexdigest(), offset, size))
+        offset += size
+        size = 0
+        chunk = hashlib.md5()
+if size:
+    lines.append("%%s %%d %%d" %% (chunk.hexdigest(), offset, size))
+sys.stdout.write("SIGNATURES %%s\\n" %% total.hexdigest())
+sys.stdout.write("\\n".join(lines) + "\\n")
+""" % {'max': MAX_CHUNK_SIZE, 'min': MIN_CHUNK_SIZE,
+       'mask': (1 << MASK_BITS) - 1}
+
+# run on the remote host: rebuild the file from its previous version and a
+# delta ("C offset size" copies from the previous version, "L size" is
+# followed by the bytes to write), replace it and print its md5
+PATCH_SCRIPT = """\
+import hashlib, os, sys
+old = open(sys.argv[1], "rb")
+delta = open(sys.argv[2], "rb")
+new = open(sys.argv[1] + ".new", "wb")
+md5 = hashlib.md5()
+for op in iter(delta.readline, b""):
+    fields = op.split()
+    if fields[0] == b"C":
+        old.seek(int(fields[1]))
+        data = old.read(int(fields[2]))
+    else:
+        data = delta.read(int(fields[1]))
+    md5.update(data)
+    new.write(data)
+new.close()
+old.close()
+delta.close()
+os.remove(sys.argv[2])
+os.rename(sys.argv[1] + ".new", sys.argv[1])
+sys.stdout.write("PATCHED %s\\n" % md5.hexdigest())
+"""
+
+
+def chunks(f):
+    """ Yield the content of each chunk of a file, cut the same way
+    SIGNATURES_SCRIPT does """
+    mask = (1 << MASK_BITS) - 1
+    lines = []
+    size = 0
+    for line in f:
+        lines.append(line)
+        size += len(line)
+        if size >= MAX_CHUNK_SIZE or (size >= MIN_CHUNK_SIZE and
+                                      zlib.crc32(line) & mask == 0):
+            yield "".join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield "".join(lines)
+
+
+def file_md5(path):
+    md5 = hashlib.md5()
+    f = open(path, 'rb')
+    try:
+        for data in iter(lambda: f.read(1024 * 1024), ""):
+            md5.update(data)
+    finally:
+        f.close()
+    return md5.hexdigest()
+
+
+def _python(script, *args):
+    """ Shell command running a script with the remote python """
+    command = " ".join([pipes.quote(arg) for arg in ("-c", script) + args])
+    return "python3 %s 2>/dev/null || python %s" % (command, command)
+
+
+def remote_signatures(connection, remote_path):
+    """ Get the md5 of the remote file and {chunk md5: (offset, size)}, or
+    (None, None) when there is no file (or no python) there, or when what
+    the script printed can't be read """
+    output = connection.execute(_python(SIGNATURES_SCRIPT, remote_path))
+    if not output or not output[0].startswith("SIGNATURES "):
+        return None, None
+    signatures = {}
+    try:
+        for line in output[1:]:
+            # an empty file has no chunks, only a blank line
+            if not line.strip():
+                continue
+            md5, offset, size = line.split()
+            signatures.setdefault(md5, (int(offset), int(size)))
+        return output[0].split()[1], signatures
+    except (ValueError, IndexError):
+        return None, None
+
+
+def write_delta(local_path, signatures, delta_file):
+    """ Write the delta of a local file against the remote chunks and
+    return the number of bytes sent as literals """
+    literal_size = 0
+    f = open(local_path, 'rb')
+    try:
+        for chunk in chunks(f):
+            md5 = hashlib.md5(chunk).hexdigest()
+            if md5 in signatures:
+                delta_file.write("C %d %d\n" % signatures[md5])
+            else:
+                delta_file.write("L %d\n" % len(chunk))
+                delta_file.write(chunk)
+                literal_size += len(chunk)
+    finally:
+        f.close()
+    return literal_size
+
+
+def send_file(connection, local_path, remote_path):
+    """ Send a file, or only what changed since the version already at
+    remote_path. Returns how: unchanged, delta or sftp """
+    size = os.path.getsize(local_path)
+    if size >= DELTA_MIN_SIZE:
+        remote_md5, signatures = remote_signatures(connection, remote_path)
+        if remote_md5 is not None:
+            local_md5 = file_md5(local_path)
+            if remote_md5 == local_md5:
+                return 'unchanged'
+            if _send_delta(connection, local_path, remote_path, signatures,
+                           local_md5):
+                return 'delta'
+    connection.put(local_path, remote_path)
+    return 'sftp'
+
+
+def _send_delta(connection, local_path, remote_path, signatures, local_md5):
+    delta_file = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        literal_size = write_delta(local_path, signatures, delta_file)
+        delta_file.close()
+        if literal_size >= os.path.getsize(local_path) / 2:
+            # most of the file changed
+            return False
+        remote_delta = remote_path + ".delta"
+        connection.put(delta_file.name, remote_delta)
+        output = connection.execute(_python(PATCH_SCRIPT, remote_path,
+                                            remote_delta))
+        return bool(output) and output[0].split() == ["PATCHED", local_md5]
+    finally:
+        delta_file.close()
+        os.remove(delta_file.name)
@@ -0,0 +1,123 @@
+import os
+import re
+import sys
+import urllib
+from StringIO import StringIO
+
+from rdflib.plugins.parsers.notation3 import (BadSyntax, Formula, RDFSink,
+                                              SinkParser)
+
+from compression import open_file
+from splitter import DIRECTIVE, _Scanner
+
+# a whole triple in a line, the way N-Triples and most dumps are written:
+# checked without the (much slower) parser
+_IRI = r'<[^<>"{}|^`\\\x00-\x20]*>'
+_BNODE = r'_:[A-Za-z0-9_]+'
+_LITERAL = (r'"(?:[^"\\\n\r]|\\[tbnrf"\'\\]|\\u[0-9A-Fa-f]{4}|'
+            r'\\U[0-9A-Fa-f]{8})*"(?:@[a-zA-Z]+(?:-[a-zA-Z0-9]+)*|\^\^' +
+            _IRI + ')?')
+TRIPLE = re.compile(r'\s*(?:%(iri)s|%(bnode)s)\s+%(iri)s\s+'
+                    r'(?:%(iri)s|%(bnode)s|%(literal)s)\s*\.\s*$' % {
+                                'iri': _IRI,
+                                'bnode': _BNODE,
+                                'literal': _LITERAL})
+
+
+class _NullFormula(Formula):
+    """ A formula without a graph to keep its triples """
+
+    def __init__(self):
+        Formula.number += 1
+        self.number = Formula.number
+        self.counter = 0
+        self.existentials = {}
+        self.universals = {}
+
+
+class NullSink(RDFSink):
+    """ Parser sink counting the triples instead of keeping them """
+
+    def __init__(self):
+        RDFSink.__init__(self, None)
+        self.triples = 0
+
+    def newFormula(self):
+        return _NullFormula()
+
+    def makeStatement(self, quadruple, why=None):
+        self.triples += 1
+
+
+def _feed(parser, text, first_line, errors):
+    parser.lines = first_line - 1
+    try:
+        parser.feed(text)
+    except BadSyntax, e:
+        errors.append((e.lines + 1, e._why))
+    except Exception, e:
+        errors.append((first_line, unicode(e)))
+
+
+def validate_file(path):
+    """ Check the syntax of a turtle file, compressed or not, reading it
+    statement by statement so an error only skips its statement. Returns the
+    number of triples and the errors as (line, message) """
+    sink = NullSink()
+    parser = SinkParser(sink, baseURI="file://" + urllib.pathname2url(
+                                                    os.path.abspath(path)))
+    parser.startDoc()
+    scanner = _Scanner(labels=True)
+    errors = []
+    statement = []
+    first_line = 1
+    # the parser prints the character it stopped at
+    stdout, sys.stdout = sys.stdout, StringIO()
+    f = open_file(path)
+    try:
+        for number, line in enumerate(f, 1):
+            if not statement:
+                if not line.strip() or line.lstrip().startswith('#'):
+                    continue
+                if TRIPLE.match(line):
+                    try:
+                        line.decode('utf-8')
+                        sink.triples += 1
+                        continue
+                    except UnicodeDecodeError:
+                        pass
+                first_line = number
+                directive = DIRECTIVE.match(line)
+                if directive:
+                    if not directive.group(1).startswith('@'):
+                        # sparql style, unknown to the parser
+                        line = "@%s%s .\n" % (directive.group(1).lower(),
+                                               line[directive.end():].strip())
+                    _feed(parser, line, first_line, errors)
+                    continue
+            statement.append(line)
+            if scanner.scan(line):
+                _feed(parser, "".join(statement), first_line, errors)
+                statement = []
+        if statement:
+            _feed(parser, "".join(statement), first_line, errors)
+    finally:
+        f.close()
+        sys.stdout = stdout
+    return sink.triples, errors
+
+
+def validate_files(files):
+    """ Validate the files in parallel, one process per CPU. Returns
+    {file: (triples, errors)} """
+    if len(files) < 2:
+        results = [validate_file(path) for path in files]
+    else:
+        from multiprocessing import Pool
+        pool = Pool()
+        try:
+            results = pool.map(validate_file, files, 1)
+        finally:
+            pool.close()
+            pool.join()
+    return dict(zip(files, results))
@@ -1,17 +1,32 @@
 # -*- coding: utf-8 -*-
 
+# rdflib, GitPython and paramiko are slow to import, so they are only
+# imported by the methods that need them
+
+from capabilities import CapabilityStore, CAPABILITIES_TTL
+from compression import compression, decompress, read_file, uncompressed_name
 from core.exceptions import MigrationException
-from git import Git
 from helpers import Utils
-from rdflib.graph import ConjunctiveGraph, Graph
-from rdflib.plugins.parsers.notation3 import BadSyntax
+from latency import LatencyReport, split_statements
+from literals import normalize_graph
+from scheduler import BatchScheduler
+from skolem import genid_base, skolemize
+from splitter import split_ttl
+from staging import stage, unstage
+from throughput import LoadReport, file_size
+from transfer import send_file
 import datetime
+import errno
+import gzip
+import hashlib
 import logging
 import os
-import rdflib
+import pipes
 import shutil
-import ssh
 import subprocess
+import tempfile
+import threading
+import time
 
 logging.basicConfig()
 
@@ -20,8 +35,122 @@ ISQL_CMD = 'echo "%s" | %s -b %d'
 ISQL_CMD_WITH_FILE = '%s -b %d < "%s"'
 ISQL_UP = "set echo on;\n\
             DB.DBA.TTLP_MT_LOCAL_FILE('%(ttl)s', '', '%(graph)s');"
+# Virtuoso reads gzip files itself
+ISQL_UP_GZ = "set echo on;\n\
+            DB.DBA.TTLP(gz_file_open('%(ttl)s'), '', '%(graph)s');"
 ISQL_DOWN = "SPARQL CLEAR GRAPH <%(graph)s>;"
-ISQL_SERVER = "select server_root();"
+# --replace loads the files here first, then moves them to the graph
+REPLACE_STAGING_GRAPH = "urn:simple-virtuoso-migrate:staging:%s"
+# one row with the capabilities separated by "|": server_root, DirsAllowed,
+# version and whether the bulk loader procedure exists
+ISQL_SERVER = ("select sprintf('%s|%s|%s|%d', server_root(), "
+               "coalesce(virtuoso_ini_item_value('Parameters', 'DirsAllowed'), ''), "
+               "sys_stat('st_dbms_ver'), "
+               "case when __proc_exists('DB.DBA.rdf_loader_run') is null "
+               "then 0 else 1 end);")
+# bulk mode: statements are committed one by one without writing the
+# transaction log, and automatic checkpoints are suspended until a single
+# one at the end (checkpoint_interval returns the interval it replaces)
+ISQL_BULK = "log_enable(2, 1);\n"
+ISQL_COUNT = "SPARQL SELECT COUNT(*) FROM <%(graph)s> WHERE { ?s ?p ?o };"
+ISQL_SUSPEND_CHECKPOINTS = "select checkpoint_interval(-1);"
+ISQL_CHECKPOINT = "checkpoint;\ncheckpoint_interval(%d);"
+# with more than one parallel load, files bigger than this (in MB) are
+# split in chunks loaded in parallel
+LOAD_CHUNK_SIZE = 256
+# files of different graphs are loaded in parallel, this many at a time,
+# even with a single parallel load
+GRAPH_STREAMS = 4
+# pages of subjects, each one starting after the last subject of the page
+# before (by its text, as blank nodes and IRIs don't sort the same way), so
+# no page has to sort and skip the ones before it. Virtuoso only pages a
+# sorted result reliably through a sub-select
+LIVE_GRAPH_QUERY = """\
+SELECT ?k ?s ?p ?o WHERE {
+{ SELECT ?s ?k WHERE {
+  { SELECT DISTINCT ?s (STR(?s) AS ?k) WHERE {
+    GRAPH <%(graph)s> { ?s ?p ?o } %(filter)s } ORDER BY ?k }
+  } LIMIT %(limit)d }
+GRAPH <%(graph)s> { ?s ?p ?o } %(objects)s
+}"""
+LIVE_GRAPH_PAGE_SIZE = 1000
+# ResultSetMaxRows of the stock virtuoso.ini: the server silently cuts a
+# result at that many rows, so a page that big is asked again with half the
+# subjects
+RESULT_MAX_ROWS = 10000
+# --export: the server writes the graph in files of about this size (in MB)
+# in its directory (gzipped if asked: a gzip member per write), which are
+# then fetched by this many parallel sftp gets
+EXPORT_SEGMENT_SIZE = 100
+EXPORT_FETCHES = 4
+ISQL_DUMP_PROCEDURE = """\
+CREATE PROCEDURE DB.DBA.SVM_DUMP_GRAPH (IN graph VARCHAR, IN prefix VARCHAR,
+                                        IN segment_size INTEGER,
+                                        IN compressed INTEGER)
+{
+  DECLARE env, ses ANY;
+  DECLARE segment, segment_len, written INTEGER;
+  SET ISOLATION = 'uncommitted';
+  segment := 1;
+  segment_len := 0;
+  written := 0;
+  env := vector (dict_new (16000), 0, '', '', '', 0, 0, 0, 0, 0);
+  ses := string_output ();
+  FOR (SELECT * FROM (SPARQL DEFINE input:storage "" SELECT ?s ?p ?o
+       { GRAPH `iri(?:graph)` { ?s ?p ?o } }) AS sub OPTION (LOOP)) DO
+    {
+      http_ttl_triple (env, "s", "p", "o", ses);
+      IF (length (ses) > 10000000)
+        {
+          segment_len := segment_len + length (ses);
+          IF (segment_len > segment_size)
+            http (' .\n', ses);
+          DB.DBA.SVM_WRITE_SEGMENT (prefix, segment, ses, compressed);
+          written := segment;
+          IF (segment_len > segment_size)
+            {
+              segment := segment + 1;
+              segment_len := 0;
+              env := vector (dict_new (16000), 0, '', '', '', 0, 0, 0, 0, 0);
+            }
+          ses := string_output ();
+        }
+    }
+  IF (length (ses))
+    {
+      http (' .\n', ses);
+      DB.DBA.SVM_WRITE_SEGMENT (prefix, segment, ses, compressed);
+      written := segment;
+    }
+  RETURN written;
+};
+"""
+ISQL_WRITE_SEGMENT_PROCEDURE = """\
+CREATE PROCEDURE DB.DBA.SVM_WRITE_SEGMENT (IN prefix VARCHAR,
+                                           IN segment INTEGER, IN ses ANY,
+                                           IN compressed INTEGER)
+{
+  IF (compressed)
+    string_to_file (sprintf ('%s%06d.ttl.gz', prefix, segment),
+                    gz_compress (string_output_string (ses)), -1);
+  ELSE
+    string_to_file (sprintf ('%s%06d.ttl', prefix, segment), ses, -1);
+};
+"""
+ISQL_DUMP = "select DB.DBA.SVM_DUMP_GRAPH('%(graph)s', '%(prefix)s', "\
+            "%(segment_size)d, %(compressed)d);"
+# fallback when the server can't dump the graph: pages of subjects, so all
+# the triples of a subject come in the same page (paged outside the sorted
+# sub-select, see LIVE_GRAPH_QUERY), cut at RESULT_MAX_ROWS like the pages
+# of the live graph
+EXPORT_PAGE_QUERY = """\
+CONSTRUCT { ?s ?p ?o } WHERE {
+{ SELECT ?s WHERE {
+  { SELECT DISTINCT ?s WHERE { GRAPH <%(graph)s> { ?s ?p ?o } } ORDER BY ?s }
+  } LIMIT %(limit)d OFFSET %(offset)d }
+GRAPH <%(graph)s> { ?s ?p ?o }
+}"""
+EXPORT_PAGE_SIZE = 1000
 
 
 class Virtuoso(object):
@@ -40,12 +169,67 @@ class Virtuoso(object):
         self.__virtuoso_graph = config.get("database_graph")
         self.__virtuoso_ontology = config.get("database_ontology")
         self._migrations_dir = config.get("database_migrations_dir")
+        self.__target_latency = config.get("target_latency", None)
+        self.__max_rate = config.get("max_statements_per_second", None)
+        self.__bulk = config.get("bulk", False)
+        self.__load_parallel = int(config.get("load_parallel", None) or 1)
+        self.__load_chunk_size = int(float(config.get("load_chunk_size", None)
+                                           or LOAD_CHUNK_SIZE) * 1024 * 1024)
+        self.__export_segment_size = int(float(
+                                config.get("export_segment_size", None) or
+                                EXPORT_SEGMENT_SIZE) * 1024 * 1024)
+        # prefix of the IRIs replacing blank nodes, when skolemizing
+        self.skolem_base = None
+        if config.get("skolemize", False):
+            self.skolem_base = genid_base(self.__virtuoso_graph)
+        self._capabilities = None
+        self._capability_store = None
+        self._git_reader = None
+        self._ssh = None
+        self._ssh_lock = threading.Lock()
+        # files put in the server directory: name -> (origin, path, method)
+        self._staged = {}
+        self._staging_methods = []
+        # timing of the last upload_ttls_to_virtuoso
+        self.load_report = None
+        # set by long running callers (see Migrator) to keep the ssh
+        # connection open between uploads and to share parsed ontologies
+        self.keep_connections = False
+        self.ontology_cache = None
+        if config.get("cache_dir", None):
+            self._capability_store = CapabilityStore(
+                                    config.get("cache_dir"),
+                                    int(config.get("capabilities_ttl",
+                                                   CAPABILITIES_TTL)))
 
+    @property
+    def _virtuoso_dir(self):
         if self.__virtuoso_dirs_allowed:
-            self._virtuoso_dir = os.path.realpath(self.__virtuoso_dirs_allowed)
-        else:
-            self._virtuoso_dir = self._run_isql(ISQL_SERVER)[0].split(
-                                                                    '\n\n')[-2]
+            return os.path.realpath(self.__virtuoso_dirs_allowed)
+        return self.get_capabilities()['server_root']
+
+    def get_capabilities(self):
+        """ Get server_root, DirsAllowed, version and whether the bulk
+        loader is available. The server is only asked the first time (or
+        when the entry in the cache dir is expired) """
+        if self._capabilities is None and self._capability_store:
+            self._capabilities = self._capability_store.get(
+                                                    self.__virtuoso_host,
+                                                    self.__virtuoso_port)
+        if self._capabilities is None:
+            row = self._run_isql(ISQL_SERVER)[0].split('\n\n')[-2].strip()
+            server_root, dirs_allowed, version, bulk_loader = row.split('|')
+            self._capabilities = {
+                'server_root': server_root,
+                'dirs_allowed': [directory.strip() for directory in
+                                 dirs_allowed.split(',') if directory.strip()],
+                'version': version,
+                'bulk_loader': bulk_loader == '1'}
+            if self._capability_store:
+                self._capability_store.put(self.__virtuoso_host,
+                                           self.__virtuoso_port,
+                                           self._capabilities)
+        return self._capabilities
 
     def _run_isql(self, cmd, archive=False):
         conn = ISQL % (self.__virtuoso_user,
@@ -65,54 +249,282 @@ class Virtuoso(object):
             raise Exception(stderr_value)
         return stdout_value, stderr_value
 
-    def _copy_ttl_to_virtuoso_dir(self, ttl):
+    @staticmethod
+    def _staged_name(path, source=None, attempt=0):
+        """ Name of a file in the server directory, unique for the path of
+        the file it comes from (source, for chunks and temporary copies):
+        files with the same name in different directories are loaded in the
+        same run, even at the same time. The extension is kept, TTLP
+        reading gzip files by it """
+        digest = hashlib.md5(os.path.abspath(source or path)).hexdigest()[:8]
+        if attempt:
+            digest += "-%d" % attempt
+        return "%s-%s" % (digest, os.path.basename(path))
+
+    def _copy_ttl_to_virtuoso_dir(self, ttl, source=None):
         _, fixture_file = os.path.split(ttl)
 
         if self._is_local() or self.__virtuoso_dirs_allowed:
             origin = os.path.realpath(ttl)
-            dest = os.path.realpath(os.path.join(self._virtuoso_dir,
-                                                 fixture_file))
-            if origin != dest:
-                shutil.copyfile(origin, dest)
+            if os.path.dirname(origin) == os.path.realpath(self._virtuoso_dir):
+                # already in the directory
+                return fixture_file
+            attempt = 0
+            while True:
+                fixture_file = Virtuoso._staged_name(ttl, source, attempt)
+                dest = os.path.join(os.path.realpath(self._virtuoso_dir),
+                                    fixture_file)
+                try:
+                    method = stage(origin, dest)
+                    break
+                except OSError, e:
+                    # left by an interrupted load, or staged by another one
+                    if e.errno != errno.EEXIST:
+                        raise
+                    attempt += 1
+            self._staged[fixture_file] = (origin, dest, method)
+            self._staging_methods.append(method)
         else:
-            s = ssh.Connection(host=self.__virtuoso_host,
-                               username=self.__host_user,
-                               password=self.__host_passwd)
-            s.put(ttl, os.path.join(self._virtuoso_dir, fixture_file))
-            s.close()
+            virtuoso_dir = self._virtuoso_dir
+            # the same for every upload of the file, so only what changed is
+            # sent the next time
+            fixture_file = Virtuoso._staged_name(ttl, source)
+            # parallel loads share the connection
+            with self._ssh_lock:
+                # the previous upload is kept there, only what changed
+                # since is sent
+                method = send_file(self._ssh_connection(), ttl,
+                                   os.path.join(virtuoso_dir, fixture_file))
+                if not self.keep_connections:
+                    self.close()
+            self._staging_methods.append(method)
         return fixture_file
 
+    def _ssh_connection(self):
+        if self._ssh is None:
+            import ssh
+            self._ssh = ssh.Connection(host=self.__virtuoso_host,
+                                       username=self.__host_user,
+                                       password=self.__host_passwd)
+        return self._ssh
+
+    def close(self):
+        """ Close the ssh connection, if one was kept open """
+        if self._ssh is not None:
+            self._ssh.close()
+            self._ssh = None
+
     def _is_local(self):
         return self.__virtuoso_host.lower() in ["localhost", "127.0.0.1"]
 
     def _remove_ttl_from_virtuoso_dir(self, ttl):
-        ttl_path = os.path.join(self._virtuoso_dir, ttl)
-        os.remove(ttl_path)
-
-    def _upload_single_ttl_to_virtuoso(self, fixture):
-        fixture = self._copy_ttl_to_virtuoso_dir(fixture)
-        file_to_upload = os.path.join(self._virtuoso_dir, fixture)
-        isql_up = ISQL_UP % {"ttl": file_to_upload,
-                             "graph": self.__virtuoso_graph}
-        out, err = self._run_isql(isql_up)
+        """ Undo the staging of a file (files already in the directory are
+        left alone) """
+        staged = self._staged.pop(ttl, None)
+        if staged:
+            unstage(*staged)
 
-        if self._is_local() or self.__virtuoso_dirs_allowed:
-            self._remove_ttl_from_virtuoso_dir(fixture)
+    def _upload_single_ttl_to_virtuoso(self, fixture, graph=None, source=None):
+        """ Load a file, or a chunk of source, into the graph """
+        name = fixture
+        started = time.time()
+        local_dir = None
+        if self.skolem_base:
+            local_dir = tempfile.mkdtemp()
+            fixture = self._write_skolemized_ttl(fixture, local_dir)
+        elif compression(fixture) not in (None, '.gz'):
+            # other compressions are decompressed here, streaming
+            local_dir = tempfile.mkdtemp()
+            fixture = decompress(fixture, local_dir)
+        try:
+            fixture = self._copy_ttl_to_virtuoso_dir(fixture, source or name)
+            try:
+                file_to_upload = os.path.join(self._virtuoso_dir, fixture)
+                isql_up = (ISQL_UP_GZ if compression(fixture) else
+                           ISQL_UP) % {"ttl": file_to_upload,
+                                       "graph": graph or
+                                                self.__virtuoso_graph}
+                if self.__bulk:
+                    isql_up = ISQL_BULK + isql_up
+                transferred = time.time()
+                out, err = self._run_isql(isql_up)
+            finally:
+                # a renamed file goes back where it was even if the load
+                # failed
+                if self._is_local() or self.__virtuoso_dirs_allowed:
+                    self._remove_ttl_from_virtuoso_dir(fixture)
+        finally:
+            if local_dir:
+                shutil.rmtree(local_dir)
+        if self.load_report is not None:
+            self.load_report.add(name, file_size(name),
+                                 transferred - started,
+                                 time.time() - transferred)
         return out, err
 
-    def upload_ttls_to_virtuoso(self, full_path_files):
+    def _write_skolemized_ttl(self, ttl, directory):
+        """ Write a copy of a ttl file with its blank nodes skolemized (as
+        N-Triples, which TTLP reads too) and with the same name, without
+        its compression extension """
+        graph = Virtuoso._parse_ontology(self.get_ontology_from_file(ttl),
+                                         self.skolem_base)
+        skolemized = os.path.join(directory,
+                                  os.path.basename(uncompressed_name(ttl)))
+        f = open(skolemized, 'w')
+        f.write(graph.serialize(format='nt'))
+        f.close()
+        return skolemized
+
+    def upload_ttls_to_virtuoso(self, full_path_files, execution_log=None,
+                                graph=None, graphs=None):
+        """ Load the files into the database graph, or into another graph
+        if one is given, or into the graph graphs ({file: graph}) gives
+        each of them. Files of different graphs are loaded in parallel """
+        graphs = dict([(fname, (graphs or {}).get(fname) or graph or
+                                                    self.__virtuoso_graph)
+                       for fname in full_path_files])
+        targets = (sorted(set(graphs.values())) or
+                   [graph or self.__virtuoso_graph])
         response_dict = {}
-        for fname in full_path_files:
-            response_dict[fname] = self._upload_single_ttl_to_virtuoso(fname)
+        self._staging_methods = []
+        self.load_report = LoadReport()
+        started = time.time()
+        first_counts = dict([(target, self._count_triples(target))
+                             for target in targets])
+        counts = dict(first_counts)
+        parallel = max(self.__load_parallel,
+                       min(len(targets), GRAPH_STREAMS))
+        if parallel > 1:
+            response_dict = self._upload_ttls_in_parallel(full_path_files,
+                                                          graphs,
+                                                          parallel)
+            counts = dict([(target, self._count_triples(target))
+                           for target in targets])
+        else:
+            # loaded one at a time, the triples each file adds are counted
+            # too
+            for fname in full_path_files:
+                target = graphs[fname]
+                response_dict[fname] = \
+                        self._upload_single_ttl_to_virtuoso(fname, target)
+                previous = counts[target]
+                counts[target] = self._count_triples(target)
+                if None not in (previous, counts[target]):
+                    self.load_report.set_triples(fname,
+                                                 counts[target] - previous)
+        self.load_report.seconds = time.time() - started
+        if None not in first_counts.values() + counts.values():
+            self.load_report.triples = sum([counts[target] -
+                                            first_counts[target]
+                                            for target in targets])
+        if execution_log is not None:
+            counts = {}
+            for method in self._staging_methods:
+                counts[method] = counts.get(method, 0) + 1
+            if counts:
+                execution_log("- Files staged by %s" % ", ".join(
+                                    ["%s: %d" % (method, count)
+                                     for method, count in sorted(
+                                                        counts.items())]),
+                              "GREEN",
+                              log_level_limit=1)
+            execution_log(self.load_report.summary(), "GREEN",
+                          log_level_limit=1)
+            execution_log(self.load_report.details(), log_level_limit=2)
         return response_dict
 
+    def _upload_ttls_in_parallel(self, full_path_files, graphs, parallel):
+        """ Load the files (and the chunks of the big ones) from a thread
+        pool, each one with its own TTLP call. The outputs and errors of the
+        chunks of a file are joined in the response of the file """
+        from multiprocessing.pool import ThreadPool
+        chunks_dir = tempfile.mkdtemp()
+        pool = ThreadPool(parallel)
+        try:
+            jobs = []
+            for number, fname in enumerate(full_path_files):
+                # files with the same name (data.ttl in two directories, or
+                # data.ttl and data.ttl.gz) give chunks with the same names
+                file_chunks_dir = os.path.join(chunks_dir, str(number))
+                os.mkdir(file_chunks_dir)
+                for chunk in split_ttl(fname, self.__load_chunk_size,
+                                       file_chunks_dir):
+                    jobs.append((fname, chunk, graphs[fname]))
+            # largest first, handing them out one by one, so the longest
+            # loads don't start last
+            jobs.sort(key=lambda job: -os.path.getsize(job[1]))
+            results = pool.map(
+                    lambda job: self._upload_single_ttl_to_virtuoso(job[1],
+                                                                    job[2],
+                                                                    job[0]),
+                    jobs,
+                    1)
+        finally:
+            pool.close()
+            pool.join()
+            shutil.rmtree(chunks_dir)
+        outputs = {}
+        for (fname, chunk, _), (out, err) in zip(jobs, results):
+            if chunk != fname:
+                self.load_report.merge(chunk, fname)
+            outputs.setdefault(fname, ([], []))
+            outputs[fname][0].append(out)
+            if err:
+                outputs[fname][1].append(err)
+        response_dict = {}
+        for fname, (outs, errs) in outputs.items():
+            response_dict[fname] = ("\n".join(outs), "\n".join(errs))
+        return response_dict
+
+    def staging_graph(self, graph=None):
+        """ Graph --replace loads the files into before moving them to the
+        database graph (or to the given graph) """
+        return REPLACE_STAGING_GRAPH % (graph or self.__virtuoso_graph)
+
+    def clear_graph(self, graph):
+        self._run_isql(ISQL_DOWN % {'graph': graph})
+
+    def _count_triples(self, graph=None):
+        """ Triples in the graph, or None if isql gave no count """
+        out, _ = self._run_isql(ISQL_COUNT % {
+                            'graph': graph or self.__virtuoso_graph})
+        try:
+            return int(out.split('\n\n')[-2].strip())
+        except (IndexError, ValueError):
+            return None
+
+    def begin_bulk(self):
+        """ In bulk mode, suspend the automatic checkpoints and return the
+        interval to restore at the end of the run """
+        if not self.__bulk:
+            return None
+        out, _ = self._run_isql(ISQL_SUSPEND_CHECKPOINTS)
+        return int(out.split('\n\n')[-2].strip())
+
+    def end_bulk(self, checkpoint_interval):
+        """ Make the single checkpoint of a bulk run and restore the
+        automatic ones """
+        if checkpoint_interval is not None:
+            self._run_isql(ISQL_CHECKPOINT % checkpoint_interval)
+
+    def _script_header(self):
+        if self.__bulk:
+            return "set echo on;\n" + ISQL_BULK
+        return "set echo on;\n"
+
     def execute_change(self, sparql_up, sparql_down, execution_log=None):
-        """ Final Step. Execute the changes to the Database """
+        """ Final Step. Execute the changes to the Database. Returns the
+        latency of the statements as reported by isql """
+        if self.__target_latency:
+            return self._execute_change_in_batches(sparql_up, sparql_down,
+                                                   execution_log)
+        return self._execute_change(sparql_up, sparql_down, execution_log)
 
+    def _execute_change(self, sparql_up, sparql_down, execution_log=None):
         file_up = None
         file_down = None
         try:
-            file_up = Utils.write_temporary_file(("set echo on;\n%s" %
+            file_up = Utils.write_temporary_file((self._script_header() +
                                                                     sparql_up),
                                                  "file_up")
 
@@ -137,6 +549,10 @@ class Virtuoso(object):
 
             if execution_log:
                 execution_log(stdout_value)
+            report = LatencyReport()
+            report.add_isql_output(stdout_value)
+            Virtuoso._log_latencies(report, execution_log)
+            return report
         finally:
             if file_up and os.path.exists(file_up):
                 os.unlink(file_up)
@@ -144,8 +560,66 @@ class Virtuoso(object):
             if file_down and os.path.exists(file_down):
                 os.unlink(file_down)
 
-    def get_current_version(self):
-        """ Get Virtuoso Database Graph Current Version """
+    def _execute_change_in_batches(self, sparql_up, sparql_down,
+                                   execution_log=None):
+        """ Execute the changes in batches sized after the latency of the
+        server (see BatchScheduler), rolling back all of them on error """
+        statements = split_statements(sparql_up)
+        scheduler = BatchScheduler(float(self.__target_latency),
+                                   self.__max_rate and
+                                   float(self.__max_rate))
+        report = LatencyReport()
+        report.batches = scheduler.batches
+
+        def execute_batch(batch):
+            file_up = Utils.write_temporary_file((self._script_header() +
+                                                        "\n".join(batch)),
+                                                 "file_up")
+            try:
+                stdout_value, _ = self._run_isql(file_up, True)
+            finally:
+                if os.path.exists(file_up):
+                    os.unlink(file_up)
+            if execution_log:
+                execution_log(stdout_value)
+            report.add_isql_output(stdout_value)
+
+        try:
+            scheduler.run(statements, execute_batch)
+        except Exception, e:
+            file_down = Utils.write_temporary_file(("set echo on;\n%s" %
+                                                                sparql_down),
+                                                   "file_down")
+            try:
+                self._run_isql(file_down, True)
+            except Exception, rollback_error:
+                raise MigrationException("\nerror executing migration "
+                                         "statement: %s\n\nRollback done "
+                                         "partially: error executing rollback "
+                                         "statement: %s" % (e, rollback_error))
+            finally:
+                if os.path.exists(file_down):
+                    os.unlink(file_down)
+            raise MigrationException("\nerror executing migration "
+                                     "statement: %s\n\nRollback done "
+                                     "successfully!!!" % e)
+        if execution_log:
+            execution_log("- %d statements executed in %d batches" %
+                                        (len(statements),
+                                         len(scheduler.batches)))
+        Virtuoso._log_latencies(report, execution_log)
+        return report
+
+    @staticmethod
+    def _log_latencies(report, execution_log):
+        if execution_log and len(report):
+            execution_log("\n===== latency =====\n%s" % report.summary(),
+                          log_level_limit=1)
+            execution_log(report.details())
+
+    def get_current_version(self, graph=None):
+        """ Get Virtuoso Database Graph Current Version, or the version of
+        the last load into another graph """
 
         query = """\
 prefix owl: <http://www.w3.org/2002/07/owl#>
@@ -160,8 +634,10 @@ where {?s owl:versionInfo ?version;
 <%(m_graph)sproduto> "%(v_graph)s";
 <%(m_graph)sorigen> ?origen.}
 ORDER BY desc(?data) LIMIT 1
-}}""" % {'m_graph': self.migration_graph, 'v_graph': self.__virtuoso_graph}
+}}""" % {'m_graph': self.migration_graph,
+         'v_graph': graph or self.__virtuoso_graph}
 
+        from rdflib.graph import Graph
         graph = Graph(store="SPARQLStore")
         graph.open(self.__virtuoso_endpoint, create=False)
         graph.store.baseURI = self.__virtuoso_endpoint
@@ -181,8 +657,173 @@ ORDER BY desc(?data) LIMIT 1
         else:
             return None, None
 
+    def query_endpoint(self, query):
+        """ Run a SPARQL query on the endpoint and return its rows """
+        from rdflib.graph import Graph
+        graph = Graph(store="SPARQLStore")
+        graph.open(self.__virtuoso_endpoint, create=False)
+        graph.store.baseURI = self.__virtuoso_endpoint
+        try:
+            return list(graph.query(query))
+        finally:
+            graph.close()
+
+    def export_graph(self, directory, compressed=False, execution_log=None):
+        """ Write the graph in files of about EXPORT_SEGMENT_SIZE MB in
+        directory and return their paths. The server dumps it in its
+        directory, from where the files are moved (local server) or fetched
+        in parallel; when it can't, the graph is read from the endpoint """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        prefix = "export-%s-" % datetime.datetime.now().strftime(
+                                                            "%Y%m%d%H%M%S")
+        try:
+            names = self._dump_graph(prefix, compressed)
+        except Exception, e:
+            if execution_log is not None:
+                execution_log("- The server could not dump the graph (%s), "
+                              "reading it from the endpoint" % e,
+                              "RED",
+                              log_level_limit=1)
+            return self._construct_graph(directory, prefix, compressed)
+        if self._is_local() or self.__virtuoso_dirs_allowed:
+            paths = []
+            for name in names:
+                paths.append(os.path.join(directory, name))
+                shutil.move(os.path.join(self._virtuoso_dir, name), paths[-1])
+            return paths
+        return self._fetch_files(names, directory)
+
+    def _dump_graph(self, prefix, compressed):
+        """ Have the server write the graph in its directory, returning the
+        names of the files """
+        script = Utils.write_temporary_file(
+                ISQL_WRITE_SEGMENT_PROCEDURE + ISQL_DUMP_PROCEDURE +
+                ISQL_DUMP % {'graph': self.__virtuoso_graph,
+                             'prefix': os.path.join(self._virtuoso_dir,
+                                                    prefix),
+                             'segment_size': self.__export_segment_size,
+                             'compressed': 1 if compressed else 0},
+                "export")
+        try:
+            out, _ = self._run_isql(script, True)
+        finally:
+            os.unlink(script)
+        segments = int(out.split('\n\n')[-2].strip())
+        extension = ".ttl.gz" if compressed else ".ttl"
+        return ["%s%06d%s" % (prefix, segment, extension)
+                for segment in range(1, segments + 1)]
+
+    def _fetch_files(self, names, directory):
+        """ Get the files from the server's directory with parallel sftp
+        gets, each one on its own channel of the shared connection, removing
+        them there """
+        from multiprocessing.pool import ThreadPool
+        with self._ssh_lock:
+            connection = self._ssh_connection()
+        virtuoso_dir = self._virtuoso_dir
+
+        def fetch(name):
+            remote_path = os.path.join(virtuoso_dir, name)
+            sftp = connection.open_sftp()
+            try:
+                sftp.get(remote_path, os.path.join(directory, name))
+            finally:
+                sftp.close()
+            connection.execute("rm -f %s" % pipes.quote(remote_path))
+            return os.path.join(directory, name)
+
+        pool = ThreadPool(max(1, min(EXPORT_FETCHES, len(names))))
+        try:
+            return pool.map(fetch, names, 1)
+        finally:
+            pool.close()
+            pool.join()
+            if not self.keep_connections:
+                self.close()
+
+    def _construct_graph(self, directory, prefix, compressed,
+                         page_size=EXPORT_PAGE_SIZE):
+        """ Read the graph from the endpoint, page by page of subjects, and
+        write it as N-Triples """
+        paths = []
+        segment = None
+        offset = 0
+        try:
+            while True:
+                triples = self.query_endpoint(EXPORT_PAGE_QUERY % {
+                                                'graph': self.__virtuoso_graph,
+                                                'limit': page_size,
+                                                'offset': offset})
+                if Virtuoso._may_be_cut(triples, page_size):
+                    page_size /= 2
+                    continue
+                if not triples:
+                    return paths
+                if segment is None:
+                    paths.append(os.path.join(directory, "%s%06d.nt%s" % (
+                                    prefix, len(paths) + 1,
+                                    ".gz" if compressed else "")))
+                    segment = (gzip.open if compressed else open)(paths[-1],
+                                                                  'wb')
+                for triple in triples:
+                    segment.write((u" ".join([term.n3() for term in triple]) +
+                                   u" .\n").encode('utf-8'))
+                if segment.tell() >= self.__export_segment_size:
+                    segment.close()
+                    segment = None
+                offset += page_size
+        finally:
+            if segment is not None:
+                segment.close()
+
+    @staticmethod
+    def _may_be_cut(rows, page_size):
+        """ Whether a page of page_size subjects may have been cut by the
+        server (then it has to be asked again with fewer subjects) """
+        if len(rows) < RESULT_MAX_ROWS:
+            return False
+        if page_size <= 1:
+            raise MigrationException("a subject has %d triples or more, "
+                                     "which the server may not return (see "
+                                     "ResultSetMaxRows in virtuoso.ini)" %
+                                                        RESULT_MAX_ROWS)
+        return True
+
+    def get_live_graph(self, page_size=LIVE_GRAPH_PAGE_SIZE,
+                       blank_nodes=True):
+        """ Read the graph as it is on the server, page_size subjects at a
+        time. Without blank_nodes, the triples with a blank node (whose ids
+        never match the ones of a parsed graph) are left out """
+        from rdflib.graph import ConjunctiveGraph
+        from rdflib.term import Literal
+        graph = ConjunctiveGraph()
+        subjects = ["FILTER(isIRI(?s))"] if not blank_nodes else []
+        objects = "FILTER(!isBLANK(?o))" if not blank_nodes else ""
+        last = None
+        while True:
+            filters = list(subjects)
+            if last is not None:
+                filters.append("FILTER(STR(?s) > %s)" % Literal(last).n3())
+            rows = self.query_endpoint(LIVE_GRAPH_QUERY % {
+                                            'graph': self.__virtuoso_graph,
+                                            'filter': " ".join(filters),
+                                            'objects': objects,
+                                            'limit': page_size})
+            if Virtuoso._may_be_cut(rows, page_size):
+                page_size /= 2
+                continue
+            keys = set()
+            for row in rows:
+                keys.add(unicode(row[0]))
+                graph.add(tuple(row[1:]))
+            if len(keys) < page_size:
+                return graph
+            last = max(keys)
+
     def _generate_migration_sparql_commands(self, origin_store,
                                             destination_store):
+        from rdflib.term import BNode, URIRef
         diff = (origin_store - destination_store) or []
         checked = set()
         forward_migration = ""
@@ -190,7 +831,7 @@ ORDER BY desc(?data) LIMIT 1
 
         for subject, predicate, object_ in diff:
 
-           if isinstance(subject, rdflib.term.BNode) and (
+           if isinstance(subject, BNode) and (
                                                     not subject in checked):
                 checked.add(subject)
 
@@ -239,8 +880,8 @@ ORDER BY desc(?data) LIMIT 1
                                            blank_node_as_an_object,
                                            blank_node_as_a_subject)
 
-           if isinstance(subject, rdflib.term.URIRef) and \
-                    not isinstance(object_, rdflib.term.BNode):
+           if isinstance(subject, URIRef) and \
+                    not isinstance(object_, BNode):
                 forward_migration = forward_migration + \
                                 u"\nSPARQL INSERT INTO <%s> {%s %s %s . };"\
                                 % (self.__virtuoso_graph, subject.n3(), predicate.n3(),
@@ -254,25 +895,60 @@ ORDER BY desc(?data) LIMIT 1
         return forward_migration, backward_migration
 
 
+    @staticmethod
+    def _parse_ontology(ontology, skolem_base=None):
+        """ Parse an ontology given as a ttl string or as a list of ttl
+        modules (each one parsed as its own document), skolemizing its blank
+        nodes if a skolem_base is given. Literals are normalized the way
+        Virtuoso stores them, also in graphs that were already parsed, so
+        equal values never show up in a diff """
+        from rdflib.graph import ConjunctiveGraph, Graph
+        if isinstance(ontology, Graph):
+            graph = normalize_graph(ontology)
+        else:
+            graph = ConjunctiveGraph()
+            if ontology is None:
+                return graph
+            if isinstance(ontology, basestring):
+                ontology = [ontology]
+            for content in ontology:
+                graph.parse(data=content, format='turtle')
+            graph = normalize_graph(graph, in_place=True)
+        if skolem_base:
+            graph = skolemize(graph, skolem_base)
+        return graph
+
+    def parse_ontology(self, ontology):
+        from rdflib.graph import Graph
+        from rdflib.plugins.parsers.notation3 import BadSyntax
+        try:
+            if self.ontology_cache is None or ontology is None or\
+                    isinstance(ontology, Graph):
+                return Virtuoso._parse_ontology(ontology, self.skolem_base)
+            return self.ontology_cache.get(
+                    ontology,
+                    lambda ontology: Virtuoso._parse_ontology(
+                                                        ontology,
+                                                        self.skolem_base),
+                    self.skolem_base or "")
+        except BadSyntax, e:
+            e._str = e._str.decode('utf-8')
+            raise MigrationException("Error parsing graph %s" % unicode(e))
+
     def get_sparql(self, current_ontology=None, destination_ontology=None,
                          current_version=None, destination_version=None,
-                         origen=None, insert=None):
-        """ Make sparql statements to be executed """
+                         origen=None, insert=None, staging_graph=None,
+                         graph=None):
+        """ Make sparql statements to be executed. Files loaded (insert)
+        into a staging graph replace the graph, moved there in one step.
+        Loads into another graph than the database graph are recorded
+        under it """
         query_up = ""
         query_down = ""
         if insert is None:
 
-            current_graph = ConjunctiveGraph()
-            destination_graph = ConjunctiveGraph()
-            #if insert is None:
-            try:
-                if current_ontology is not None:
-                    current_graph.parse(data=current_ontology, format='turtle')
-                destination_graph.parse(data=destination_ontology,
-                                        format='turtle')
-            except BadSyntax, e:
-                e._str = e._str.decode('utf-8')
-                raise MigrationException("Error parsing graph %s" % unicode(e))
+            current_graph = self.parse_ontology(current_ontology)
+            destination_graph = self.parse_ontology(destination_ontology)
 
             forward_insert, backward_delete = (
                             self._generate_migration_sparql_commands(
@@ -289,7 +965,7 @@ ORDER BY desc(?data) LIMIT 1
         now = datetime.datetime.now()
         values = {
             'm_graph': self.migration_graph,
-            'v_graph': self.__virtuoso_graph,
+            'v_graph': graph or self.__virtuoso_graph,
             'c_version': current_version,
             'd_version': destination_version,
             'endpoint': self.__virtuoso_endpoint,
@@ -298,9 +974,16 @@ ORDER BY desc(?data) LIMIT 1
             'origen': origen,
             'date': str(now.strftime("%Y-%m-%d %H:%M:%S")),
             'insert': insert,
+            'mode': '',
             'query_up': query_up.replace('"', '\\"').replace('\n', '\\n'),
             'query_down': query_down.replace('"', '\\"').replace('\n', '\\n')
         }
+        if insert is not None and staging_graph is not None:
+            # MOVE clears the graph first, in the same statement
+            query_up += u'\nSPARQL MOVE <%s> TO <%s>;' % (staging_graph,
+                                                         values['v_graph'])
+            values['mode'] = '<%s> "replace"; ' % (self.migration_graph +
+                                                   'mode')
         if insert is not None:
             query_up += (u'\nSPARQL INSERT INTO <%(m_graph)s> { '
                     '[] owl:versionInfo "%(c_version)s"; '
@@ -309,7 +992,7 @@ ORDER BY desc(?data) LIMIT 1
                     '<%(m_graph)sambiente> "%(host)s"; '
                     '<%(m_graph)sproduto> "%(v_graph)s"; '
                     '<%(m_graph)scommited> "%(date)s"^^xsd:dateTime; '
-                    '<%(m_graph)sorigen> "%(origen)s"; '
+                    '<%(m_graph)sorigen> "%(origen)s"; %(mode)s'
                     '<%(m_graph)sinserted> "%(insert)s".};') % values
             query_down += (u'\nSPARQL DELETE FROM <%(m_graph)s> {?s ?p ?o} '
                     'WHERE {?s owl:versionInfo "%(c_version)s"; '
@@ -318,7 +1001,7 @@ ORDER BY desc(?data) LIMIT 1
                     '<%(m_graph)sambiente> "%(host)s"; '
                     '<%(m_graph)sproduto> "%(v_graph)s"; '
                     '<%(m_graph)scommited> "%(date)s"^^xsd:dateTime; '
-                    '<%(m_graph)sorigen> "%(origen)s"; '
+                    '<%(m_graph)sorigen> "%(origen)s"; %(mode)s'
                     '<%(m_graph)sinserted> "%(insert)s"; ?p ?o.};') % values
         else:
             query_up += (u'\nSPARQL INSERT INTO <%(m_graph)s> { '
@@ -342,18 +1025,74 @@ ORDER BY desc(?data) LIMIT 1
 
         return query_up, query_down
 
-    def get_ontology_by_version(self, version):
+    def _git(self):
+        if self._git_reader is None:
+            from git import Git
+            self._git_reader = Git(self._migrations_dir)
+        return self._git_reader
+
+    def _is_ontology_module(self, path):
+        return path == self.__virtuoso_ontology or path.endswith('.ttl')
+
+    def get_ontology_modules(self, version):
+        """ List the ttl files of the ontology in a given git tag """
+        output = self._git().execute(["git",
+                                      "ls-tree",
+                                      "-r",
+                                      "--name-only",
+                                      version,
+                                      "--",
+                                      self.__virtuoso_ontology])
+        return [module for module in output.splitlines()
+                if self._is_ontology_module(module)]
+
+    def get_changed_ontology_modules(self, current_version,
+                                     destination_version):
+        """ List the ontology ttl files whose blobs differ between two git
+        tags, so unchanged modules don't need to be parsed at all. Paths
+        are relative to the migrations dir, as ls-tree prints them """
+        output = self._git().execute(["git",
+                                      "diff",
+                                      "--name-only",
+                                      "--relative",
+                                      current_version,
+                                      destination_version,
+                                      "--",
+                                      self.__virtuoso_ontology])
+        return [module for module in output.splitlines()
+                if self._is_ontology_module(module)]
+
+    def get_ontology_ids(self, versions):
+        """ Get the git object id of the ontology (blob or tree) in each of
+        the given tags """
+        output = self._git().execute(
+                    ["git", "rev-parse"] +
+                    [version + ":" + self.__virtuoso_ontology
+                     for version in versions])
+        return output.splitlines()
+
+    def get_ontology_by_version(self, version, modules=None):
+        """ Get the ontology of a git tag. If the ontology is a directory of
+        ttl modules (or only some modules were asked for) a list with the
+        content of each module is returned """
         file_name = self._migrations_dir + "/" + self.__virtuoso_ontology
         if not os.path.exists(file_name):
             raise Exception('migration file does not exist (%s)' % file_name)
-        return Git(self._migrations_dir).execute(["git",
-                                                  "show",
-                                                  version + ":" + self.__virtuoso_ontology])
+        git = self._git()
+        if modules is None:
+            if not os.path.isdir(file_name):
+                return git.execute(["git",
+                                    "show",
+                                    version + ":" + self.__virtuoso_ontology])
+            modules = self.get_ontology_modules(version)
+        elif modules:
+            # modules deleted in this version are simply absent
+            existing = set(self.get_ontology_modules(version))
+            modules = [module for module in modules if module in existing]
+        return [git.execute(["git", "show", version + ":" + module])
+                for module in modules]
 
     def get_ontology_from_file(self, filename):
         if not os.path.exists(filename):
             raise Exception('migration file does not exist (%s)' % filename)
-        f = open(filename, 'rU')
-        content = f.read()
-        f.close()
-        return content
+        return read_file(filename)
@@ -0,0 +1,45 @@
+import os
+import shutil
+import unittest
+from mock import patch
+from simple_virtuoso_migrate.capabilities import CapabilityStore
+
+CAPABILITIES = {'server_root': '/var/lib/virtuoso/db', 'dirs_allowed': ['.'], 'version': '06.01.3127', 'bulk_loader': True}
+
+
+class CapabilityStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = os.path.abspath('capabilities_test_cache')
+        self.store = CapabilityStore(self.cache_dir, ttl=60)
+
+    def tearDown(self):
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def test_it_should_return_none_when_the_server_is_not_cached(self):
+        self.assertEqual(None, self.store.get('host', 1111))
+
+    def test_it_should_store_the_capabilities_per_host_and_port(self):
+        self.store.put('host', 1111, CAPABILITIES)
+        self.assertEqual(CAPABILITIES, self.store.get('host', 1111))
+        self.assertEqual(None, self.store.get('host', 2222))
+        self.assertEqual(None, self.store.get('other_host', 1111))
+
+    def test_it_should_return_none_when_the_entry_is_expired(self):
+        with patch('simple_virtuoso_migrate.capabilities.time.time', return_value=1000):
+            self.store.put('host', 1111, CAPABILITIES)
+        with patch('simple_virtuoso_migrate.capabilities.time.time', return_value=1060):
+            self.assertEqual(CAPABILITIES, self.store.get('host', 1111))
+        with patch('simple_virtuoso_migrate.capabilities.time.time', return_value=1061):
+            self.assertEqual(None, self.store.get('host', 1111))
+
+    def test_it_should_return_none_when_the_entry_is_corrupted(self):
+        self.store.put('host', 1111, CAPABILITIES)
+        f = open(os.path.join(self.cache_dir, 'servers', 'host_1111.json'), 'w')
+        f.write('{')
+        f.close()
+        self.assertEqual(None, self.store.get('host', 1111))
+
+if __name__ == "__main__":
+    unittest.main()
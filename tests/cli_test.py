@@ -156,6 +156,112 @@ class CLITest(unittest.TestCase):
     def test_it_should_accept_run_after_options(self):
         self.assertEqual("script_name", CLI.parse(["--run-after", "script_name"])[0].run_after)
 
+    def test_it_should_not_compile_by_default(self):
+        self.assertEqual(False, CLI.parse([])[0].compile)
+        self.assertEqual(False, CLI.parse([])[0].compile_all_pairs)
+
+    def test_it_should_accept_compile_options(self):
+        self.assertEqual(True, CLI.parse(["--compile"])[0].compile)
+        self.assertEqual(True, CLI.parse(["--compile-all-pairs"])[0].compile_all_pairs)
+
+    def test_it_should_not_verify_by_default(self):
+        self.assertEqual(False, CLI.parse([])[0].verify)
+
+    def test_it_should_accept_verify_options(self):
+        self.assertEqual(True, CLI.parse(["--verify"])[0].verify)
+
+    def test_it_should_not_reconcile_by_default(self):
+        self.assertEqual(False, CLI.parse([])[0].reconcile)
+
+    def test_it_should_accept_reconcile_options(self):
+        self.assertEqual(True, CLI.parse(["--reconcile"])[0].reconcile)
+
+    def test_it_should_not_export_by_default(self):
+        self.assertEqual(None, CLI.parse([])[0].export)
+        self.assertEqual(False, CLI.parse([])[0].export_compress)
+
+    def test_it_should_accept_export_options(self):
+        self.assertEqual("backups", CLI.parse(["--export", "backups"])[0].export)
+        self.assertEqual(True, CLI.parse(["--export-compress"])[0].export_compress)
+
+    def test_it_should_not_skolemize_by_default(self):
+        self.assertEqual(False, CLI.parse([])[0].skolemize)
+        self.assertEqual(False, CLI.parse([])[0].skolemize_server)
+
+    def test_it_should_accept_skolemize_options(self):
+        self.assertEqual(True, CLI.parse(["--skolemize"])[0].skolemize)
+        self.assertEqual(True, CLI.parse(["--skolemize-server"])[0].skolemize_server)
+
+    def test_it_should_not_use_bulk_mode_by_default(self):
+        self.assertEqual(False, CLI.parse([])[0].bulk)
+
+    def test_it_should_accept_bulk_options(self):
+        self.assertEqual(True, CLI.parse(["--bulk"])[0].bulk)
+
+    def test_it_should_not_has_a_default_value_for_load_patterns(self):
+        self.assertEqual(None, CLI.parse([])[0].load_include)
+        self.assertEqual(None, CLI.parse([])[0].load_exclude)
+
+    def test_it_should_accept_load_patterns_options(self):
+        self.assertEqual(["*.nt", "people/*"], CLI.parse(["--load-include", "*.nt", "--load-include", "people/*"])[0].load_include)
+        self.assertEqual(["*.tmp.ttl"], CLI.parse(["--load-exclude", "*.tmp.ttl"])[0].load_exclude)
+
+    def test_it_should_not_map_files_to_graphs_by_default(self):
+        self.assertEqual(None, CLI.parse([])[0].load_graph)
+
+    def test_it_should_accept_graph_mappings(self):
+        self.assertEqual(["people/*=http://example.com/people", "*.nt=http://example.com/nt"], CLI.parse(["--load-graph", "people/*=http://example.com/people", "--load-graph", "*.nt=http://example.com/nt"])[0].load_graph)
+
+    def test_it_should_not_has_a_default_value_for_load_parallel(self):
+        self.assertEqual(None, CLI.parse([])[0].load_parallel)
+        self.assertEqual(None, CLI.parse([])[0].load_chunk_size)
+
+    def test_it_should_accept_load_parallel_options(self):
+        self.assertEqual("4", CLI.parse(["--load-parallel", "4"])[0].load_parallel)
+        self.assertEqual("64", CLI.parse(["--load-chunk-size", "64"])[0].load_chunk_size)
+
+    def test_it_should_not_replace_by_default(self):
+        self.assertEqual(False, CLI.parse([])[0].replace)
+
+    def test_it_should_accept_replace_options(self):
+        self.assertEqual(True, CLI.parse(["--replace"])[0].replace)
+
+    def test_it_should_not_validate_by_default(self):
+        self.assertEqual(False, CLI.parse([])[0].validate)
+
+    def test_it_should_accept_validate_options(self):
+        self.assertEqual(True, CLI.parse(["--validate"])[0].validate)
+
+    def test_it_should_not_has_a_default_value_for_target_latency(self):
+        self.assertEqual(None, CLI.parse([])[0].target_latency)
+
+    def test_it_should_accept_target_latency_options(self):
+        self.assertEqual("0.5", CLI.parse(["--target-latency", "0.5"])[0].target_latency)
+
+    def test_it_should_not_has_a_default_value_for_max_statements_per_second(self):
+        self.assertEqual(None, CLI.parse([])[0].max_statements_per_second)
+
+    def test_it_should_accept_max_statements_per_second_options(self):
+        self.assertEqual("1000", CLI.parse(["--max-statements-per-second", "1000"])[0].max_statements_per_second)
+
+    def test_it_should_not_watch_by_default(self):
+        self.assertEqual(False, CLI.parse([])[0].watch)
+
+    def test_it_should_accept_watch_options(self):
+        self.assertEqual(True, CLI.parse(["--watch"])[0].watch)
+
+    def test_it_should_not_serve_by_default(self):
+        self.assertEqual(None, CLI.parse([])[0].serve)
+
+    def test_it_should_accept_serve_options(self):
+        self.assertEqual("127.0.0.1:8080", CLI.parse(["--serve", "127.0.0.1:8080"])[0].serve)
+
+    def test_it_should_not_has_a_default_value_for_cache_dir(self):
+        self.assertEqual(None, CLI.parse([])[0].cache_dir)
+
+    def test_it_should_accept_cache_dir_options(self):
+        self.assertEqual("cache_dir_value", CLI.parse(["--cache-dir", "cache_dir_value"])[0].cache_dir)
+
     def test_it_should_not_has_a_default_value_for_database_graph(self):
         self.assertEqual(None, CLI.parse([])[0].database_graph)
 
@@ -0,0 +1,57 @@
+import bz2
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from simple_virtuoso_migrate.compression import compression, decompress, is_rdf_file, read_file, uncompressed_name
+
+CONTENT = '<http://example.com/a> <http://example.com/p> "b" .\r\n<http://example.com/a> <http://example.com/p> "c" .\n'
+
+
+class CompressionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, opener=open):
+        path = os.path.join(self.directory, name)
+        f = opener(path, 'wb')
+        f.write(CONTENT)
+        f.close()
+        return path
+
+    def test_it_should_know_the_compression_of_a_file(self):
+        self.assertEqual('.gz', compression('data.ttl.gz'))
+        self.assertEqual('.bz2', compression('data.nt.BZ2'))
+        self.assertEqual('.xz', compression('data.ttl.xz'))
+        self.assertEqual(None, compression('data.ttl'))
+        self.assertEqual('data.ttl', uncompressed_name('data.ttl.gz'))
+        self.assertEqual('data.ttl', uncompressed_name('data.ttl'))
+
+    def test_it_should_accept_compressed_turtle_and_ntriples_files(self):
+        for name in ['a.ttl', 'a.nt', 'a.ttl.gz', 'a.nt.bz2', 'a.ttl.xz']:
+            self.assertTrue(is_rdf_file(name))
+        for name in ['a.txt', 'a.gz', 'a.txt.bz2', 'ttl']:
+            self.assertFalse(is_rdf_file(name))
+
+    def test_it_should_read_files_decompressing_them(self):
+        expected = CONTENT.replace('\r\n', '\n')
+        self.assertEqual(expected, read_file(self.write('a.ttl')))
+        self.assertEqual(expected, read_file(self.write('a.ttl.gz', gzip.open)))
+        self.assertEqual(expected, read_file(self.write('a.ttl.bz2', bz2.BZ2File)))
+
+    def test_it_should_decompress_a_file_in_a_directory(self):
+        target = tempfile.mkdtemp()
+        try:
+            path = decompress(self.write('a.ttl.bz2', bz2.BZ2File), target)
+            self.assertEqual(os.path.join(target, 'a.ttl'), path)
+            self.assertEqual(CONTENT, open(path, 'rb').read())
+        finally:
+            shutil.rmtree(target)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -17,7 +17,7 @@ class SimpleVirtuosoMigrateTest(BaseTest):
         virtuoso_migrate = SimpleVirtuosoMigrate(self.config)
         self.assertEqual(self.config.get("database_migrations_dir"), virtuoso_migrate._migrations_dir)
 
-    @patch('simple_virtuoso_migrate.core.Repo')
+    @patch('git.Repo')
     def test_it_should_get_all_migrations_in_dir(self, repo_mock):
         repo_mock.return_value = Mock(**{"tags":[Struct(**{"name":"1"}), Struct(**{"name":"3"}), Struct(**{"name":"2.2"})]})
 
@@ -26,7 +26,7 @@ class SimpleVirtuosoMigrateTest(BaseTest):
         self.assertNotEqual(None, migrations)
         self.assertEqual(["1", "3", "2.2"], migrations)
 
-    @patch('simple_virtuoso_migrate.core.Repo')
+    @patch('git.Repo')
     def test_it_should_not_read_files_again_on_subsequent_calls(self, repo_mock):
         repo_mock.return_value = Mock(**{"tags":[Struct(**{"name":"1"}), Struct(**{"name":"3"}), Struct(**{"name":"2.2"})]})
 
@@ -48,7 +48,7 @@ class SimpleVirtuosoMigrateTest(BaseTest):
         virtuoso_migrate = SimpleVirtuosoMigrate(self.config)
         self.assertRaisesWithMessage(Exception, "invalid git repository ('%s')" % tempfile.gettempdir(), virtuoso_migrate.get_all_migrations)
 
-    @patch('simple_virtuoso_migrate.core.Repo')
+    @patch('git.Repo')
     def test_it_should_raise_error_if_do_not_have_any_valid_migration(self, repo_mock):
         repo_mock.return_value = Mock(**{"tags":[]})
         virtuoso_migrate = SimpleVirtuosoMigrate(self.config)
@@ -61,7 +61,18 @@ class SimpleVirtuosoMigrateTest(BaseTest):
         self.assertEqual(1, get_all_migrations_mock.call_count)
         self.assertFalse(virtuoso_migrate.check_if_version_exists('4'))
 
-    @patch('simple_virtuoso_migrate.core.Git')
+    @patch('git.Repo')
+    def test_it_should_read_the_tags_again_to_find_a_new_one(self, repo_mock):
+        repo_mock.return_value = Mock(**{"tags":[Struct(**{"name":"1"})]})
+        virtuoso_migrate = SimpleVirtuosoMigrate(self.config)
+        self.assertTrue(virtuoso_migrate.check_if_version_exists('1'))
+        repo_mock.return_value = Mock(**{"tags":[Struct(**{"name":"1"}), Struct(**{"name":"2"})]})
+        self.assertTrue(virtuoso_migrate.check_if_version_exists('1'))
+        self.assertEqual(1, repo_mock.call_count)
+        self.assertTrue(virtuoso_migrate.check_if_version_exists('2'))
+        self.assertEqual(2, repo_mock.call_count)
+
+    @patch('git.Git')
     def test_it_should_get_the_latest_version_available(self, git_mock):
         execute_mock = Mock(**{'return_value':'2.2'})
         git_mock.return_value = Mock(**{'execute':execute_mock})
@@ -72,5 +83,16 @@ class SimpleVirtuosoMigrateTest(BaseTest):
         git_mock.assert_called_with(self.config.get("database_migrations_dir"))
         execute_mock.assert_called_with(["git", "describe","--abbrev=0","--tags"])
 
+    @patch('git.Git')
+    def test_it_should_get_the_consecutive_versions_between_two_versions(self, git_mock):
+        execute_mock = Mock(**{'return_value':'1\n2\n2.2\n3'})
+        git_mock.return_value = Mock(**{'execute':execute_mock})
+
+        virtuoso_migrate = SimpleVirtuosoMigrate(self.config)
+        self.assertEqual(['1', '2', '2.2'], virtuoso_migrate.get_migrations_path('1', '2.2'))
+        self.assertEqual(['3', '2.2', '2'], virtuoso_migrate.get_migrations_path('3', '2'))
+        self.assertEqual(None, virtuoso_migrate.get_migrations_path('1', '4'))
+        execute_mock.assert_called_with(["git", "for-each-ref", "--sort=creatordate", "--format=%(refname:short)", "refs/tags"])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,130 @@
+import os
+import shutil
+import unittest
+from mock import patch
+from rdflib.graph import ConjunctiveGraph
+from rdflib.term import URIRef, Literal, BNode
+from simple_virtuoso_migrate.delta import Delta, DeltaStore, compute_delta, DELTA_FORMAT
+from tests import create_file
+
+A = (URIRef('http://example.com/a'), URIRef('http://example.com/p'), Literal(u'a\nb'))
+B = (URIRef('http://example.com/b'), URIRef('http://example.com/p'), URIRef('http://example.com/c'))
+C = (URIRef('http://example.com/c'), URIRef('http://example.com/p'), Literal('1', datatype=URIRef('http://www.w3.org/2001/XMLSchema#integer')))
+
+
+class DeltaTest(unittest.TestCase):
+
+    def test_it_should_get_the_delta_between_two_graphs(self):
+        current = ConjunctiveGraph()
+        current.add(A)
+        current.add(B)
+        destination = ConjunctiveGraph()
+        destination.add(B)
+        destination.add(C)
+        delta = Delta.from_graphs(current, destination)
+        self.assertEqual(set([C]), delta.added)
+        self.assertEqual(set([A]), delta.removed)
+
+    def test_it_should_compute_the_delta_of_a_job(self):
+        key, delta = compute_delta(('key', '<http://example.com/b> <http://example.com/p> <http://example.com/c> .', ['<http://example.com/c> <http://example.com/p> 1 .']))
+        self.assertEqual('key', key)
+        self.assertEqual(set([C]), delta.added)
+        self.assertEqual(set([B]), delta.removed)
+
+    def test_it_should_compute_the_delta_of_a_job_with_a_skolem_base(self):
+        key, delta = compute_delta(('key', '', ['<http://example.com/a> <http://example.com/p> [ <http://example.com/p> 1 ] .'], 'http://example.com/.well-known/genid/'))
+        self.assertEqual(2, len(delta.added))
+        for triple in delta.added:
+            self.assertFalse(isinstance(triple[0], BNode) or isinstance(triple[2], BNode))
+
+    def test_it_should_cancel_triples_added_and_later_removed_when_composing(self):
+        delta = Delta([A, B], []).compose(Delta([C], [A]))
+        self.assertEqual(set([B, C]), delta.added)
+        self.assertEqual(set(), delta.removed)
+
+    def test_it_should_cancel_triples_removed_and_later_added_when_composing(self):
+        delta = Delta([], [A, B]).compose(Delta([A], [C]))
+        self.assertEqual(set(), delta.added)
+        self.assertEqual(set([B, C]), delta.removed)
+
+    def test_it_should_reverse_a_delta(self):
+        delta = Delta([A], [B]).reverse()
+        self.assertEqual(set([B]), delta.added)
+        self.assertEqual(set([A]), delta.removed)
+
+    def test_it_should_serialize_and_parse_a_delta(self):
+        delta = Delta.parse(Delta([A, C], [B]).serialize())
+        self.assertEqual(set([A, C]), delta.added)
+        self.assertEqual(set([B]), delta.removed)
+
+    def test_it_should_give_removed_and_added_graphs(self):
+        removed_graph, added_graph = Delta([A], [B]).graphs()
+        self.assertEqual(set([B]), set(removed_graph))
+        self.assertEqual(set([A]), set(added_graph))
+
+
+class DeltaStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = os.path.abspath('delta_test_cache')
+        self.store = DeltaStore(self.cache_dir)
+
+    def tearDown(self):
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def test_it_should_return_none_when_the_delta_is_not_cached(self):
+        self.assertEqual(None, self.store.get('id1', 'id2'))
+
+    def test_it_should_return_an_empty_delta_for_the_same_ontology(self):
+        self.assertEqual(0, len(self.store.get('id1', 'id1')))
+
+    def test_it_should_store_and_get_a_delta_in_both_directions(self):
+        self.assertTrue(self.store.put('id1', 'id2', Delta([A], [B])))
+        delta = self.store.get('id1', 'id2')
+        self.assertEqual(set([A]), delta.added)
+        self.assertEqual(set([B]), delta.removed)
+        delta = self.store.get('id2', 'id1')
+        self.assertEqual(set([B]), delta.added)
+        self.assertEqual(set([A]), delta.removed)
+
+    def test_it_should_know_which_deltas_are_stored(self):
+        self.store.put('id1', 'id2', Delta([A], [B]))
+        self.assertTrue(self.store.has('id1', 'id2'))
+        self.assertTrue(self.store.has('id2', 'id1'))
+        self.assertTrue(self.store.has('id3', 'id3'))
+        self.assertFalse(self.store.has('id1', 'id3'))
+
+    def test_it_should_not_store_deltas_with_blank_nodes(self):
+        triple = (URIRef('http://example.com/a'), URIRef('http://example.com/p'), BNode())
+        self.assertFalse(self.store.put('id1', 'id2', Delta([triple], [])))
+        self.assertEqual(None, self.store.get('id1', 'id2'))
+
+    def test_it_should_keep_named_stores_apart(self):
+        self.store.put('id1', 'id2', Delta([A], []))
+        self.assertEqual(None, DeltaStore(self.cache_dir, 'skolem-deltas').get('id1', 'id2'))
+
+    def test_it_should_not_reuse_deltas_of_another_format(self):
+        os.makedirs(os.path.join(self.cache_dir, 'deltas'))
+        create_file(os.path.join(self.cache_dir, 'deltas', 'id1-id2.nt'), Delta([A], []).serialize())
+        self.assertEqual(None, self.store.get('id1', 'id2'))
+        self.assertFalse(self.store.has('id1', 'id2'))
+        self.store.put('id1', 'id2', Delta([A], []))
+        with patch('simple_virtuoso_migrate.delta.DELTA_FORMAT', DELTA_FORMAT + 1):
+            self.assertEqual(None, DeltaStore(self.cache_dir).get('id1', 'id2'))
+
+    def test_it_should_compose_consecutive_deltas(self):
+        self.store.put('id1', 'id2', Delta([A, B], []))
+        self.store.put('id2', 'id3', Delta([C], [A]))
+        delta = self.store.compose(['id1', 'id2', 'id3'])
+        self.assertEqual(set([B, C]), delta.added)
+        self.assertEqual(set(), delta.removed)
+        delta = self.store.compose(['id3', 'id2', 'id1'])
+        self.assertEqual(set([B, C]), delta.removed)
+
+    def test_it_should_not_compose_when_a_step_is_missing(self):
+        self.store.put('id1', 'id2', Delta([A], []))
+        self.assertEqual(None, self.store.compose(['id1', 'id2', 'id3']))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+from mock import Mock
+from rdflib.graph import ConjunctiveGraph
+from rdflib.term import URIRef, Literal, BNode
+from simple_virtuoso_migrate.fingerprint import GraphFingerprint, LiveGraphFingerprint, triple_text, triple_hash, subject_key, HASH_MODULUS
+
+ONTOLOGY = """
+@prefix : <http://example.com/> .
+@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+:Actor rdf:type owl:Class .
+:SoapOpera rdf:type owl:Class .
+:role :functional "true"^^xsd:boolean ;
+      :restriction [ owl:onProperty :play_a_role ] .
+"""
+
+
+def graph_with_classes(count):
+    graph = ConjunctiveGraph()
+    for i in range(count):
+        graph.add((URIRef('http://example.com/C%d' % i), URIRef('http://www.w3.org/1999/02/22-rdf-syntax-ns#type'), URIRef('http://www.w3.org/2002/07/owl#Class')))
+    return graph
+
+
+class GraphFingerprintTest(unittest.TestCase):
+
+    def test_it_should_make_the_same_triple_text_as_the_server(self):
+        self.assertEqual(u'http://example.com/a http://example.com/p _:', triple_text(URIRef('http://example.com/a'), URIRef('http://example.com/p'), BNode()))
+        self.assertEqual(u'http://example.com/a http://example.com/p 1', triple_text(URIRef('http://example.com/a'), URIRef('http://example.com/p'), Literal('true', datatype=URIRef('http://www.w3.org/2001/XMLSchema#boolean'))))
+        self.assertEqual(u'http://example.com/a http://example.com/p text', triple_text(URIRef('http://example.com/a'), URIRef('http://example.com/p'), Literal('text', lang='en')))
+
+    def test_it_should_hash_each_triple_on_15_hex_digits(self):
+        self.assertEqual(int('0cc175b9c0f1b6a', 16), triple_hash(u'a'))
+        self.assertEqual(2 ** 60, HASH_MODULUS)
+
+    def test_it_should_sum_the_hashes_modulo_2_to_the_60(self):
+        fingerprint = GraphFingerprint(graph_with_classes(200))
+        for node, (count, hash_) in fingerprint.children(['']).items():
+            texts = fingerprint.triples([node])
+            self.assertEqual(len(texts), count)
+            self.assertEqual(sum([triple_hash(text) for text in texts]) % HASH_MODULUS, hash_)
+
+    def test_it_should_ignore_triples_with_blank_node_subjects(self):
+        graph = ConjunctiveGraph()
+        graph.parse(data=ONTOLOGY, format='turtle')
+        fingerprint = GraphFingerprint(graph)
+        self.assertEqual(4, len(fingerprint.triples([""])))
+
+    def test_it_should_find_no_drift_between_equal_graphs_with_a_single_call(self):
+        graph = ConjunctiveGraph()
+        graph.parse(data=ONTOLOGY, format='turtle')
+        other = ConjunctiveGraph()
+        other.parse(data=ONTOLOGY, format='turtle')
+        self.assertEqual(([], [], 1), GraphFingerprint(graph).compare(GraphFingerprint(other)))
+
+    def test_it_should_find_missing_and_extra_triples(self):
+        local = graph_with_classes(10)
+        remote = graph_with_classes(10)
+        remote.remove((URIRef('http://example.com/C3'), None, None))
+        remote.add((URIRef('http://example.com/X'), URIRef('http://example.com/p'), Literal('x')))
+        missing, extra, _ = GraphFingerprint(local).compare(GraphFingerprint(remote))
+        self.assertEqual([u'http://example.com/C3 http://www.w3.org/1999/02/22-rdf-syntax-ns#type http://www.w3.org/2002/07/owl#Class'], missing)
+        self.assertEqual([u'http://example.com/X http://example.com/p x'], extra)
+
+    def test_it_should_only_walk_down_the_nodes_that_differ(self):
+        local = graph_with_classes(2000)
+        remote = graph_with_classes(2000)
+        remote.add((URIRef('http://example.com/C7'), URIRef('http://example.com/p'), Literal('x')))
+        remote_fingerprint = GraphFingerprint(remote)
+        remote_fingerprint.children = Mock(side_effect=remote_fingerprint.children)
+        missing, extra, calls = GraphFingerprint(local).compare(remote_fingerprint, leaf_size=16)
+        self.assertEqual([], missing)
+        self.assertEqual([u'http://example.com/C7 http://example.com/p x'], extra)
+        key = subject_key(URIRef('http://example.com/C7'))
+        for prefixes in [c[0][0] for c in remote_fingerprint.children.call_args_list[1:]]:
+            self.assertEqual([key[:len(prefixes[0])]], prefixes)
+        self.assertEqual(remote_fingerprint.children.call_count + 1, calls)
+
+
+class LiveGraphFingerprintTest(unittest.TestCase):
+
+    def test_it_should_ask_the_server_for_the_children_of_the_given_nodes(self):
+        virtuoso = Mock(**{'query_endpoint.return_value': [(Literal('ab'), Literal(2), Literal(1234))]})
+        children = LiveGraphFingerprint(virtuoso, 'http://example.com/graph').children(['a', 'c'])
+        self.assertEqual({u'ab': (2, 1234)}, children)
+        query = virtuoso.query_endpoint.call_args[0][0]
+        self.assertTrue('FROM <http://example.com/graph>' in query)
+        self.assertTrue('FILTER(SUBSTR(?k, 1, 1) IN ("a", "c"))' in query)
+        self.assertTrue('BIND(SUBSTR(?k, 1, 2) AS ?b)' in query)
+        self.assertTrue('<http://www.w3.org/2001/XMLSchema#decimal>(72057594037927936 * STRLEN(STRBEFORE("0123456789abcdef", SUBSTR(?t, 1, 1)))' in query)
+        self.assertTrue(' + 1 * STRLEN(STRBEFORE("0123456789abcdef", SUBSTR(?t, 15, 1))))' in query)
+
+    def test_it_should_take_the_sum_of_the_server_modulo_2_to_the_60(self):
+        virtuoso = Mock(**{'query_endpoint.return_value': [(Literal('ab'), Literal(2), Literal('1152921504606846979.0'))]})
+        children = LiveGraphFingerprint(virtuoso, 'graph').children([''])
+        self.assertEqual({u'ab': (2, 3)}, children)
+
+    def test_it_should_not_filter_the_root_node(self):
+        virtuoso = Mock(**{'query_endpoint.return_value': []})
+        LiveGraphFingerprint(virtuoso, 'graph').children([''])
+        self.assertFalse('IN (' in virtuoso.query_endpoint.call_args[0][0])
+
+    def test_it_should_get_the_triples_of_the_given_nodes_from_the_server(self):
+        virtuoso = Mock(**{'query_endpoint.return_value': [(URIRef('http://example.com/a'), URIRef('http://example.com/p'), BNode('nodeID://b1'))]})
+        triples = LiveGraphFingerprint(virtuoso, 'graph').triples(['ab'])
+        self.assertEqual([u'http://example.com/a http://example.com/p _:'], triples)
+        self.assertTrue('FILTER(SUBSTR(MD5(STR(?s)), 1, 2) IN ("ab"))' in virtuoso.query_endpoint.call_args[0][0])
+
+if __name__ == "__main__":
+    unittest.main()
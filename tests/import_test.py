@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ['rdflib', 'git', 'paramiko', 'multiprocessing']
+
+# run in a fresh interpreter, so modules imported by other tests don't count
+SCRIPT = """\
+import sys
+import simple_virtuoso_migrate.run
+if %(args)r is not None:
+    try:
+        simple_virtuoso_migrate.run.run_from_argv(%(args)r)
+    except SystemExit:
+        pass
+sys.stderr.write("\\n%%s\\n" %% " ".join(
+    [module for module in %(modules)r if module in sys.modules]))
+"""
+
+
+class ImportTest(unittest.TestCase):
+
+    def _run(self, args=None):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.Popen([sys.executable, "-c",
+                                    SCRIPT % {'args': args,
+                                              'modules': HEAVY_MODULES}],
+                                   cwd=root,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        _, err = process.communicate()
+        return err.splitlines()[-1].split()
+
+    def test_it_should_not_import_heavy_modules_to_show_the_version(self):
+        self.assertEqual([], self._run(["--version"]))
+
+    def test_it_should_not_import_heavy_modules_to_show_the_help(self):
+        self.assertEqual([], self._run(["--help"]))
+
+    def test_it_should_not_import_heavy_modules_on_config_errors(self):
+        self.assertEqual([], self._run(["-c", "not_a_config_file.cnf"]))
+
+    def test_it_should_not_import_heavy_modules_to_import_the_cli(self):
+        self.assertEqual([], self._run())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from simple_virtuoso_migrate.latency import LatencyReport, parse_isql_output, split_statements, statement_type
+
+INSERT = 'SPARQL INSERT INTO <g> {<http://example.com/a> <http://example.com/p> "1" . };'
+DELETE = 'SPARQL DELETE FROM <g> {<http://example.com/a> <http://example.com/p> "2" . };'
+MULTILINE = 'SPARQL INSERT INTO <g> {<http://example.com/a> <http://example.com/p> """line1\nSPARQL line2 \\""" . \nline3""" . };'
+DELETE_WHERE = 'SPARQL DELETE FROM <g> { <http://example.com/a> <http://example.com/p> ?s. ?s <http://example.com/q> "3" } WHERE { <http://example.com/a> <http://example.com/p> ?s. ?s <http://example.com/q> "3" };'
+
+ISQL_OUTPUT = """\
+Connected to OpenLink Virtuoso
+Driver: 06.01.3127 OpenLink Virtuoso ODBC Driver
+OpenLink Interactive SQL (Virtuoso), version 0.9849b.
+Type HELP; for help and EXIT; to exit.
+%s
+
+callret-0
+VARCHAR
+_______________________________________________________________________________
+
+Insert into <g>, 1 (or less) triples -- done
+
+1 Rows. -- 3 msec.
+%s
+
+callret-0
+VARCHAR
+_______________________________________________________________________________
+
+Delete from <g>, 1 (or less) triples -- done
+
+1 Rows. -- 12 msec.
+%s
+
+Done. -- 250 msec.
+""" % (INSERT, DELETE, DELETE_WHERE)
+
+
+class LatencyTest(unittest.TestCase):
+
+    def test_it_should_get_the_type_of_a_statement(self):
+        self.assertEqual("INSERT", statement_type(INSERT))
+        self.assertEqual("DELETE", statement_type(DELETE))
+        self.assertEqual("DELETE WHERE", statement_type(DELETE_WHERE))
+        self.assertEqual("OTHER", statement_type("checkpoint;"))
+
+    def test_it_should_get_the_latency_of_each_statement_echoed_by_isql(self):
+        self.assertEqual([(INSERT, 3), (DELETE, 12), (DELETE_WHERE, 250)], parse_isql_output(ISQL_OUTPUT))
+
+    def test_it_should_split_statements_with_multi_line_literals(self):
+        self.assertEqual([INSERT, MULTILINE, DELETE], split_statements("\n%s\n%s\n\n%s\n" % (INSERT, MULTILINE, DELETE)))
+
+    def test_it_should_get_the_whole_echo_of_a_statement_with_a_multi_line_literal(self):
+        self.assertEqual([(MULTILINE, 4), (DELETE, 1)], parse_isql_output("%s\n\nDone. -- 4 msec.\n%s\n1 Rows. -- 1 msec." % (MULTILINE, DELETE)))
+
+    def test_it_should_ignore_statements_without_a_timing(self):
+        self.assertEqual([(DELETE, 1)], parse_isql_output("%s\n%s\n1 Rows. -- 1 msec." % (INSERT, DELETE)))
+
+    def test_it_should_group_the_latencies_by_statement_type(self):
+        report = LatencyReport()
+        report.add_isql_output(ISQL_OUTPUT)
+        report.add_isql_output(ISQL_OUTPUT)
+        self.assertEqual({"INSERT": [3, 3], "DELETE": [12, 12], "DELETE WHERE": [250, 250]}, report.by_type())
+        self.assertEqual(6, len(report))
+
+    def test_it_should_get_percentiles_by_nearest_rank(self):
+        latencies = range(1, 101)
+        self.assertEqual(50, LatencyReport.percentile(latencies, 50))
+        self.assertEqual(99, LatencyReport.percentile(latencies, 99))
+        self.assertEqual(7, LatencyReport.percentile([7], 99))
+
+    def test_it_should_count_the_latencies_of_each_histogram_bucket(self):
+        histogram = dict(LatencyReport.histogram([0, 1, 4, 4, 6000]))
+        self.assertEqual(1, histogram["< 1ms"])
+        self.assertEqual(1, histogram["< 2ms"])
+        self.assertEqual(2, histogram["< 5ms"])
+        self.assertEqual(1, histogram[">= 5000ms"])
+        self.assertEqual(5, sum(histogram.values()))
+
+    def test_it_should_report_the_slowest_statements(self):
+        report = LatencyReport()
+        report.add_isql_output(ISQL_OUTPUT)
+        self.assertEqual([(DELETE_WHERE, 250), (DELETE, 12)], report.slowest(2))
+        self.assertTrue(report.details().endswith("slowest statements:\n     250ms %s\n      12ms %s\n       3ms %s" % (DELETE_WHERE, DELETE, INSERT)))
+
+    def test_it_should_cut_long_statements_in_the_report(self):
+        report = LatencyReport()
+        report.timings.append(("SPARQL INSERT INTO <g> {%s};" % ("x" * 300), 1))
+        self.assertEqual(200 + len("       1ms ..."), len(report.details().splitlines()[-1]))
+
+    def test_it_should_summarize_each_statement_type(self):
+        report = LatencyReport()
+        report.add_isql_output(ISQL_OUTPUT)
+        self.assertEqual("DELETE            1 statements  p50    12ms  p99    12ms  max    12ms  total      12ms\n"
+                         "DELETE WHERE      1 statements  p50   250ms  p99   250ms  max   250ms  total     250ms\n"
+                         "INSERT            1 statements  p50     3ms  p99     3ms  max     3ms  total       3ms", report.summary())
+
+if __name__ == "__main__":
+    unittest.main()
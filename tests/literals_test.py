@@ -0,0 +1,88 @@
+import unittest
+from mock import patch
+from rdflib.graph import ConjunctiveGraph
+from rdflib.term import Literal, URIRef
+from simple_virtuoso_migrate import literals
+from simple_virtuoso_migrate.literals import normalize_graph, normalize_literal
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+S = URIRef('http://example.com/s')
+P = URIRef('http://example.com/p')
+
+
+def typed(lexical, datatype):
+    return Literal(lexical, datatype=URIRef(XSD + datatype))
+
+
+class LiteralsTest(unittest.TestCase):
+
+    def assertNormalized(self, expected, literal):
+        self.assertEqual(expected, normalize_literal(literal).n3())
+
+    def test_it_should_normalize_integer_subtypes_to_integer(self):
+        for datatype in ['nonNegativeInteger', 'positiveInteger', 'int', 'long', 'short', 'byte', 'unsignedInt']:
+            self.assertNormalized('"1"^^<%sinteger>' % XSD, typed('01', datatype))
+
+    def test_it_should_normalize_booleans_to_integer(self):
+        self.assertNormalized('"1"^^<%sinteger>' % XSD, typed('true', 'boolean'))
+        self.assertNormalized('"0"^^<%sinteger>' % XSD, typed('false', 'boolean'))
+
+    def test_it_should_normalize_string_literals_to_plain_literals(self):
+        self.assertNormalized('"test"', typed('test', 'string'))
+
+    def test_it_should_normalize_datetimes_to_utc(self):
+        self.assertNormalized('"2009-12-31T23:30:00.5Z"^^<%sdateTime>' % XSD, typed('2010-01-01T01:00:00.50+01:30', 'dateTime'))
+        self.assertNormalized('"2010-01-01T03:00:00Z"^^<%sdateTime>' % XSD, typed('2010-01-01T01:00:00-02:00', 'dateTime'))
+        self.assertNormalized('"2010-01-01T01:00:00"^^<%sdateTime>' % XSD, typed('2010-01-01T01:00:00', 'dateTime'))
+
+    def test_it_should_normalize_language_tags_to_lower_case(self):
+        self.assertNormalized('"text"@en-us', Literal('text', lang='EN-US'))
+
+    def test_it_should_normalize_decimals(self):
+        self.assertNormalized('"1.5"^^<%sdecimal>' % XSD, typed('01.500', 'decimal'))
+        self.assertNormalized('"3.0"^^<%sdecimal>' % XSD, typed('3', 'decimal'))
+        self.assertNormalized('"0.0"^^<%sdecimal>' % XSD, typed('-0.00', 'decimal'))
+
+    def test_it_should_keep_invalid_and_unknown_literals(self):
+        literal = typed('1.0E0', 'double')
+        self.assertTrue(literal is normalize_literal(literal))
+        literal = typed('maybe', 'boolean')
+        self.assertTrue(literal is normalize_literal(literal))
+
+    @patch('simple_virtuoso_migrate.literals._normalize', return_value=None)
+    def test_it_should_normalize_each_distinct_literal_once(self, _normalize_mock):
+        literals._normalized.clear()
+        normalize_literal(typed('7', 'int'))
+        normalize_literal(typed('7', 'int'))
+        normalize_literal(typed('8', 'int'))
+        self.assertEqual(2, _normalize_mock.call_count)
+        literals._normalized.clear()
+
+    def test_it_should_not_read_back_a_literal_another_thread_cleared(self):
+        class ClearedDict(dict):
+            def __setitem__(self, key, value):
+                dict.__setitem__(self, key, value)
+                self.clear()
+        with patch('simple_virtuoso_migrate.literals._normalized', ClearedDict()):
+            self.assertEqual(typed('7', 'integer'), normalize_literal(typed('07', 'int')))
+
+    def test_it_should_return_the_same_graph_when_nothing_changes(self):
+        graph = ConjunctiveGraph()
+        graph.add((S, P, Literal('text')))
+        self.assertTrue(graph is normalize_graph(graph))
+
+    def test_it_should_normalize_a_copy_of_the_graph(self):
+        graph = ConjunctiveGraph()
+        graph.add((S, P, typed('true', 'boolean')))
+        normalized = normalize_graph(graph)
+        self.assertEqual([(S, P, typed('1', 'integer'))], list(normalized))
+        self.assertEqual([(S, P, typed('true', 'boolean'))], list(graph))
+
+    def test_it_should_normalize_the_graph_in_place(self):
+        graph = ConjunctiveGraph()
+        graph.add((S, P, typed('true', 'boolean')))
+        self.assertTrue(graph is normalize_graph(graph, in_place=True))
+        self.assertEqual([(S, P, typed('1', 'integer'))], list(graph))
+
+if __name__ == "__main__":
+    unittest.main()
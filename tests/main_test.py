@@ -1,7 +1,12 @@
+import os
+import re
+import shutil
+import tempfile
 import unittest
 from mock import patch, call, Mock
 from simple_virtuoso_migrate.main import Main
 from simple_virtuoso_migrate.config import Config
+from simple_virtuoso_migrate.core.exceptions import MigrationException
 from tests import BaseTest, create_file, delete_files
 
 
@@ -168,11 +173,14 @@ class MainTest(BaseTest):
         main.execute()
         execution_log_mock.mock_calls[-2].called_with('\nRun after script tests/samples/invalid_run_after.py does not have run_after() function .\n', 'PINK', 1)
 
+    @patch('simple_virtuoso_migrate.virtuoso.time.time', return_value=0)
+    @patch('simple_virtuoso_migrate.virtuoso.unstage')
+    @patch('simple_virtuoso_migrate.virtuoso.stage', return_value='hardlink')
     @patch('simple_virtuoso_migrate.main.Main._execution_log')
     @patch('simple_virtuoso_migrate.main.Virtuoso.execute_change')
     @patch('simple_virtuoso_migrate.main.Virtuoso.get_current_version', return_value=(None, None))
     @patch('simple_virtuoso_migrate.main.Virtuoso._run_isql', return_value=("", ""))
-    def test_it_should_add_triples_if_the_database_is_empty_and_the_option_is_activated_by_the_user(self, run_isql_mock, current_version_mock, execute_change_mock, _execution_log_mock):
+    def test_it_should_add_triples_if_the_database_is_empty_and_the_option_is_activated_by_the_user(self, run_isql_mock, current_version_mock, execute_change_mock, _execution_log_mock, stage_mock, unstage_mock, time_mock):
         self.initial_config.update({'load_ttl':'new_triple.ttl', 'show_sparql_only':None})
         main = Main(Config(self.initial_config))
         main.execute()
@@ -180,6 +188,10 @@ class MainTest(BaseTest):
         expected_calls = [
             call('\nStarting Virtuoso migration...', 'PINK', log_level_limit=1),
             call("- TTL(s) to upload: ['new_triple.ttl']", 'GREEN', log_level_limit=1),
+            call("- 1 file(s), 0.0 MB to load, estimated time 0:00:00 with 1 parallel load(s)", 'GREEN', log_level_limit=1),
+            call('- Files staged by hardlink: 1', 'GREEN', log_level_limit=1),
+            call('- Loaded 0.0 MB in 0:00:00; transfer 0.0s, ingest 0.0s', 'GREEN', log_level_limit=1),
+            call('  new_triple.ttl: 0.0 MB, transfer 0.00s, ingest 0.00s', log_level_limit=2),
             call('- Current version is: None', 'GREEN', log_level_limit=1),
             call('- Destination version is: None', 'GREEN', log_level_limit=1),
             call('\nStarting Migration!', log_level_limit=1),
@@ -190,11 +202,14 @@ class MainTest(BaseTest):
         self.assertEqual(expected_calls, _execution_log_mock.mock_calls)
 #        execute_change_mock.assert_called_with('sparql_up', 'sparql_down', execution_log=_execution_log_mock)
 
+    @patch('simple_virtuoso_migrate.virtuoso.time.time', return_value=0)
+    @patch('simple_virtuoso_migrate.virtuoso.unstage')
+    @patch('simple_virtuoso_migrate.virtuoso.stage', return_value='hardlink')
     @patch('simple_virtuoso_migrate.main.Main._execution_log')
     @patch('simple_virtuoso_migrate.main.Virtuoso.execute_change')
     @patch('simple_virtuoso_migrate.main.Virtuoso.get_current_version', return_value=('0.1', 'git'))
     @patch('simple_virtuoso_migrate.main.Virtuoso._run_isql', return_value=("", ""))
-    def test_it_should_add_triples_if_the_database_is_not_empty_and_the_option_is_activated_by_the_user(self, run_isql_mock, current_version_mock, execute_change_mock, _execution_log_mock):
+    def test_it_should_add_triples_if_the_database_is_not_empty_and_the_option_is_activated_by_the_user(self, run_isql_mock, current_version_mock, execute_change_mock, _execution_log_mock, stage_mock, unstage_mock, time_mock):
         self.initial_config.update({'load_ttl':'new_triple.ttl', 'show_sparql_only':None})
         main = Main(Config(self.initial_config))
         main.execute()
@@ -202,6 +217,10 @@ class MainTest(BaseTest):
         expected_calls = [
             call('\nStarting Virtuoso migration...', 'PINK', log_level_limit=1),
             call("- TTL(s) to upload: ['new_triple.ttl']", 'GREEN', log_level_limit=1),
+            call("- 1 file(s), 0.0 MB to load, estimated time 0:00:00 with 1 parallel load(s)", 'GREEN', log_level_limit=1),
+            call('- Files staged by hardlink: 1', 'GREEN', log_level_limit=1),
+            call('- Loaded 0.0 MB in 0:00:00; transfer 0.0s, ingest 0.0s', 'GREEN', log_level_limit=1),
+            call('  new_triple.ttl: 0.0 MB, transfer 0.00s, ingest 0.00s', log_level_limit=2),
             call('- Current version is: 0.1', 'GREEN', log_level_limit=1),
             call('- Destination version is: 0.1', 'GREEN', log_level_limit=1),
             call('\nStarting Migration!', log_level_limit=1),
@@ -212,6 +231,219 @@ class MainTest(BaseTest):
         self.assertEqual(expected_calls, _execution_log_mock.mock_calls)
 #        execute_change_mock.assert_called_with('sparql_up', 'sparql_down', execution_log=_execution_log_mock)
 
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso.get_current_version', return_value=('0.1', 'git'))
+    def test_it_should_load_compressed_turtle_and_ntriples_files_from_a_directory(self, current_version_mock, _execution_log_mock):
+        os.mkdir('dumps')
+        try:
+            for name in ['a.ttl', 'b.nt.gz', 'c.ttl.bz2', 'd.ttl.xz', 'e.txt.gz']:
+                create_file(os.path.join('dumps', name))
+            self.initial_config.update({'load_ttl':'dumps', 'show_sparql_only':True})
+            main = Main(Config(self.initial_config))
+            main.execute()
+        finally:
+            shutil.rmtree('dumps')
+        message = _execution_log_mock.mock_calls[1][1][0]
+        for name in ['a.ttl', 'b.nt.gz', 'c.ttl.bz2', 'd.ttl.xz']:
+            self.assertTrue(name in message)
+        self.assertFalse('e.txt.gz' in message)
+
+    def test_it_should_find_the_files_to_load_recursively_largest_first(self):
+        os.makedirs(os.path.join('dumps', 'people', 'old'))
+        try:
+            create_file(os.path.join('dumps', 'small.ttl'), 'x')
+            create_file(os.path.join('dumps', 'people', 'big.nt'), 'x' * 100)
+            create_file(os.path.join('dumps', 'people', 'old', 'medium.ttl'), 'x' * 10)
+            create_file(os.path.join('dumps', 'people', 'notes.txt'), 'x' * 1000)
+            main = Main(Config(self.initial_config))
+            self.assertEqual([os.path.join('dumps', 'people', 'big.nt'), os.path.join('dumps', 'people', 'old', 'medium.ttl'), os.path.join('dumps', 'small.ttl')], main._find_files_to_load('dumps'))
+            self.assertEqual([os.path.join('dumps', 'people', 'big.nt'), os.path.join('dumps', 'people', 'old', 'medium.ttl'), os.path.join('dumps', 'small.ttl')], main._find_files_to_load('dumps/'))
+        finally:
+            shutil.rmtree('dumps')
+
+    def test_it_should_filter_the_files_to_load_by_include_and_exclude_patterns(self):
+        os.makedirs(os.path.join('dumps', 'people', 'old'))
+        try:
+            for name in [os.path.join('people', 'a.ttl'), os.path.join('people', 'old', 'b.ttl'), 'c.ttl', 'c.tmp.ttl']:
+                create_file(os.path.join('dumps', name))
+            self.initial_config.update({'load_include': ['people/*', 'c*'], 'load_exclude': ['*.tmp.ttl', 'people/old/*']})
+            main = Main(Config(self.initial_config))
+            self.assertEqual(sorted([os.path.join('dumps', 'people', 'a.ttl'), os.path.join('dumps', 'c.ttl')]), sorted(main._find_files_to_load('dumps')))
+        finally:
+            shutil.rmtree('dumps')
+
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso.upload_ttls_to_virtuoso')
+    @patch('simple_virtuoso_migrate.main.Virtuoso.get_current_version')
+    def test_it_should_validate_all_the_files_before_connecting_to_the_server(self, current_version_mock, upload_ttls_to_virtuoso_mock, _execution_log_mock):
+        os.mkdir('dumps')
+        try:
+            create_file(os.path.join('dumps', 'a.ttl'), '<http://example.com/a> <http://example.com/p> "a" .\n<http://example.com/a> <http://example.com/p> .\n')
+            create_file(os.path.join('dumps', 'b.nt'), '<http://example.com/b> <http://example.com/p> "b" .\n')
+            self.initial_config.update({'load_ttl': 'dumps', 'validate': True})
+            main = Main(Config(self.initial_config))
+            self.assertRaisesWithMessage(MigrationException, "1 syntax error(s) found, nothing was loaded", main.execute)
+        finally:
+            shutil.rmtree('dumps')
+        self.assertTrue(call('- Files validated: 2, 2 triple(s)', 'GREEN', log_level_limit=1) in _execution_log_mock.mock_calls)
+        _execution_log_mock.assert_called_with("%s:2: objectList expected" % os.path.join('dumps', 'a.ttl'), 'RED', log_level_limit=1)
+        self.assertEqual(0, current_version_mock.call_count)
+        self.assertEqual(0, upload_ttls_to_virtuoso_mock.call_count)
+
+    def test_it_should_find_the_graph_of_each_file(self):
+        os.makedirs(os.path.join('dumps', 'people'))
+        os.mkdir(os.path.join('dumps', 'places'))
+        try:
+            files = [os.path.join('dumps', name) for name in ['a.ttl', 'b.nt.gz', 'c.ttl', os.path.join('people', 'd.ttl'), os.path.join('people', 'e.ttl'), os.path.join('places', 'f.ttl')]]
+            for path in files:
+                create_file(path, '')
+            create_file(os.path.join('dumps', 'a.ttl.graph'), 'http://example.com/a\n')
+            create_file(os.path.join('dumps', 'b.nt.graph'), 'http://example.com/b')
+            create_file(os.path.join('dumps', 'c.ttl.graph'), 'test')
+            create_file(os.path.join('dumps', 'people', 'e.ttl.graph'), 'http://example.com/e')
+            create_file(os.path.join('dumps', 'places', 'global.graph'), 'http://example.com/places')
+            self.initial_config.update({'load_graph': ['people/*=http://example.com/people', '*.ttl=http://example.com/other'], 'database_graph': 'test'})
+            main = Main(Config(self.initial_config))
+            self.assertEqual(['http://example.com/a', 'http://example.com/b', None, 'http://example.com/people', 'http://example.com/e', 'http://example.com/other'],
+                             [main._find_graphs_of_files(files, 'dumps')[path] for path in files])
+            main.config.update('load_graph', 'people/*=http://example.com/people')
+            self.assertEqual('http://example.com/places', main._find_graphs_of_files(files, 'dumps')[files[-1]])
+        finally:
+            shutil.rmtree('dumps')
+
+    @patch('simple_virtuoso_migrate.main.Virtuoso.execute_change')
+    @patch('simple_virtuoso_migrate.main.Virtuoso.get_current_version', return_value=(None, None))
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_load_files_with_the_same_name_into_their_own_graphs(self, _execution_log_mock, current_version_mock, execute_change_mock):
+        directory = tempfile.mkdtemp()
+        loaded = []
+
+        def run_isql(cmd, archive=False):
+            match = re.search(r"TTLP_MT_LOCAL_FILE\('(.*)', '', '(.*)'\)", cmd)
+            if match:
+                loaded.append((match.group(2), open(match.group(1)).read()))
+            return '', ''
+
+        try:
+            os.mkdir(os.path.join(directory, 'vdir'))
+            for name in ['g1', 'g2']:
+                os.makedirs(os.path.join(directory, 'dumps', name))
+                create_file(os.path.join(directory, 'dumps', name, 'data.ttl'), '<http://example.com/%s> <http://example.com/p> "%s" .\n' % (name, name))
+                create_file(os.path.join(directory, 'dumps', name, 'global.graph'), 'http://example.com/%s' % name)
+            self.initial_config.update({'load_ttl': os.path.join(directory, 'dumps'), 'virtuoso_dirs_allowed': os.path.join(directory, 'vdir')})
+            main = Main(Config(self.initial_config))
+            with patch.object(main.virtuoso, '_run_isql', side_effect=run_isql):
+                main.execute()
+            for name in ['g1', 'g2']:
+                self.assertEqual('<http://example.com/%s> <http://example.com/p> "%s" .\n' % (name, name), open(os.path.join(directory, 'dumps', name, 'data.ttl')).read())
+            self.assertEqual([], os.listdir(os.path.join(directory, 'vdir')))
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual([('http://example.com/g1', '<http://example.com/g1> <http://example.com/p> "g1" .\n'),
+                          ('http://example.com/g2', '<http://example.com/g2> <http://example.com/p> "g2" .\n')], sorted(loaded))
+
+    def test_it_should_not_accept_a_graph_mapping_without_graph(self):
+        self.initial_config.update({'load_graph': 'people/*'})
+        main = Main(Config(self.initial_config))
+        self.assertRaisesWithMessage(Exception, "invalid graph mapping 'people/*', it should be PATTERN=GRAPH", main._find_graphs_of_files, ['a.ttl'], '.')
+
+    @patch('simple_virtuoso_migrate.main.Main._log_load_estimate')
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_record_the_load_of_each_graph(self, _execution_log_mock, _execute_migrations_mock, _log_load_estimate_mock):
+        self.initial_config.update({'load_ttl': 'new_triple.ttl', 'database_graph': 'test'})
+        virtuoso = Mock()
+        virtuoso.get_current_version.side_effect = lambda graph: {None: ('0.1', 'git'), 'http://example.com/a': (None, None)}[graph]
+        virtuoso.upload_ttls_to_virtuoso.return_value = {'a.ttl': ('out a', ''), 'b.ttl': ('out b', ''), 'c.ttl': ('out c', '')}
+        virtuoso.get_sparql.side_effect = lambda *args: ('\nup %s' % args[7], '\ndown %s' % args[7])
+        main = Main(Config(self.initial_config), virtuoso=virtuoso, log=Mock())
+        with patch.object(main, '_find_files_to_load', return_value=['a.ttl', 'b.ttl', 'c.ttl']):
+            with patch.object(main, '_find_graphs_of_files', return_value={'a.ttl': 'http://example.com/a', 'b.ttl': None, 'c.ttl': 'http://example.com/a'}):
+                main._load_triples()
+        virtuoso.upload_ttls_to_virtuoso.assert_called_with(['a.ttl', 'b.ttl', 'c.ttl'], execution_log=main._execution_log, graphs={'a.ttl': 'http://example.com/a', 'b.ttl': None, 'c.ttl': 'http://example.com/a'})
+        calls = virtuoso.get_sparql.call_args_list
+        self.assertEqual(2, len(calls))
+        self.assertEqual((None, None, '0.1', None, 'git', ['b.ttl'], None, None), calls[0][0])
+        self.assertEqual((None, None, None, None, 'insert'), calls[1][0][:5])
+        self.assertEqual(['a.ttl', 'c.ttl'], sorted(calls[1][0][5]))
+        self.assertEqual((None, 'http://example.com/a'), calls[1][0][6:])
+        self.assertEqual(('\nup None\nup http://example.com/a', '\ndown None\ndown http://example.com/a', '0.1', '0.1'), _execute_migrations_mock.call_args[0][:4])
+        _execution_log_mock.assert_any_call('- Files to load into test: 1', 'GREEN', log_level_limit=1)
+        _execution_log_mock.assert_any_call('- Files to load into http://example.com/a: 2', 'GREEN', log_level_limit=1)
+
+    @patch('simple_virtuoso_migrate.main.Main._log_load_estimate')
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_replace_the_graph_by_the_loaded_files(self, _execution_log_mock, _execute_migrations_mock, _log_load_estimate_mock):
+        self.initial_config.update({'load_ttl': 'new_triple.ttl', 'replace': True})
+        virtuoso = Mock()
+        virtuoso.get_current_version.return_value = ('0.1', 'git')
+        virtuoso.staging_graph.return_value = 'urn:staging'
+        virtuoso.upload_ttls_to_virtuoso.return_value = {'new_triple.ttl': ('out', '')}
+        virtuoso.get_sparql.return_value = ('sparql_up', 'sparql_down')
+        main = Main(Config(self.initial_config), virtuoso=virtuoso, log=Mock())
+        main._load_triples()
+        virtuoso.clear_graph.assert_called_with('urn:staging')
+        virtuoso.upload_ttls_to_virtuoso.assert_called_with(['new_triple.ttl'], execution_log=main._execution_log, graphs={'new_triple.ttl': 'urn:staging'})
+        virtuoso.get_sparql.assert_called_with(None, None, '0.1', None, 'git', ['new_triple.ttl'], 'urn:staging', None)
+        _execute_migrations_mock.assert_called_with('sparql_up', 'sparql_down', '0.1', '0.1', ['out'])
+
+    @patch('simple_virtuoso_migrate.main.Main._log_load_estimate')
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_not_replace_the_graph_if_a_file_is_not_loaded(self, _execution_log_mock, _execute_migrations_mock, _log_load_estimate_mock):
+        self.initial_config.update({'load_ttl': 'new_triple.ttl', 'replace': True})
+        virtuoso = Mock()
+        virtuoso.get_current_version.return_value = ('0.1', 'git')
+        virtuoso.staging_graph.return_value = 'urn:staging'
+        virtuoso.upload_ttls_to_virtuoso.return_value = {'new_triple.ttl': ('', 'error')}
+        main = Main(Config(self.initial_config), virtuoso=virtuoso, log=Mock())
+        self.assertRaisesWithMessage(MigrationException, "1 file(s) not loaded, the graph was not replaced", main._load_triples)
+        self.assertEqual([call('urn:staging'), call('urn:staging')], virtuoso.clear_graph.mock_calls)
+        self.assertEqual(0, virtuoso.get_sparql.call_count)
+        self.assertEqual(0, _execute_migrations_mock.call_count)
+
+    @patch('simple_virtuoso_migrate.main.Main._log_load_estimate')
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_clear_the_staging_graph_if_the_load_raises(self, _execution_log_mock, _execute_migrations_mock, _log_load_estimate_mock):
+        self.initial_config.update({'load_ttl': 'new_triple.ttl', 'replace': True})
+        virtuoso = Mock()
+        virtuoso.get_current_version.return_value = ('0.1', 'git')
+        virtuoso.staging_graph.return_value = 'urn:staging'
+        virtuoso.upload_ttls_to_virtuoso.side_effect = Exception('TTLP failed')
+        main = Main(Config(self.initial_config), virtuoso=virtuoso, log=Mock())
+        self.assertRaisesWithMessage(Exception, "TTLP failed", main._load_triples)
+        self.assertEqual([call('urn:staging'), call('urn:staging')], virtuoso.clear_graph.mock_calls)
+        self.assertEqual(0, _execute_migrations_mock.call_count)
+
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_not_replace_the_graph_in_bulk_mode(self, _execution_log_mock):
+        self.initial_config.update({'load_ttl': 'new_triple.ttl', 'replace': True, 'bulk': True})
+        virtuoso = Mock()
+        main = Main(Config(self.initial_config), virtuoso=virtuoso, log=Mock())
+        self.assertRaisesWithMessage(Exception, "--replace can't be used with --bulk", main._load_triples)
+        self.assertEqual(0, virtuoso.upload_ttls_to_virtuoso.call_count)
+
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_write_the_load_report_in_the_log_dir(self, _execution_log_mock):
+        self.initial_config.update({'log_dir': 'logs'})
+        virtuoso = Mock()
+        virtuoso.load_report.write.return_value = ('logs/load-1.json', 'logs/load-1.csv')
+        main = Main(Config(self.initial_config), virtuoso=virtuoso, log=Mock())
+        main._write_load_report()
+        virtuoso.load_report.write.assert_called_with('logs')
+        _execution_log_mock.assert_called_with('- Load report: logs/load-1.json, logs/load-1.csv', 'GREEN', log_level_limit=1)
+
+    @patch('simple_virtuoso_migrate.main.Main._file_size', side_effect=lambda path: {'a': 600, 'b': 500, 'c': 400}[path] * 1024 * 1024)
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_estimate_the_load_time_assigning_the_largest_chunks_first(self, _execution_log_mock, _file_size_mock):
+        self.initial_config.update({'load_parallel': '2', 'load_chunk_size': '300', 'load_rate': '10'})
+        main = Main(Config(self.initial_config))
+        main._log_load_estimate(['a', 'b', 'c'])
+        # chunks of 300, 300, 300, 200 and 400 MB on 2 loads: 700 and 800 MB
+        _execution_log_mock.assert_called_with('- 3 file(s), 1500.0 MB to load, estimated time 0:01:20 with 2 parallel load(s)', 'GREEN', log_level_limit=1)
+
     @patch('simple_virtuoso_migrate.main.Main._execution_log')
     @patch('simple_virtuoso_migrate.main.Virtuoso.execute_change')
     @patch('simple_virtuoso_migrate.main.Virtuoso.get_current_version', return_value=('0.1', 'git'))
@@ -223,6 +455,7 @@ class MainTest(BaseTest):
         expected_calls = [
             call('\nStarting Virtuoso migration...', 'PINK', log_level_limit=1),
             call("- TTL(s) to upload: ['new_triple.ttl']", 'GREEN', log_level_limit=1),
+            call("- 1 file(s), 0.0 MB to load, estimated time 0:00:00 with 1 parallel load(s)", 'GREEN', log_level_limit=1),
 #            call('- Current version is: 0.1', 'GREEN', log_level_limit=1),
 #            call('- Destination version is: 0.1', 'GREEN', log_level_limit=1),
 #            call("\nWARNING: commands are not being executed ('--show_sparql_only' activated)", 'RED', log_level_limit=1),
@@ -276,6 +509,16 @@ class MainTest(BaseTest):
 
         cli_mock.assert_called_with('message to log', 'CYAN')
 
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'export_graph.return_value':['backups/export-1.ttl', 'backups/export-2.ttl']}))
+    def test_it_should_export_the_graph(self, virtuoso_mock, _execution_log_mock):
+        self.initial_config.update({'export': 'backups', 'export_compress': True})
+        main = Main(Config(self.initial_config))
+        result = main.execute()
+        main.virtuoso.export_graph.assert_called_with('backups', True, execution_log=_execution_log_mock)
+        self.assertEqual({'operation': 'export', 'files': ['backups/export-1.ttl', 'backups/export-2.ttl']}, result)
+        _execution_log_mock.assert_any_call('- Files exported: 2', 'GREEN', log_level_limit=1)
+
     @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
     @patch('simple_virtuoso_migrate.main.Main._get_destination_version', return_value='destination_version')
     @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_current_version.return_value':('current_version', 'git'), 'get_sparql.return_value':('sparql_up', 'sparql_down')}))
@@ -284,6 +527,235 @@ class MainTest(BaseTest):
         main.execute()
         execute_migrations_mock.assert_called_with('sparql_up', 'sparql_down', 'current_version', 'destination_version')
 
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._get_destination_version', return_value='destination_version')
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_current_version.return_value':('current_version', 'git'), 'get_changed_ontology_modules.return_value':['ontology.ttl'], 'get_sparql.return_value':('sparql_up', 'sparql_down')}))
+    def test_it_should_only_read_the_ontology_modules_changed_between_versions(self, virtuoso_mock, _get_destination_version_mock, execute_migrations_mock):
+        main = Main(Config(self.initial_config))
+        main.execute()
+        main.virtuoso.get_changed_ontology_modules.assert_called_with('current_version', 'destination_version')
+        self.assertEqual([call('current_version', ['ontology.ttl']), call('destination_version', ['ontology.ttl'])], main.virtuoso.get_ontology_by_version.mock_calls)
+
+    @patch('simple_virtuoso_migrate.main.DeltaStore')
+    @patch('simple_virtuoso_migrate.main.SimpleVirtuosoMigrate', return_value=Mock(**{'get_migrations_path.return_value':['current_version', 'middle_version', 'destination_version']}))
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._get_destination_version', return_value='destination_version')
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_current_version.return_value':('current_version', 'git'), 'get_ontology_ids.return_value':['id1', 'id2', 'id3'], 'get_sparql.return_value':('sparql_up', 'sparql_down')}))
+    def test_it_should_use_cached_deltas_instead_of_reading_the_ontologies(self, virtuoso_mock, _get_destination_version_mock, execute_migrations_mock, simplevirtuosomigrate_mock, delta_store_mock):
+        delta = Mock(**{'graphs.return_value':('removed', 'added'), '__len__':Mock(return_value=2)})
+        delta_store_mock.return_value = Mock(**{'compose.return_value':delta})
+        self.initial_config.update({'cache_dir': 'cache'})
+        main = Main(Config(self.initial_config))
+        main.execute()
+        delta_store_mock.assert_called_with('cache')
+        main.virtuoso.get_ontology_ids.assert_called_with(['current_version', 'middle_version', 'destination_version'])
+        main.delta_store.compose.assert_called_with(['id1', 'id2', 'id3'])
+        main.virtuoso.get_sparql.assert_called_with('removed', 'added', 'current_version', 'destination_version', 'git')
+        self.assertEqual(0, main.virtuoso.get_ontology_by_version.call_count)
+
+    @patch('simple_virtuoso_migrate.main.Delta')
+    @patch('simple_virtuoso_migrate.main.DeltaStore', return_value=Mock(**{'compose.return_value':None}))
+    @patch('simple_virtuoso_migrate.main.SimpleVirtuosoMigrate', return_value=Mock(**{'get_migrations_path.return_value':None}))
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._get_destination_version', return_value='destination_version')
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_current_version.return_value':('current_version', 'git'), 'get_ontology_ids.return_value':['id1', 'id2'], 'parse_ontology.side_effect':['current_graph', 'destination_graph'], 'get_sparql.return_value':('sparql_up', 'sparql_down')}))
+    def test_it_should_store_the_delta_when_it_is_not_cached(self, virtuoso_mock, _get_destination_version_mock, execute_migrations_mock, simplevirtuosomigrate_mock, delta_store_mock, delta_mock):
+        delta_mock.from_graphs.return_value = 'delta'
+        self.initial_config.update({'cache_dir': 'cache'})
+        main = Main(Config(self.initial_config))
+        main.execute()
+        main.virtuoso.get_ontology_ids.assert_called_with(['current_version', 'destination_version'])
+        delta_mock.from_graphs.assert_called_with('current_graph', 'destination_graph')
+        main.delta_store.put.assert_called_with('id1', 'id2', 'delta')
+        main.virtuoso.get_sparql.assert_called_with('current_graph', 'destination_graph', 'current_version', 'destination_version', 'git')
+
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_not_compile_without_a_cache_dir(self, _execution_log_mock):
+        self.initial_config.update({'compile': True})
+        main = Main(Config(self.initial_config))
+        self.assertRaisesWithMessage(Exception, '--compile needs a cache dir (CACHE_DIR or --cache-dir)', main.execute)
+
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Main._compute_deltas', return_value=[((0, 1), 'delta_01'), ((2, 3), 'delta_23')])
+    @patch('simple_virtuoso_migrate.main.DeltaStore', return_value=Mock(**{'has.side_effect':lambda a, b: a == 'id2' and b == 'id3', 'put.return_value':True}))
+    @patch('simple_virtuoso_migrate.main.SimpleVirtuosoMigrate', return_value=Mock(**{'get_ordered_migrations.return_value':['v1', 'v2', 'v3', 'v4']}))
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_ontology_ids.return_value':['id1', 'id2', 'id3', 'id4'], 'get_ontology_by_version.side_effect':lambda v: 'content_%s' % v}))
+    def test_it_should_compile_the_deltas_of_consecutive_versions_not_cached_yet(self, virtuoso_mock, simplevirtuosomigrate_mock, delta_store_mock, compute_deltas_mock, _execution_log_mock):
+        self.initial_config.update({'compile': True, 'cache_dir': 'cache'})
+        main = Main(Config(self.initial_config))
+        result = main._compile()
+        compute_deltas_mock.assert_called_with([((0, 1), 'content_v1', 'content_v2'), ((2, 3), 'content_v3', 'content_v4')])
+        self.assertEqual([call('id1', 'id2', 'delta_01'), call('id3', 'id4', 'delta_23')], main.delta_store.put.mock_calls)
+        self.assertEqual(['v1 -> v2', 'v3 -> v4'], result['compiled'])
+
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Main._compute_deltas', return_value=[])
+    @patch('simple_virtuoso_migrate.main.DeltaStore', return_value=Mock(**{'has.return_value':False}))
+    @patch('simple_virtuoso_migrate.main.SimpleVirtuosoMigrate', return_value=Mock(**{'get_ordered_migrations.return_value':['v1', 'v2', 'v3']}))
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_ontology_ids.return_value':['id1', 'id2', 'id3'], 'get_ontology_by_version.side_effect':lambda v: 'content_%s' % v}))
+    def test_it_should_compile_the_deltas_of_all_pairs_of_versions(self, virtuoso_mock, simplevirtuosomigrate_mock, delta_store_mock, compute_deltas_mock, _execution_log_mock):
+        self.initial_config.update({'compile': True, 'compile_all_pairs': True, 'cache_dir': 'cache'})
+        main = Main(Config(self.initial_config))
+        main._compile()
+        compute_deltas_mock.assert_called_with([((0, 1), 'content_v1', 'content_v2'), ((0, 2), 'content_v1', 'content_v3'), ((1, 2), 'content_v2', 'content_v3')])
+        self.assertEqual(3, main.virtuoso.get_ontology_by_version.call_count)
+
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_current_version.return_value':(None, None)}))
+    def test_it_should_not_verify_a_graph_without_migrations(self, virtuoso_mock, _execution_log_mock):
+        self.initial_config.update({'verify': True})
+        main = Main(Config(self.initial_config))
+        self.assertRaisesWithMessage(Exception, 'there is no migration to verify the graph against', main.execute)
+
+    @patch('simple_virtuoso_migrate.main.LiveGraphFingerprint')
+    @patch('simple_virtuoso_migrate.main.GraphFingerprint', return_value=Mock(**{'compare.return_value':(['missing triple'], [], 3)}))
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_current_version.return_value':('0.1', 'git'), 'get_ontology_by_version.return_value':'ontology', 'parse_ontology.return_value':'graph'}))
+    def test_it_should_verify_the_graph_against_the_current_version(self, virtuoso_mock, _execution_log_mock, graph_fingerprint_mock, live_graph_fingerprint_mock):
+        self.initial_config.update({'verify': True})
+        main = Main(Config(self.initial_config))
+        result = main._verify()
+        main.virtuoso.get_ontology_by_version.assert_called_with('0.1')
+        graph_fingerprint_mock.assert_called_with('graph')
+        live_graph_fingerprint_mock.assert_called_with(main.virtuoso, 'graph')
+        graph_fingerprint_mock.return_value.compare.assert_called_with(live_graph_fingerprint_mock.return_value)
+        self.assertEqual(['missing triple'], result['missing'])
+        self.assertEqual([], result['extra'])
+        _execution_log_mock.assert_any_call('- missing triple', 'RED')
+
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._get_destination_version', return_value='destination_version')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_current_version.return_value':('current_version', 'git'), 'get_live_graph.return_value':[], 'get_ontology_by_version.return_value':'destination', 'parse_ontology.return_value':[], 'get_sparql.return_value':('sparql_up', 'sparql_down')}))
+    def test_it_should_reconcile_the_live_graph_with_the_destination_version(self, virtuoso_mock, _execution_log_mock, _get_destination_version_mock, execute_migrations_mock):
+        self.initial_config.update({'reconcile': True})
+        main = Main(Config(self.initial_config))
+        main.execute()
+        main.virtuoso.get_live_graph.assert_called_with(blank_nodes=False)
+        main.virtuoso.get_ontology_by_version.assert_called_with('destination_version')
+        main.virtuoso.parse_ontology.assert_called_with('destination')
+        self.assertEqual(1, main.virtuoso.get_ontology_by_version.call_count)
+        self.assertEqual(0, main.virtuoso.get_changed_ontology_modules.call_count)
+        self.assertEqual(([], 0, 'current_version', 'destination_version', 'git'), (main.virtuoso.get_sparql.call_args[0][0], len(main.virtuoso.get_sparql.call_args[0][1])) + main.virtuoso.get_sparql.call_args[0][2:])
+        execute_migrations_mock.assert_called_with('sparql_up', 'sparql_down', 'current_version', 'destination_version')
+
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_current_version.return_value':('current_file', 'file'), 'get_live_graph.return_value':[], 'get_ontology_from_file.return_value':'destination', 'parse_ontology.return_value':[], 'get_sparql.return_value':('sparql_up', 'sparql_down')}))
+    def test_it_should_reconcile_the_live_graph_with_a_file(self, virtuoso_mock, _execution_log_mock, execute_migrations_mock):
+        self.initial_config.update({'reconcile': True, 'file_migration': 'migration'})
+        main = Main(Config(self.initial_config))
+        main.execute()
+        self.assertEqual(0, main.virtuoso.get_ontology_by_version.call_count)
+        main.virtuoso.parse_ontology.assert_called_with('destination')
+        self.assertEqual(('current_file', 'migration', 'file'), main.virtuoso.get_sparql.call_args[0][2:])
+
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso')
+    def test_it_should_leave_the_triples_with_blank_nodes_out_of_the_reconciled_destination(self, virtuoso_mock, _execution_log_mock, execute_migrations_mock):
+        from rdflib.term import BNode, URIRef
+        role, restriction, functional = URIRef('http://example.com/role'), URIRef('http://example.com/restriction'), URIRef('http://example.com/functional')
+        node = BNode()
+        virtuoso_mock.return_value = Mock(**{'get_current_version.return_value':('current_file', 'file'), 'get_live_graph.return_value':[], 'get_ontology_from_file.return_value':'destination', 'parse_ontology.return_value':[(role, restriction, node), (node, functional, role), (role, functional, role)], 'get_sparql.return_value':('sparql_up', 'sparql_down')})
+        self.initial_config.update({'reconcile': True, 'file_migration': 'migration'})
+        main = Main(Config(self.initial_config))
+        main.execute()
+        self.assertEqual([(role, functional, role)], list(main.virtuoso.get_sparql.call_args[0][1]))
+
+    @patch('simple_virtuoso_migrate.main.skolemize', return_value='skolemized')
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_current_version.return_value':('current_version', 'git'), 'get_live_graph.return_value':'live', 'get_sparql.return_value':('sparql_up', 'sparql_down')}))
+    def test_it_should_skolemize_the_graph_on_the_server(self, virtuoso_mock, _execution_log_mock, execute_migrations_mock, skolemize_mock):
+        self.initial_config.update({'skolemize_server': True, 'database_graph': 'http://example.com/graph'})
+        main = Main(Config(self.initial_config))
+        result = main.execute()
+        skolemize_mock.assert_called_with('live', 'http://example.com/.well-known/genid/')
+        main.virtuoso.get_sparql.assert_called_with('live', 'skolemized', 'current_version', 'current_version', 'git')
+        execute_migrations_mock.assert_called_with('sparql_up', 'sparql_down', 'current_version', 'current_version')
+        self.assertEqual('skolemize', result['operation'])
+
+    @patch('simple_virtuoso_migrate.main.skolemize', return_value='skolemized')
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso')
+    def test_it_should_not_skolemize_the_live_graph_it_skolemizes_on_the_server(self, virtuoso_mock, _execution_log_mock, execute_migrations_mock, skolemize_mock):
+        bases = []
+        virtuoso = Mock(**{'get_current_version.return_value':('current_version', 'git'), 'get_live_graph.return_value':'live'})
+        virtuoso.skolem_base = 'http://example.com/.well-known/genid/'
+        virtuoso.get_sparql.side_effect = lambda *args: bases.append(virtuoso.skolem_base) or ('sparql_up', 'sparql_down')
+        virtuoso_mock.return_value = virtuoso
+        self.initial_config.update({'skolemize_server': True, 'skolemize': True, 'database_graph': 'http://example.com/graph'})
+        Main(Config(self.initial_config)).execute()
+        self.assertEqual([None], bases)
+        self.assertEqual('http://example.com/.well-known/genid/', virtuoso.skolem_base)
+
+    @patch('simple_virtuoso_migrate.main.DeltaStore')
+    @patch('simple_virtuoso_migrate.main.Virtuoso')
+    def test_it_should_keep_the_skolemized_deltas_apart_per_graph_authority(self, virtuoso_mock, delta_store_mock):
+        self.initial_config.update({'skolemize': True, 'cache_dir': 'cache', 'database_graph': 'http://example.com/graph'})
+        Main(Config(self.initial_config))
+        name = delta_store_mock.call_args[0][1]
+        self.assertTrue(name.startswith('skolem-deltas-'))
+        self.initial_config.update({'database_graph': 'http://example.com/other'})
+        Main(Config(self.initial_config))
+        self.assertEqual(name, delta_store_mock.call_args[0][1])
+        self.initial_config.update({'database_graph': 'http://example.org/graph'})
+        Main(Config(self.initial_config))
+        self.assertNotEqual(name, delta_store_mock.call_args[0][1])
+
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Main._compute_deltas', return_value=[])
+    @patch('simple_virtuoso_migrate.main.DeltaStore', return_value=Mock(**{'has.return_value':False}))
+    @patch('simple_virtuoso_migrate.main.SimpleVirtuosoMigrate', return_value=Mock(**{'get_ordered_migrations.return_value':['v1', 'v2']}))
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_ontology_ids.return_value':['id1', 'id2'], 'get_ontology_by_version.side_effect':lambda v: 'content_%s' % v}))
+    def test_it_should_compile_skolemized_deltas(self, virtuoso_mock, simplevirtuosomigrate_mock, delta_store_mock, compute_deltas_mock, _execution_log_mock):
+        self.initial_config.update({'compile': True, 'skolemize': True, 'cache_dir': 'cache', 'database_graph': 'http://example.com/graph'})
+        main = Main(Config(self.initial_config))
+        main._compile()
+        compute_deltas_mock.assert_called_with([((0, 1), 'content_v1', 'content_v2', 'http://example.com/.well-known/genid/')])
+
+    def test_it_should_not_watch_without_a_file_to_migrate_to(self):
+        self.initial_config.update({'watch': True})
+        main = Main(Config(self.initial_config))
+        self.assertRaisesWithMessage(Exception, "--watch needs the file to migrate to (-f)", main.execute)
+
+    @patch('simple_virtuoso_migrate.main.time.sleep', side_effect=[None, None, None, None, KeyboardInterrupt()])
+    @patch('simple_virtuoso_migrate.main.Main._get_modified', side_effect=[1, 1, 1, 1, 2, 2, 2])
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_current_version.return_value':('v1', 'git'), 'get_ontology_by_version.return_value':'v1 content', 'get_ontology_from_file.side_effect':['content 1', 'content 2'], 'parse_ontology.side_effect':lambda ontology: 'graph of %s' % ontology, 'get_sparql.return_value':('sparql_up', 'sparql_down')}))
+    def test_it_should_apply_only_the_changes_since_the_last_applied_graph_when_watching(self, virtuoso_mock, _execution_log_mock, execute_migrations_mock, get_modified_mock, sleep_mock):
+        self.initial_config.update({'watch': True, 'file_migration': 'file.ttl'})
+        main = Main(Config(self.initial_config))
+        self.assertRaises(KeyboardInterrupt, main.execute)
+        self.assertEqual([call('graph of v1 content', 'graph of content 1', 'v1', 'file.ttl', 'file'),
+                          call('graph of content 1', 'graph of content 2', 'file.ttl', 'file.ttl', 'file')],
+                         main.virtuoso.get_sparql.mock_calls)
+        self.assertEqual([call('sparql_up', 'sparql_down', 'v1', 'file.ttl'),
+                          call('sparql_up', 'sparql_down', 'file.ttl', 'file.ttl')],
+                         execute_migrations_mock.mock_calls)
+
+    @patch('simple_virtuoso_migrate.main.time.sleep', side_effect=[None, None, None, None, None, None, KeyboardInterrupt()])
+    @patch('simple_virtuoso_migrate.main.Main._get_modified', side_effect=[1, 1, 1, 2, 2, 2, 3, 3, 3, 3])
+    @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    @patch('simple_virtuoso_migrate.main.Virtuoso', return_value=Mock(**{'get_current_version.return_value':('file.ttl', 'file'), 'get_live_graph.return_value':'live graph', 'get_ontology_from_file.side_effect':['content 1', 'bad content', 'content 3'], 'get_sparql.return_value':('sparql_up', 'sparql_down')}))
+    def test_it_should_keep_watching_from_the_last_applied_graph_after_an_error(self, virtuoso_mock, _execution_log_mock, execute_migrations_mock, get_modified_mock, sleep_mock):
+        def parse_ontology(ontology):
+            if ontology == 'bad content':
+                raise MigrationException("Error parsing graph")
+            return 'graph of %s' % ontology
+        virtuoso_mock.return_value.parse_ontology.side_effect = parse_ontology
+        self.initial_config.update({'watch': True, 'file_migration': 'file.ttl'})
+        main = Main(Config(self.initial_config))
+        self.assertRaises(KeyboardInterrupt, main.execute)
+        self.assertEqual([call('live graph', 'graph of content 1', 'file.ttl', 'file.ttl', 'file'),
+                          call('graph of content 1', 'graph of content 3', 'file.ttl', 'file.ttl', 'file')],
+                         main.virtuoso.get_sparql.mock_calls)
+        _execution_log_mock.assert_any_call('[ERROR] Error parsing graph', 'RED', log_level_limit=1)
+
     @patch('simple_virtuoso_migrate.main.SimpleVirtuosoMigrate', return_value=Mock(**{'check_if_version_exists.return_value':True}))
     def test_it_should_get_destination_version_when_user_informs_a_specific_version(self, simplevirtuosomigrate_mock):
         self.initial_config.update({"schema_version": "20090214115300"})
@@ -332,10 +804,7 @@ class MainTest(BaseTest):
     def test_it_should_not_accept_file_migration_option_for_first_database_migration(self, cli_mock, _execution_log_mock, virtuoso_mock, execute_migrations_mock):
         self.initial_config.update({"file_migration":"migration"})
         main = Main(Config(self.initial_config))
-        try:
-            main.execute()
-        except SystemExit:
-            pass
+        self.assertRaisesWithMessage(MigrationException, "Can't execute migration FROM None TO File (TIP: version it using git --tag and then use -m)", main.execute)
 
         expected_calls = [
             call('\nStarting Virtuoso migration...', 'PINK', log_level_limit=1),
@@ -343,7 +812,6 @@ class MainTest(BaseTest):
             call('- Destination version is: migration', 'GREEN', log_level_limit=1)
         ]
         self.assertEqual(expected_calls, _execution_log_mock.mock_calls)
-        cli_mock.assert_called_with("[ERROR] Can't execute migration FROM None TO File (TIP: version it using git --tag and then use -m)\n", 'RED')
         self.assertEqual(0, execute_migrations_mock.call_count)
 
     @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
@@ -353,10 +821,7 @@ class MainTest(BaseTest):
     def test_it_should_not_accept_file_migration_option_if_current_version_is_already_a_file(self, cli_mock, _execution_log_mock, virtuoso_mock, execute_migrations_mock):
         self.initial_config.update({"file_migration":"migration"})
         main = Main(Config(self.initial_config))
-        try:
-            main.execute()
-        except SystemExit:
-            pass
+        self.assertRaisesWithMessage(MigrationException, "Can't execute migration FROM File TO File (TIP: version it using git --tag and then use -m)", main.execute)
 
         expected_calls = [
             call('\nStarting Virtuoso migration...', 'PINK', log_level_limit=1),
@@ -364,7 +829,6 @@ class MainTest(BaseTest):
             call('- Destination version is: migration', 'GREEN', log_level_limit=1)
         ]
         self.assertEqual(expected_calls, _execution_log_mock.mock_calls)
-        cli_mock.assert_called_with("[ERROR] Can't execute migration FROM File TO File (TIP: version it using git --tag and then use -m)\n", 'RED')
         self.assertEqual(0, execute_migrations_mock.call_count)
 
     @patch('simple_virtuoso_migrate.main.Main._execute_migrations')
@@ -454,6 +918,46 @@ class MainTest(BaseTest):
         ]
         self.assertEqual(expected_calls, _execution_log_mock.mock_calls)
 
+    @patch('simple_virtuoso_migrate.main.Virtuoso')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_warn_about_rollback_safety_in_bulk_mode(self, _execution_log_mock, virtuoso_mock):
+        self.initial_config.update({"bulk":True})
+        main = Main(Config(self.initial_config))
+        main._execute_migrations("sparql_up line 1\nsparql_up line 2\nsparql_up line 3", "sparql_down", "current_version", "destination_version")
+        warning = _execution_log_mock.mock_calls[4]
+        self.assertTrue(warning[1][0].startswith("\nWARNING: bulk mode"))
+        self.assertEqual(('RED',), warning[1][1:])
+        self.assertEqual(1, main.virtuoso.execute_change.call_count)
+
+    @patch('simple_virtuoso_migrate.main.Main._log_load_estimate')
+    @patch('simple_virtuoso_migrate.main.Main._warn_bulk')
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_make_a_single_checkpoint_for_a_bulk_load(self, _execution_log_mock, _warn_bulk_mock, _log_load_estimate_mock):
+        self.initial_config.update({'load_ttl': 'new_triple.ttl', 'bulk': True})
+        virtuoso = Mock()
+        virtuoso.get_current_version.return_value = ('0.1', 'git')
+        virtuoso.upload_ttls_to_virtuoso.return_value = {'new_triple.ttl': ('out', '')}
+        virtuoso.get_sparql.return_value = ('\nsparql_up', 'sparql_down')
+        virtuoso.begin_bulk.return_value = 60
+        main = Main(Config(self.initial_config), virtuoso=virtuoso, log=Mock())
+        main.execute()
+        self.assertEqual(1, virtuoso.execute_change.call_count)
+        self.assertEqual(1, virtuoso.begin_bulk.call_count)
+        virtuoso.end_bulk.assert_called_once_with(60)
+        self.assertEqual(1, _warn_bulk_mock.call_count)
+
+    @patch('simple_virtuoso_migrate.main.Main._execution_log')
+    def test_it_should_restore_the_checkpoints_when_a_bulk_migration_fails(self, _execution_log_mock):
+        self.initial_config.update({'bulk': True, 'file_migration': 'migration'})
+        virtuoso = Mock()
+        virtuoso.get_current_version.return_value = ('0.1', 'git')
+        virtuoso.get_sparql.return_value = ('\nSPARQL 1;\nSPARQL 2;', 'sparql_down')
+        virtuoso.begin_bulk.return_value = 60
+        virtuoso.execute_change.side_effect = MigrationException('some error')
+        main = Main(Config(self.initial_config), virtuoso=virtuoso, log=Mock())
+        self.assertRaisesWithMessage(MigrationException, 'some error', main.execute)
+        virtuoso.end_bulk.assert_called_once_with(60)
+
     @patch('simple_virtuoso_migrate.main.Virtuoso')
     @patch('simple_virtuoso_migrate.main.Main._execution_log')
     def test_it_should_not_execute_any_sparql_if_asked_to_show_sparql_only(self, _execution_log_mock, virtuoso_mock):
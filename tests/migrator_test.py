@@ -0,0 +1,149 @@
+import threading
+import time
+import unittest
+from mock import patch, Mock
+from simple_virtuoso_migrate.core.exceptions import MigrationException
+from simple_virtuoso_migrate.migrator import Migrator, OntologyCache
+from tests import BaseTest, create_file, delete_files
+
+ONTOLOGY = "<http://example.com/a> <http://example.com/p> <http://example.com/b> ."
+
+
+class OntologyCacheTest(unittest.TestCase):
+
+    def test_it_should_parse_an_ontology_only_once(self):
+        parse = Mock(return_value='graph')
+        cache = OntologyCache()
+        self.assertEqual('graph', cache.get(ONTOLOGY, parse))
+        self.assertEqual('graph', cache.get([ONTOLOGY], parse))
+        self.assertEqual(1, parse.call_count)
+
+    def test_it_should_drop_the_least_recently_used_ontology(self):
+        parse = Mock(side_effect=lambda ontology: 'graph %s' % ontology)
+        cache = OntologyCache(max_size=2)
+        cache.get('a', parse)
+        cache.get('b', parse)
+        cache.get('a', parse)
+        cache.get('c', parse)
+        self.assertEqual(2, len(cache))
+        cache.get('a', parse)
+        self.assertEqual(3, parse.call_count)
+        cache.get('b', parse)
+        self.assertEqual(4, parse.call_count)
+
+
+class MigratorTest(BaseTest):
+
+    def setUp(self):
+        super(MigratorTest, self).setUp()
+        self.config = {
+            'DATABASE_HOST': 'localhost',
+            'DATABASE_PORT': 'port',
+            'DATABASE_ENDPOINT': 'test',
+            'DATABASE_USER': 'user',
+            'DATABASE_PASSWORD': 'password',
+            'DATABASE_MIGRATIONS_DIR': '.',
+            'DATABASE_GRAPH': 'graph',
+            'DATABASE_ONTOLOGY': 'ontology.ttl',
+            'MIGRATION_GRAPH': 'http://example.com',
+            'VIRTUOSO_DIRS_ALLOWED': '/tmp'
+        }
+        create_file("ontology.ttl", ONTOLOGY)
+
+    def tearDown(self):
+        super(MigratorTest, self).tearDown()
+        delete_files("ontology.ttl")
+
+    @patch('simple_virtuoso_migrate.migrator.Main.execute', return_value={'operation': 'migration'})
+    def test_it_should_return_the_result_of_the_operation(self, execute_mock):
+        self.assertEqual({'operation': 'migration'}, Migrator(self.config).migrate('v1'))
+
+    @patch('simple_virtuoso_migrate.migrator.Main')
+    def test_it_should_override_the_settings_per_call(self, main_mock):
+        Migrator(self.config).migrate('v1', database_graph='other_graph')
+        config = main_mock.call_args[0][0]
+        self.assertEqual('other_graph', config.get('database_graph'))
+        self.assertEqual('v1', config.get('schema_version'))
+        self.assertEqual(0, config.get('log_level'))
+
+    @patch('simple_virtuoso_migrate.migrator.Main')
+    def test_it_should_export_the_graph(self, main_mock):
+        Migrator(self.config).export('backups', True)
+        config = main_mock.call_args[0][0]
+        self.assertEqual('backups', config.get('export'))
+        self.assertEqual(True, config.get('export_compress'))
+
+    @patch('simple_virtuoso_migrate.migrator.Main')
+    def test_it_should_reuse_the_virtuoso_of_a_graph_between_calls(self, main_mock):
+        migrator = Migrator(self.config)
+        migrator.migrate('v1')
+        migrator.verify()
+        migrator.migrate('v1', database_graph='other_graph')
+        virtuosos = [kwargs['virtuoso'] for _, kwargs in main_mock.call_args_list]
+        self.assertTrue(virtuosos[0] is virtuosos[1])
+        self.assertFalse(virtuosos[0] is virtuosos[2])
+        self.assertTrue(virtuosos[0].keep_connections)
+        self.assertTrue(virtuosos[0].ontology_cache is virtuosos[2].ontology_cache)
+
+    @patch('simple_virtuoso_migrate.migrator.Main')
+    def test_it_should_reuse_the_git_tags_of_a_graph_between_calls(self, main_mock):
+        migrator = Migrator(self.config)
+        migrator.migrate('v1')
+        migrator.migrate('v2')
+        migrator.migrate('v1', database_graph='other_graph')
+        virtuoso_migrates = [kwargs['virtuoso_migrate'] for _, kwargs in main_mock.call_args_list]
+        self.assertTrue(virtuoso_migrates[0] is virtuoso_migrates[1])
+        self.assertFalse(virtuoso_migrates[0] is virtuoso_migrates[2])
+
+    @patch('simple_virtuoso_migrate.migrator.Main.execute', side_effect=MigrationException("some error"))
+    def test_it_should_raise_errors_instead_of_exiting(self, execute_mock):
+        self.assertRaisesWithMessage(MigrationException, "some error", Migrator(self.config).migrate)
+
+    def test_it_should_raise_error_if_a_required_setting_is_missing(self):
+        del self.config['DATABASE_HOST']
+        self.assertRaisesWithMessage(Exception, "invalid key ('database_host')", Migrator(self.config).migrate)
+
+    @patch('simple_virtuoso_migrate.migrator.Main')
+    def test_it_should_serialize_the_calls_on_the_same_graph(self, main_mock):
+        running = []
+        overlaps = []
+
+        def execute():
+            running.append(1)
+            overlaps.append(len(running))
+            time.sleep(0.01)
+            running.pop()
+        main_mock.return_value.execute.side_effect = execute
+
+        migrator = Migrator(self.config)
+        threads = [threading.Thread(target=migrator.migrate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([1, 1, 1, 1], overlaps)
+
+    @patch('simple_virtuoso_migrate.migrator.Main')
+    def test_it_should_plan_a_migration_without_executing_it(self, main_mock):
+        Migrator(self.config).plan('v1')
+        config = main_mock.call_args[0][0]
+        self.assertEqual(True, config.get('show_sparql_only'))
+        self.assertEqual('v1', config.get('schema_version'))
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso.get_current_version', return_value=('v1', 'git'))
+    def test_it_should_get_the_status_of_a_graph(self, get_current_version_mock):
+        self.assertEqual({'operation': 'status', 'database_graph': 'graph', 'current_version': 'v1', 'origen': 'git', 'queued': 0}, Migrator(self.config).status())
+
+    @patch('simple_virtuoso_migrate.migrator.Main')
+    def test_it_should_close_the_connections_kept_open(self, main_mock):
+        migrator = Migrator(self.config)
+        migrator.migrate()
+        virtuoso = main_mock.call_args[1]['virtuoso']
+        virtuoso._ssh = Mock()
+        ssh = virtuoso._ssh
+        migrator.close()
+        ssh.close.assert_called_with()
+        self.assertEqual(None, virtuoso._ssh)
+
+if __name__ == "__main__":
+    unittest.main()
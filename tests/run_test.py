@@ -239,5 +239,15 @@ RUN_AFTER = './some_dummy_action.py'
         config_used = main_mock.call_args[0][0]
         self.assertEqual('version', config_used.get('schema_version'))
 
+    @patch('simple_virtuoso_migrate.server.serve')
+    @patch.object(simple_virtuoso_migrate.main.Main, '__init__', return_value=None)
+    @patch.object(simple_virtuoso_migrate.helpers.Utils, 'get_variables_from_file', return_value = {'DATABASE_HOST':'host', 'DATABASE_USER': 'root', 'DATABASE_PASSWORD':'', 'DATABASE_ENDPOINT':'database', 'DATABASE_MIGRATIONS_DIR':'.'})
+    def test_it_should_serve_instead_of_executing_when_serve_is_given(self, import_file_mock, main_mock, serve_mock):
+        run.run_from_argv(["-c", os.path.abspath('sample.conf'), '--serve', '8080'])
+        self.assertEqual(0, main_mock.call_count)
+        config_used, address = serve_mock.call_args[0]
+        self.assertEqual('8080', address)
+        self.assertEqual('host', config_used.get('database_host'))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from mock import patch, Mock
+from simple_virtuoso_migrate.scheduler import BatchScheduler
+
+
+class Clock(object):
+    """ time.time that advances by the latency given for each batch """
+
+    def __init__(self, latencies):
+        self.now = 0.0
+        self.latencies = list(latencies)
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def execute(self, batch):
+        self.now += self.latencies.pop(0)
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class BatchSchedulerTest(unittest.TestCase):
+
+    def _run(self, scheduler, statements, latencies):
+        clock = Clock(latencies)
+        with patch('simple_virtuoso_migrate.scheduler.time', clock):
+            scheduler.run(statements, clock.execute)
+        return clock
+
+    def test_it_should_execute_all_statements_in_order(self):
+        executed = []
+        with patch('simple_virtuoso_migrate.scheduler.time.sleep'):
+            BatchScheduler(10, batch_size=3).run(range(10), executed.extend)
+        self.assertEqual(range(10), executed)
+
+    def test_it_should_grow_the_batches_additively_under_the_target_latency(self):
+        scheduler = BatchScheduler(1, batch_size=10)
+        self._run(scheduler, range(200), [0.5] * 4)
+        self.assertEqual([10, 60, 110, 20], [size for size, _ in scheduler.batches])
+
+    def test_it_should_halve_the_batches_over_the_target_latency(self):
+        scheduler = BatchScheduler(1, batch_size=100)
+        self._run(scheduler, range(175), [2, 2, 2])
+        self.assertEqual([100, 50, 25], [size for size, _ in scheduler.batches])
+
+    def test_it_should_not_shrink_the_batches_to_nothing(self):
+        scheduler = BatchScheduler(1, batch_size=2)
+        self._run(scheduler, range(3), [2, 2, 2])
+        self.assertEqual([2, 1], [size for size, _ in scheduler.batches])
+
+    def test_it_should_limit_the_rate_of_statements(self):
+        scheduler = BatchScheduler(10, max_rate=100, batch_size=50)
+        clock = self._run(scheduler, range(150), [0.1, 0.1])
+        self.assertEqual([0.4], clock.sleeps)
+
+    def test_it_should_pause_when_the_server_is_too_slow(self):
+        scheduler = BatchScheduler(1, batch_size=10, pause=5)
+        clock = self._run(scheduler, range(15), [4.5, 0.1])
+        self.assertEqual([5], clock.sleeps)
+
+    def test_it_should_not_wait_after_the_last_batch(self):
+        scheduler = BatchScheduler(1, max_rate=1, batch_size=10)
+        clock = self._run(scheduler, range(10), [0.1])
+        self.assertEqual([], clock.sleeps)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import threading
+import unittest
+import urllib2
+from mock import Mock
+from simple_virtuoso_migrate.core.exceptions import MigrationException
+from simple_virtuoso_migrate.server import MigrationServer, parse_address, parse_settings
+
+
+class ServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.migrator = Mock()
+        self.server = MigrationServer(("127.0.0.1", 0), self.migrator)
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.01})
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def _request(self, path, body=None, content_type="application/json"):
+        url = "http://127.0.0.1:%d%s" % (self.server.server_address[1], path)
+        request = urllib2.Request(url, body)
+        if body is not None:
+            request.add_header("Content-Type", content_type)
+        try:
+            response = urllib2.urlopen(request)
+            return response.getcode(), json.loads(response.read())
+        except urllib2.HTTPError, e:
+            return e.code, json.loads(e.read())
+
+    def test_it_should_get_the_status_of_a_graph(self):
+        self.migrator.status.return_value = {'operation': 'status', 'current_version': 'v1'}
+        self.assertEqual((200, {'operation': 'status', 'current_version': 'v1'}), self._request("/status?database_graph=graph"))
+        self.migrator.status.assert_called_with(database_graph='graph')
+
+    def test_it_should_plan_a_migration_with_the_settings_of_the_body(self):
+        self.migrator.plan.return_value = {'operation': 'migration', 'sparql_up': 'up'}
+        self.assertEqual((200, {'operation': 'migration', 'sparql_up': 'up'}), self._request("/plan", json.dumps({'database_graph': 'graph', 'schema_version': 'v2'})))
+        self.migrator.plan.assert_called_with(database_graph=u'graph', schema_version=u'v2')
+
+    def test_it_should_apply_a_migration(self):
+        self.migrator.migrate.return_value = {'operation': 'migration'}
+        self.assertEqual(200, self._request("/apply?database_graph=graph", json.dumps({'schema_version': 'v2'}))[0])
+        self.migrator.migrate.assert_called_with(database_graph='graph', schema_version='v2')
+
+    def test_it_should_verify_a_graph(self):
+        self.migrator.verify.return_value = {'operation': 'verify', 'missing': [], 'extra': []}
+        self.assertEqual(200, self._request("/verify", "")[0])
+        self.migrator.verify.assert_called_with()
+
+    def test_it_should_answer_errors_as_json(self):
+        self.migrator.migrate.side_effect = MigrationException("some error")
+        self.assertEqual((500, {'error': 'some error'}), self._request("/apply", "{}"))
+
+    def test_it_should_refuse_a_body_that_is_not_a_json_object(self):
+        self.assertEqual(400, self._request("/apply", "[1]")[0])
+        self.assertEqual(0, self.migrator.migrate.call_count)
+
+    def test_it_should_parse_the_boolean_and_number_settings(self):
+        self.migrator.migrate.return_value = {'operation': 'migration'}
+        self.assertEqual(200, self._request("/apply?show_sparql=0&bulk=true", json.dumps({'target_latency': '0.5', 'reconcile': False, 'schema_version': 2}))[0])
+        self.migrator.migrate.assert_called_with(show_sparql=False, bulk=True, target_latency=0.5, reconcile=False, schema_version=u'2')
+
+    def test_it_should_refuse_settings_a_request_cant_give(self):
+        for settings in [{'run_after': 'script.py'}, {'log_dir': '/tmp'}, {'database_password': 'x'}, {'file_migration': 'x.ttl'}, {'bulk': 'maybe'}, {'database_graph': ['a']}]:
+            self.assertEqual(400, self._request("/apply", json.dumps(settings))[0])
+        self.assertEqual(400, self._request("/status?cache_dir=/tmp")[0])
+        self.assertEqual(0, self.migrator.migrate.call_count)
+        self.assertEqual(0, self.migrator.status.call_count)
+
+    def test_it_should_refuse_requests_that_are_not_sent_as_json(self):
+        self.assertEqual(415, self._request("/apply?schema_version=v2", "", "application/x-www-form-urlencoded")[0])
+        self.assertEqual(415, self._request("/apply", json.dumps({'schema_version': 'v2'}), "text/plain")[0])
+        self.assertEqual(0, self.migrator.migrate.call_count)
+
+    def test_it_should_convert_the_settings_to_their_type(self):
+        self.assertEqual({'show_sparql_only': True, 'max_statements_per_second': 10.0}, parse_settings({'show_sparql_only': 'Yes', 'max_statements_per_second': 10}))
+        self.assertRaises(ValueError, parse_settings, {'target_latency': 'fast'})
+        self.assertRaises(ValueError, parse_settings, {'show_sparql': 1})
+
+    def test_it_should_answer_not_found_for_unknown_paths(self):
+        self.assertEqual(404, self._request("/unknown")[0])
+        self.assertEqual(404, self._request("/status", "{}")[0])
+
+    def test_it_should_parse_the_address_to_serve_on(self):
+        self.assertEqual(("127.0.0.1", 8080), parse_address("8080"))
+        self.assertEqual(("0.0.0.0", 8080), parse_address("0.0.0.0:8080"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from rdflib.graph import ConjunctiveGraph
+from rdflib.term import BNode, URIRef
+from simple_virtuoso_migrate.skolem import genid_base, skolemize
+from tests import BaseTest
+
+TTL = """
+@prefix : <http://example.com/> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+:A owl:equivalentClass [ a owl:Restriction ; owl:onProperty :p ] .
+:B owl:equivalentClass [ a owl:Restriction ; owl:onProperty :p ] .
+:C owl:unionOf (:A :B) .
+:D owl:unionOf (:X :B) .
+"""
+BASE = "http://example.com/.well-known/genid/"
+
+
+def parse(ttl):
+    graph = ConjunctiveGraph()
+    graph.parse(data=ttl, format='turtle')
+    return graph
+
+
+class SkolemTest(BaseTest):
+
+    def test_it_should_get_the_genid_base_of_a_graph(self):
+        self.assertEqual(BASE, genid_base("http://example.com/graph/x"))
+        self.assertEqual("https://example.com:8890/.well-known/genid/", genid_base("https://example.com:8890/graph"))
+
+    def test_it_should_not_get_the_genid_base_of_a_graph_without_authority(self):
+        self.assertRaisesWithMessage(Exception, "can't skolemize blank nodes of a graph whose name has no authority ('test')", genid_base, "test")
+
+    def test_it_should_replace_all_blank_nodes(self):
+        skolemized = skolemize(parse(TTL), BASE)
+        self.assertEqual(len(parse(TTL)), len(skolemized))
+        for triple in skolemized:
+            for term in triple:
+                self.assertFalse(isinstance(term, BNode))
+
+    def test_it_should_give_the_same_iris_to_every_parse(self):
+        self.assertEqual(set(skolemize(parse(TTL), BASE)), set(skolemize(parse(TTL), BASE)))
+
+    def test_it_should_keep_the_iris_of_unchanged_blank_nodes(self):
+        changed = TTL.replace(":D owl:unionOf (:X :B) .", "")
+        removed = set(skolemize(parse(TTL), BASE)) - set(skolemize(parse(changed), BASE))
+        self.assertEqual(5, len(removed))
+        for subject, _, _ in removed:
+            self.assertTrue(subject == URIRef("http://example.com/D") or subject.startswith(BASE))
+
+    def test_it_should_give_different_iris_to_equal_blank_nodes_in_different_places(self):
+        skolemized = skolemize(parse(TTL), BASE)
+        restrictions = set(skolemized.objects(None, URIRef("http://www.w3.org/2002/07/owl#equivalentClass")))
+        self.assertEqual(2, len(restrictions))
+        # the tails of the two lists are both (:B)
+        tails = set(skolemized.subjects(URIRef("http://www.w3.org/1999/02/22-rdf-syntax-ns#first"), URIRef("http://example.com/B")))
+        self.assertEqual(2, len(tails))
+
+    def test_it_should_skolemize_cyclic_blank_nodes(self):
+        skolemized = skolemize(parse("_:a <http://example.com/p> _:b . _:b <http://example.com/p> _:a ."), BASE)
+        self.assertEqual(2, len(skolemized))
+        self.assertEqual(2, len(set(skolemized.subjects())))
+
+if __name__ == "__main__":
+    unittest.main()
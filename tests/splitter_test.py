@@ -0,0 +1,85 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from rdflib.graph import ConjunctiveGraph
+from simple_virtuoso_migrate.splitter import split_ttl
+
+PREFIXES = """@prefix : <http://example.com/> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+"""
+
+
+class SplitterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.chunks_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        shutil.rmtree(self.chunks_dir)
+
+    def write(self, content):
+        path = os.path.join(self.directory, 'data.ttl')
+        f = open(path, 'w')
+        f.write(content)
+        f.close()
+        return path
+
+    def parse(self, path):
+        graph = ConjunctiveGraph()
+        graph.parse(path, format='turtle')
+        return graph
+
+    def count(self, paths):
+        return sum([len(self.parse(path)) for path in paths])
+
+    def test_it_should_not_split_a_small_file(self):
+        path = self.write(PREFIXES + ':a :p :b .\n')
+        self.assertEqual([path], split_ttl(path, 1000, self.chunks_dir))
+        self.assertEqual([], os.listdir(self.chunks_dir))
+
+    def test_it_should_split_a_file_at_statement_ends_carrying_the_prefixes(self):
+        content = PREFIXES + "".join([':s%d :p [ :q "a.\\n" ] ;\n    rdfs:label """long.\nstring""" .\n' % i for i in range(20)])
+        path = self.write(content)
+        chunks = split_ttl(path, 200, self.chunks_dir)
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(['data.0001.ttl', 'data.0002.ttl'], sorted(os.listdir(self.chunks_dir))[:2])
+        for chunk in chunks:
+            self.assertTrue(open(chunk).read().startswith(PREFIXES))
+        self.assertEqual(len(self.parse(path)), self.count(chunks))
+
+    def test_it_should_split_a_compressed_file_in_uncompressed_chunks(self):
+        content = PREFIXES + "".join([':s%d :p "%s" .\n' % (i, 'x' * 20) for i in range(50)])
+        path = os.path.join(self.directory, 'data.ttl.gz')
+        f = gzip.open(path, 'wb')
+        f.write(content)
+        f.close()
+        chunks = split_ttl(path, 100, self.chunks_dir)
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual('data.0001.ttl', os.path.basename(chunks[0]))
+        self.assertEqual(50, self.count(chunks))
+
+    def test_it_should_not_split_inside_brackets_or_after_comments(self):
+        content = PREFIXES + "".join([':s%d :p ( :a :b ) ;\n    :q [ :r :c ] . # end.\n:t%d :p :x ; # not yet.\n    :q :y .\n' % (i, i) for i in range(20)])
+        path = self.write(content)
+        chunks = split_ttl(path, 150, self.chunks_dir)
+        self.assertTrue(len(chunks) > 1)
+        for chunk in chunks:
+            self.parse(chunk)
+        self.assertEqual(len(self.parse(path)), self.count(chunks))
+
+    def test_it_should_not_split_a_file_with_blank_node_labels(self):
+        path = self.write(PREFIXES + "".join([':s%d :p _:b .\n_:b :q :o .\n' % i for i in range(20)]))
+        self.assertEqual([path], split_ttl(path, 100, self.chunks_dir))
+        self.assertEqual([], os.listdir(self.chunks_dir))
+
+    def test_it_should_not_split_a_file_with_a_single_statement(self):
+        path = self.write(PREFIXES + ':a :p ' + ', '.join([':o%d' % i for i in range(50)]) + ' .\n')
+        self.assertEqual([path], split_ttl(path, 100, self.chunks_dir))
+        self.assertEqual([], os.listdir(self.chunks_dir))
+
+if __name__ == "__main__":
+    unittest.main()
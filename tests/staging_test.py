@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+from mock import patch
+from simple_virtuoso_migrate.staging import stage, unstage
+
+
+class StagingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.origin = os.path.join(self.directory, 'data.ttl')
+        self.destination = os.path.join(self.directory, 'staged.ttl')
+        f = open(self.origin, 'w')
+        f.write('content')
+        f.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_it_should_stage_by_hardlink_on_the_same_filesystem(self):
+        self.assertEqual('hardlink', stage(self.origin, self.destination))
+        self.assertTrue(os.path.samefile(self.origin, self.destination))
+        unstage(self.origin, self.destination, 'hardlink')
+        self.assertFalse(os.path.exists(self.destination))
+        self.assertTrue(os.path.exists(self.origin))
+
+    @patch('simple_virtuoso_migrate.staging.os.link', side_effect=OSError(18, 'Invalid cross-device link'))
+    @patch('fcntl.ioctl', side_effect=IOError(95, 'Operation not supported'))
+    def test_it_should_stage_by_rename_when_it_cant_link_nor_clone(self, ioctl_mock, link_mock):
+        self.assertEqual('rename', stage(self.origin, self.destination))
+        self.assertFalse(os.path.exists(self.origin))
+        self.assertEqual(1, ioctl_mock.call_count)
+        unstage(self.origin, self.destination, 'rename')
+        self.assertFalse(os.path.exists(self.destination))
+        self.assertEqual('content', open(self.origin).read())
+
+    @patch('simple_virtuoso_migrate.staging.os.link', side_effect=OSError(18, 'Invalid cross-device link'))
+    @patch('fcntl.ioctl')
+    def test_it_should_stage_by_reflink_when_it_cant_link(self, ioctl_mock, link_mock):
+        self.assertEqual('reflink', stage(self.origin, self.destination))
+        self.assertTrue(os.path.exists(self.destination))
+
+    @patch('simple_virtuoso_migrate.staging.os.rename', side_effect=OSError(18, 'Invalid cross-device link'))
+    @patch('simple_virtuoso_migrate.staging.os.link', side_effect=OSError(18, 'Invalid cross-device link'))
+    @patch('fcntl.ioctl', side_effect=IOError(18, 'Invalid cross-device link'))
+    def test_it_should_copy_across_filesystems(self, ioctl_mock, link_mock, rename_mock):
+        self.assertEqual('copy', stage(self.origin, self.destination))
+        self.assertEqual('content', open(self.destination).read())
+        self.assertTrue(os.path.exists(self.origin))
+
+    def test_it_should_not_touch_an_existing_destination(self):
+        other = os.path.join(self.directory, 'other.ttl')
+        f = open(other, 'w')
+        f.write('other content')
+        f.close()
+        # left by an interrupted load
+        os.link(other, self.destination)
+        self.assertRaises(OSError, stage, self.origin, self.destination)
+        self.assertEqual('other content', open(other).read())
+        self.assertEqual('content', open(self.origin).read())
+
+    @patch('simple_virtuoso_migrate.staging.os.link', side_effect=OSError(18, 'Invalid cross-device link'))
+    @patch('fcntl.ioctl', side_effect=IOError(95, 'Operation not supported'))
+    def test_it_should_not_replace_an_existing_destination_when_it_cant_link(self, ioctl_mock, link_mock):
+        other = os.path.join(self.directory, 'other.ttl')
+        f = open(other, 'w')
+        f.write('other content')
+        f.close()
+        os.symlink(other, self.destination)
+        self.assertRaises(OSError, stage, self.origin, self.destination)
+        self.assertEqual(0, ioctl_mock.call_count)
+        self.assertEqual('other content', open(other).read())
+        self.assertEqual('content', open(self.origin).read())
+        self.assertTrue(os.path.islink(self.destination))
+
+if __name__ == "__main__":
+    unittest.main()
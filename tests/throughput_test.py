@@ -0,0 +1,60 @@
+import csv
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from simple_virtuoso_migrate.throughput import LoadReport
+
+MB = 1024 * 1024
+
+
+class LoadReportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.report = LoadReport()
+        self.report.add('a.ttl', 10 * MB, 1.0, 4.0)
+        self.report.add('b.ttl', 2 * MB, 0.5, 0.5)
+        self.report.set_triples('a.ttl', 5000)
+
+    def test_it_should_give_the_throughput_of_each_file_slowest_first(self):
+        records = self.report.records()
+        self.assertEqual(['a.ttl', 'b.ttl'], [record['file'] for record in records])
+        self.assertEqual(2 * MB, records[0]['bytes_per_second'])
+        self.assertEqual(1000, records[0]['triples_per_second'])
+        self.assertEqual(None, records[1]['triples_per_second'])
+
+    def test_it_should_add_the_chunks_of_a_file_to_the_file(self):
+        self.report.add('c.0001.ttl', MB, 1.0, 2.0)
+        self.report.add('c.0002.ttl', MB, 1.0, 3.0)
+        self.report.merge('c.0001.ttl', 'c.ttl')
+        self.report.merge('c.0002.ttl', 'c.ttl')
+        self.assertEqual(['a.ttl', 'b.ttl', 'c.ttl'], sorted(self.report.files.keys()))
+        self.assertEqual({'file': 'c.ttl', 'bytes': 2 * MB, 'triples': None, 'transfer_seconds': 2.0, 'ingest_seconds': 5.0}, self.report.files['c.ttl'])
+
+    def test_it_should_summarize_the_load(self):
+        self.report.seconds = 4.0
+        self.report.triples = 8000
+        self.assertEqual('- Loaded 12.0 MB in 0:00:04 (3.0 MB/s, 2000 triples/s), 8000 triple(s) added; transfer 1.5s, ingest 4.5s', self.report.summary())
+        self.assertEqual('  a.ttl: 10.0 MB, transfer 1.00s, ingest 4.00s, 2.0 MB/s, 5000 triple(s)\n  b.ttl: 2.0 MB, transfer 0.50s, ingest 0.50s, 2.0 MB/s', self.report.details())
+
+    def test_it_should_write_the_report_as_json_and_csv(self):
+        self.report.seconds = 4.0
+        directory = tempfile.mkdtemp()
+        try:
+            json_path, csv_path = self.report.write(directory, datetime.datetime(2014, 3, 1, 12, 30, 5))
+            self.assertEqual(os.path.join(directory, 'load-20140301123005.json'), json_path)
+            report = json.load(open(json_path))
+            self.assertEqual(12 * MB, report['bytes'])
+            self.assertEqual(4.0, report['seconds'])
+            self.assertEqual(['a.ttl', 'b.ttl'], [record['file'] for record in report['files']])
+            rows = list(csv.DictReader(open(csv_path)))
+            self.assertEqual('a.ttl', rows[0]['file'])
+            self.assertEqual('5000', rows[0]['triples'])
+            self.assertEqual('', rows[1]['triples'])
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import pipes
+import shutil
+import subprocess
+import tempfile
+import unittest
+from mock import patch, Mock
+from simple_virtuoso_migrate.transfer import SIGNATURES_SCRIPT, chunks, remote_signatures, send_file
+
+
+class LocalConnection(object):
+    """ Runs the remote side of the transfers on this host """
+
+    def __init__(self):
+        self.sent = 0
+
+    def put(self, local_path, remote_path):
+        self.sent += os.path.getsize(local_path)
+        shutil.copyfile(local_path, remote_path)
+
+    def execute(self, command):
+        process = subprocess.Popen(command, shell=True,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        stdout_value, stderr_value = process.communicate()
+        return (stdout_value or stderr_value).splitlines(True)
+
+
+class TransferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.local = os.path.join(self.directory, 'data.ttl')
+        self.remote = os.path.join(self.directory, 'remote.ttl')
+        self.lines = ['<http://example.com/s%d> <http://example.com/p> "%d" .\n' % (i, i) for i in range(40000)]
+        self.connection = LocalConnection()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, path, lines):
+        f = open(path, 'wb')
+        f.write("".join(lines))
+        f.close()
+
+    def test_it_should_send_the_whole_file_when_there_is_no_previous_upload(self):
+        self.write(self.local, self.lines)
+        self.assertEqual('sftp', send_file(self.connection, self.local, self.remote))
+        self.assertEqual(open(self.local).read(), open(self.remote).read())
+
+    def test_it_should_not_send_an_unchanged_file(self):
+        self.write(self.local, self.lines)
+        self.write(self.remote, self.lines)
+        self.assertEqual('unchanged', send_file(self.connection, self.local, self.remote))
+        self.assertEqual(0, self.connection.sent)
+
+    def test_it_should_send_only_the_changed_chunks(self):
+        self.write(self.remote, self.lines)
+        self.lines.insert(100, '<http://example.com/new> <http://example.com/p> "new" .\n')
+        del self.lines[30000]
+        self.write(self.local, self.lines)
+        self.assertEqual('delta', send_file(self.connection, self.local, self.remote))
+        self.assertEqual(open(self.local).read(), open(self.remote).read())
+        self.assertTrue(self.connection.sent < os.path.getsize(self.local) / 4)
+        self.assertFalse(os.path.exists(self.remote + '.delta'))
+
+    def test_it_should_send_the_whole_file_when_most_of_it_changed(self):
+        self.write(self.remote, self.lines)
+        self.write(self.local, [line.replace('example', 'other') for line in self.lines])
+        self.assertEqual('sftp', send_file(self.connection, self.local, self.remote))
+        self.assertEqual(os.path.getsize(self.local), self.connection.sent)
+
+    def test_it_should_send_the_whole_file_over_an_empty_one(self):
+        self.write(self.local, self.lines)
+        self.write(self.remote, [])
+        self.assertEqual('sftp', send_file(self.connection, self.local, self.remote))
+        self.assertEqual(open(self.local).read(), open(self.remote).read())
+
+    def test_it_should_have_no_signatures_when_the_script_output_is_unreadable(self):
+        connection = Mock(**{'execute.return_value': ['SIGNATURES abc\n', 'not a signature\n']})
+        self.assertEqual((None, None), remote_signatures(connection, self.remote))
+
+    @patch('simple_virtuoso_migrate.transfer.DELTA_MIN_SIZE', 1024 ** 3)
+    def test_it_should_send_small_files_whole(self):
+        self.write(self.local, self.lines)
+        self.write(self.remote, self.lines)
+        self.assertEqual('sftp', send_file(self.connection, self.local, self.remote))
+
+    def test_it_should_cut_chunks_as_the_remote_script(self):
+        self.write(self.local, self.lines)
+        output = self.connection.execute("python -c %s %s" % (pipes.quote(SIGNATURES_SCRIPT), self.local))
+        sizes = [int(line.split()[2]) for line in output[1:]]
+        self.assertEqual([len(chunk) for chunk in chunks(open(self.local, 'rb'))], sizes)
+        self.assertTrue(len(sizes) > 1)
+
+if __name__ == "__main__":
+    unittest.main()
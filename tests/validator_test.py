@@ -0,0 +1,63 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from simple_virtuoso_migrate.validator import validate_file, validate_files
+
+VALID = """@prefix : <http://example.com/> .
+PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+
+# a comment
+:a foaf:name "a" ; :knows [ :p 1 ] .
+:b :text \"\"\"two
+lines\"\"\" .
+<http://example.com/c> <http://example.com/p> "c"@en .
+_:d <http://example.com/p> <relative> .
+"""
+
+
+class ValidatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content, opener=open):
+        path = os.path.join(self.directory, name)
+        f = opener(path, 'wb')
+        f.write(content)
+        f.close()
+        return path
+
+    def test_it_should_count_the_triples_of_a_valid_file(self):
+        self.assertEqual((6, []), validate_file(self.write('a.ttl', VALID)))
+
+    def test_it_should_report_every_error_with_its_line(self):
+        content = VALID + ':e :p "no end\n:f :p :g .\n:h :p .\n<http://example.com/i> <http://example.com/p> "i" .\n'
+        triples, errors = validate_file(self.write('a.ttl', content))
+        self.assertEqual(7, triples)
+        self.assertEqual([(10, 'newline found in string literal'), (12, 'objectList expected')], errors)
+
+    def test_it_should_report_a_missing_statement_end(self):
+        self.assertEqual([(11, "expected '.' or '}' or ']' at end of statement")], validate_file(self.write('a.ttl', VALID + ':e :p :f\n:g :p :h .\n'))[1])
+        self.assertEqual(1, len(validate_file(self.write('b.ttl', '<http://example.com/a> <http://example.com/p> <http://example.com/b>\n'))[1]))
+
+    def test_it_should_report_invalid_utf8(self):
+        errors = validate_file(self.write('a.nt', '<http://example.com/a> <http://example.com/p> "\xff" .\n'))[1]
+        self.assertEqual(1, len(errors))
+        self.assertEqual(1, errors[0][0])
+
+    def test_it_should_validate_compressed_files(self):
+        self.assertEqual((6, []), validate_file(self.write('a.ttl.gz', VALID, gzip.open)))
+
+    def test_it_should_validate_files_in_parallel(self):
+        files = [self.write('a.ttl', VALID), self.write('b.ttl', ':a :p .\n')]
+        results = validate_files(files)
+        self.assertEqual((6, []), results[files[0]])
+        self.assertEqual(1, len(results[files[1]][1]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
 import unittest
 import datetime
+import errno
 import os
 import re
+import shutil
+import tempfile
 
-from mock import patch, Mock, call, MagicMock
+from mock import patch, Mock, call, MagicMock, PropertyMock
 from rdflib.graph import ConjunctiveGraph
 
 from simple_virtuoso_migrate.config import Config
 from simple_virtuoso_migrate.main import Virtuoso
 from simple_virtuoso_migrate.core.exceptions import MigrationException
+from simple_virtuoso_migrate import staging
 from tests import create_file, delete_files, BaseTest
 
 
@@ -175,6 +179,335 @@ class VirtuosoTest(BaseTest):
 #        virtuoso = Virtuoso(self.config)
 #        self.assertRaisesWithMessage(Exception, 'could not connect to virtuoso: some error', virtuoso.connect)
 
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql')
+    def test_it_should_not_ask_the_server_when_it_is_created(self, run_isql_mock):
+        self.config.remove("virtuoso_dirs_allowed")
+        Virtuoso(self.config)
+        self.assertEqual(0, run_isql_mock.call_count)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('Connected\n\nVARCHAR\n____\n\n/var/lib/virtuoso/db|., /tmp|06.01.3127|1\n\n1 Rows. -- 1 msec.\n', ''))
+    def test_it_should_get_the_server_capabilities_only_once(self, run_isql_mock):
+        self.config.remove("virtuoso_dirs_allowed")
+        virtuoso = Virtuoso(self.config)
+        self.assertEqual({'server_root': '/var/lib/virtuoso/db', 'dirs_allowed': ['.', '/tmp'], 'version': '06.01.3127', 'bulk_loader': True}, virtuoso.get_capabilities())
+        self.assertEqual('/var/lib/virtuoso/db', virtuoso._virtuoso_dir)
+        self.assertEqual(1, run_isql_mock.call_count)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('Connected\n\n/var/lib/virtuoso/db||06.01.3127|0\n\n1 Rows. -- 1 msec.\n', ''))
+    def test_it_should_keep_the_server_capabilities_in_the_cache_dir(self, run_isql_mock):
+        cache_dir = os.path.abspath('virtuoso_test_cache')
+        self.config.remove("virtuoso_dirs_allowed")
+        self.config.put("cache_dir", cache_dir)
+        try:
+            self.assertEqual('/var/lib/virtuoso/db', Virtuoso(self.config)._virtuoso_dir)
+            capabilities = Virtuoso(self.config).get_capabilities()
+            self.assertEqual([], capabilities['dirs_allowed'])
+            self.assertEqual(False, capabilities['bulk_loader'])
+            self.assertEqual(1, run_isql_mock.call_count)
+            self.assertTrue(os.path.exists(os.path.join(cache_dir, 'servers', 'localhost_9999.json')))
+        finally:
+            shutil.rmtree(cache_dir)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql')
+    def test_it_should_use_virtuoso_dirs_allowed_without_asking_the_server(self, run_isql_mock):
+        self.assertEqual('/tmp', Virtuoso(self.config)._virtuoso_dir)
+        self.assertEqual(0, run_isql_mock.call_count)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Utils.write_temporary_file', return_value='filename.ttl')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('SPARQL INSERT INTO <test> {<a> <b> <c> . };\n\n1 Rows. -- 7 msec.\n', ''))
+    def test_it_should_report_the_latency_of_the_executed_statements(self, run_isql_mock, write_temporary_file_mock):
+        execution_log = Mock()
+        report = Virtuoso(self.config).execute_change("\nSPARQL INSERT INTO <test> {<a> <b> <c> . };", "sparql_down", execution_log=execution_log)
+        self.assertEqual({'INSERT': [7]}, report.by_type())
+        execution_log.assert_any_call("\n===== latency =====\n%s" % report.summary(), log_level_limit=1)
+        execution_log.assert_called_with(report.details())
+
+    @patch('simple_virtuoso_migrate.scheduler.time.sleep')
+    @patch('simple_virtuoso_migrate.scheduler.INITIAL_BATCH_SIZE', 2)
+    @patch('simple_virtuoso_migrate.virtuoso.Utils.write_temporary_file', return_value='filename.ttl')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('output', ''))
+    def test_it_should_execute_change_in_batches_when_there_is_a_target_latency(self, run_isql_mock, write_temporary_file_mock, sleep_mock):
+        self.config.put("target_latency", "10")
+        execution_log = Mock()
+        report = Virtuoso(self.config).execute_change("\nSPARQL 1;\nSPARQL 2;\nSPARQL 3;", "sparql_down", execution_log=execution_log)
+        self.assertEqual([call("set echo on;\nSPARQL 1;\nSPARQL 2;", "file_up"), call("set echo on;\nSPARQL 3;", "file_up")], write_temporary_file_mock.mock_calls)
+        self.assertEqual(2, run_isql_mock.call_count)
+        self.assertEqual([2, 1], [size for size, _ in report.batches])
+        execution_log.assert_called_with("- 3 statements executed in 2 batches")
+
+    @patch('simple_virtuoso_migrate.scheduler.time.sleep')
+    @patch('simple_virtuoso_migrate.scheduler.INITIAL_BATCH_SIZE', 1)
+    @patch('simple_virtuoso_migrate.virtuoso.Utils.write_temporary_file', return_value='filename.ttl')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('output', ''))
+    def test_it_should_not_cut_a_statement_with_a_multi_line_literal_between_batches(self, run_isql_mock, write_temporary_file_mock, sleep_mock):
+        self.config.put("target_latency", "10")
+        virtuoso = Virtuoso(self.config)
+        query_up, _ = virtuoso.get_sparql(current_ontology='', destination_ontology='<http://example.com/a> <http://example.com/p> "line1\\nline2" .')
+        report = virtuoso.execute_change(query_up, "sparql_down")
+        self.assertEqual([1, 1], [size for size, _ in report.batches])
+        self.assertTrue('"""line1\nline2"""' in write_temporary_file_mock.mock_calls[0][1][0])
+
+    @patch('simple_virtuoso_migrate.virtuoso.Utils.write_temporary_file', side_effect=lambda content, reference: reference)
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', side_effect=[('', ''), Exception('some error'), ('', '')])
+    def test_it_should_rollback_all_batches_when_a_batch_fails(self, run_isql_mock, write_temporary_file_mock):
+        self.config.put("target_latency", "10")
+        virtuoso = Virtuoso(self.config)
+        with patch('simple_virtuoso_migrate.scheduler.INITIAL_BATCH_SIZE', 1):
+            self.assertRaisesWithMessage(MigrationException, "\nerror executing migration statement: some error\n\nRollback done successfully!!!", virtuoso.execute_change, "\nSPARQL 1;\nSPARQL 2;\nSPARQL 3;", "sparql_down")
+        self.assertEqual([call('file_up', True), call('file_up', True), call('file_down', True)], run_isql_mock.mock_calls)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Utils.write_temporary_file', return_value='filename.ttl')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('', ''))
+    def test_it_should_execute_change_without_the_transaction_log_in_bulk_mode(self, run_isql_mock, write_temporary_file_mock):
+        self.config.put("bulk", True)
+        Virtuoso(self.config).execute_change("sparql_up", "sparql_down")
+        write_temporary_file_mock.assert_called_with("set echo on;\nlog_enable(2, 1);\nsparql_up", "file_up")
+        self.assertEqual([call('filename.ttl', True)], run_isql_mock.mock_calls)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', side_effect=[('checkpoint_interval(-1)\n\n60\n\n1 Rows. -- 1 msec.\n', ''), ('', '')])
+    def test_it_should_suspend_the_checkpoints_and_restore_them_after_a_single_one_in_bulk_mode(self, run_isql_mock):
+        self.config.put("bulk", True)
+        virtuoso = Virtuoso(self.config)
+        virtuoso.end_bulk(virtuoso.begin_bulk())
+        self.assertEqual([call('select checkpoint_interval(-1);'), call('checkpoint;\ncheckpoint_interval(60);')], run_isql_mock.mock_calls)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql')
+    def test_it_should_not_touch_the_checkpoints_out_of_bulk_mode(self, run_isql_mock):
+        virtuoso = Virtuoso(self.config)
+        virtuoso.end_bulk(virtuoso.begin_bulk())
+        self.assertEqual(0, run_isql_mock.call_count)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._copy_ttl_to_virtuoso_dir', side_effect=lambda ttl, source: os.path.basename(ttl))
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._remove_ttl_from_virtuoso_dir')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._count_triples', return_value=None)
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', side_effect=[('out1', ''), ('out2', '')])
+    def test_it_should_load_files_in_bulk_mode_without_the_transaction_log(self, run_isql_mock, _count_triples_mock, _remove_ttl_from_virtuoso_dir_mock, _copy_ttl_to_virtuoso_dir_mock):
+        self.config.put("bulk", True)
+        response = Virtuoso(self.config).upload_ttls_to_virtuoso(['/data/a.ttl', '/data/b.ttl'])
+        self.assertEqual(('out1', ''), response['/data/a.ttl'])
+        self.assertEqual(2, run_isql_mock.call_count)
+        self.assertTrue(run_isql_mock.mock_calls[0][1][0].startswith("log_enable(2, 1);\nset echo on;"))
+
+    @patch('simple_virtuoso_migrate.virtuoso.unstage')
+    @patch('simple_virtuoso_migrate.virtuoso.stage', return_value='rename')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('out', ''))
+    def test_it_should_stage_the_files_into_the_allowed_dir_and_report_how(self, run_isql_mock, stage_mock, unstage_mock):
+        execution_log = Mock()
+        Virtuoso(self.config).upload_ttls_to_virtuoso(['/data/a.ttl', '/data/b.ttl'], execution_log=execution_log)
+        a = os.path.join(os.path.realpath('/tmp'), Virtuoso._staged_name('/data/a.ttl'))
+        b = os.path.join(os.path.realpath('/tmp'), Virtuoso._staged_name('/data/b.ttl'))
+        self.assertEqual([call('/data/a.ttl', a), call('/data/b.ttl', b)], stage_mock.mock_calls)
+        self.assertEqual([call('/data/a.ttl', a, 'rename'), call('/data/b.ttl', b, 'rename')], unstage_mock.mock_calls)
+        execution_log.assert_any_call('- Files staged by rename: 2', 'GREEN', log_level_limit=1)
+        run_isql_mock.assert_any_call("set echo on;\n            DB.DBA.TTLP_MT_LOCAL_FILE('%s', '', 'test');" % a)
+
+    def test_it_should_move_a_renamed_file_back_when_its_load_fails(self):
+        def refuse(origin, destination):
+            raise OSError(errno.EXDEV, "refused")
+        directory = tempfile.mkdtemp()
+        server_dir = tempfile.mkdtemp()
+        try:
+            ttl = create_file(os.path.join(directory, 'data.ttl'), '<a> <b> .')
+            self.config.update("virtuoso_dirs_allowed", server_dir)
+            virtuoso = Virtuoso(self.config)
+            with patch('simple_virtuoso_migrate.staging.METHODS', [('hardlink', refuse), ('reflink', refuse)] + staging.METHODS[2:]), patch.object(virtuoso, '_run_isql', side_effect=Exception('syntax error')):
+                self.assertRaisesWithMessage(Exception, 'syntax error', virtuoso._upload_single_ttl_to_virtuoso, ttl)
+            self.assertEqual('<a> <b> .', open(ttl).read())
+            self.assertEqual([], os.listdir(server_dir))
+            self.assertEqual({}, virtuoso._staged)
+        finally:
+            shutil.rmtree(directory)
+            shutil.rmtree(server_dir)
+
+    def test_it_should_stage_files_with_the_same_name_from_different_directories_apart(self):
+        directory = tempfile.mkdtemp()
+        try:
+            virtuoso_dir = os.path.join(directory, 'virtuoso')
+            os.mkdir(virtuoso_dir)
+            for name in ['a', 'b']:
+                os.mkdir(os.path.join(directory, name))
+                create_file(os.path.join(directory, name, 'data.ttl'), '<http://example.com/%s> <http://example.com/p> "%s" .\n' % (name, name))
+            # a hardlink left by an interrupted load
+            os.link(os.path.join(directory, 'a', 'data.ttl'), os.path.join(virtuoso_dir, Virtuoso._staged_name(os.path.join(directory, 'a', 'data.ttl'))))
+            self.config.update("virtuoso_dirs_allowed", virtuoso_dir)
+            virtuoso = Virtuoso(self.config)
+            a = virtuoso._copy_ttl_to_virtuoso_dir(os.path.join(directory, 'a', 'data.ttl'))
+            b = virtuoso._copy_ttl_to_virtuoso_dir(os.path.join(directory, 'b', 'data.ttl'))
+            self.assertNotEqual(a, b)
+            self.assertTrue(a.endswith('-1-data.ttl'))
+            self.assertTrue('"a"' in open(os.path.join(virtuoso_dir, a)).read())
+            self.assertTrue('"b"' in open(os.path.join(virtuoso_dir, b)).read())
+            virtuoso._remove_ttl_from_virtuoso_dir(a)
+            self.assertFalse(os.path.exists(os.path.join(virtuoso_dir, a)))
+            self.assertTrue(os.path.exists(os.path.join(virtuoso_dir, b)))
+            virtuoso._remove_ttl_from_virtuoso_dir(b)
+            for name in ['a', 'b']:
+                self.assertTrue('"%s"' % name in open(os.path.join(directory, name, 'data.ttl')).read())
+        finally:
+            shutil.rmtree(directory)
+
+    @patch('simple_virtuoso_migrate.virtuoso.send_file', side_effect=['unchanged', 'delta'])
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._ssh_connection')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._virtuoso_dir', new_callable=PropertyMock, return_value='/remote')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('out', ''))
+    def test_it_should_send_only_what_changed_to_a_remote_host(self, run_isql_mock, _virtuoso_dir_mock, _ssh_connection_mock, send_file_mock):
+        self.config.update("database_host", "remote")
+        self.config.remove("virtuoso_dirs_allowed")
+        execution_log = Mock()
+        Virtuoso(self.config).upload_ttls_to_virtuoso(['/data/a.ttl', '/data/b.ttl'], execution_log=execution_log)
+        connection = _ssh_connection_mock.return_value
+        self.assertEqual([call(connection, '/data/a.ttl', '/remote/' + Virtuoso._staged_name('/data/a.ttl')), call(connection, '/data/b.ttl', '/remote/' + Virtuoso._staged_name('/data/b.ttl'))], send_file_mock.mock_calls)
+        execution_log.assert_any_call('- Files staged by delta: 1, unchanged: 1', 'GREEN', log_level_limit=1)
+
+    @patch('simple_virtuoso_migrate.virtuoso.send_file', return_value='sftp')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._ssh_connection')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._virtuoso_dir', new_callable=PropertyMock, return_value='/remote')
+    def test_it_should_send_files_with_the_same_name_to_different_remote_files(self, _virtuoso_dir_mock, _ssh_connection_mock, send_file_mock):
+        self.config.update("database_host", "remote")
+        self.config.remove("virtuoso_dirs_allowed")
+        virtuoso = Virtuoso(self.config)
+        names = [virtuoso._copy_ttl_to_virtuoso_dir('/data/a/data.ttl'),
+                 virtuoso._copy_ttl_to_virtuoso_dir('/data/b/data.ttl'),
+                 virtuoso._copy_ttl_to_virtuoso_dir('/tmp/chunks/0/data.0001.ttl', '/data/a/data.ttl'),
+                 virtuoso._copy_ttl_to_virtuoso_dir('/tmp/chunks/1/data.0001.ttl', '/data/b/data.ttl')]
+        self.assertEqual(4, len(set(names)))
+        self.assertTrue(names[2].endswith('-data.0001.ttl'))
+        # the next upload of a file goes to the same remote file
+        self.assertEqual(names[3], virtuoso._copy_ttl_to_virtuoso_dir('/tmp/other/1/data.0001.ttl', '/data/b/data.ttl'))
+        self.assertEqual(['/remote/' + name for name in names + names[3:]], [args[2] for _, args, _ in send_file_mock.mock_calls])
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._copy_ttl_to_virtuoso_dir', side_effect=lambda ttl, source: os.path.basename(ttl))
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._remove_ttl_from_virtuoso_dir')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', side_effect=[('callret-0\nINTEGER\n\n100\n\n1 Rows. -- 1 msec.\n', ''), ('out1', ''), ('\n\n130\n\n', ''), ('out2', ''), ('\n\n135\n\n', '')])
+    def test_it_should_count_the_triples_each_file_adds(self, run_isql_mock, _remove_ttl_from_virtuoso_dir_mock, _copy_ttl_to_virtuoso_dir_mock):
+        virtuoso = Virtuoso(self.config)
+        virtuoso.upload_ttls_to_virtuoso(['/data/a.ttl', '/data/b.ttl'])
+        self.assertEqual(call('SPARQL SELECT COUNT(*) FROM <test> WHERE { ?s ?p ?o };'), run_isql_mock.mock_calls[0])
+        self.assertEqual(30, virtuoso.load_report.files['/data/a.ttl']['triples'])
+        self.assertEqual(5, virtuoso.load_report.files['/data/b.ttl']['triples'])
+        self.assertEqual(35, virtuoso.load_report.triples)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('out', ''))
+    def test_it_should_not_remove_a_file_already_in_the_allowed_dir(self, run_isql_mock):
+        path = os.path.join(os.path.realpath('/tmp'), 'already_there.ttl')
+        create_file(path, 'content')
+        try:
+            Virtuoso(self.config).upload_ttls_to_virtuoso([path])
+            self.assertTrue(os.path.exists(path))
+        finally:
+            delete_files(path)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._count_triples', return_value=None)
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._remove_ttl_from_virtuoso_dir')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._copy_ttl_to_virtuoso_dir', side_effect=lambda ttl, source: os.path.basename(ttl))
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('out', ''))
+    def test_it_should_load_gzip_files_without_decompressing_them(self, run_isql_mock, _copy_ttl_to_virtuoso_dir_mock, _remove_ttl_from_virtuoso_dir_mock, _count_triples_mock):
+        Virtuoso(self.config).upload_ttls_to_virtuoso(['/data/dump.ttl.gz'])
+        _copy_ttl_to_virtuoso_dir_mock.assert_called_with('/data/dump.ttl.gz', '/data/dump.ttl.gz')
+        run_isql_mock.assert_called_with("set echo on;\n            DB.DBA.TTLP(gz_file_open('%s'), '', 'test');" % os.path.join('/tmp', 'dump.ttl.gz'))
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._count_triples', return_value=None)
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._remove_ttl_from_virtuoso_dir')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('out', ''))
+    def test_it_should_decompress_bzip2_files_before_loading_them(self, run_isql_mock, _remove_ttl_from_virtuoso_dir_mock, _count_triples_mock):
+        import bz2
+        f = bz2.BZ2File('dump.ttl.bz2', 'wb')
+        f.write('<http://example.com/a> <http://example.com/p> <http://example.com/b> .\n')
+        f.close()
+        uploaded = []
+        virtuoso = Virtuoso(self.config)
+        try:
+            with patch.object(virtuoso, '_copy_ttl_to_virtuoso_dir', side_effect=lambda path, source: uploaded.append((os.path.basename(path), open(path).read())) or os.path.basename(path)):
+                virtuoso.upload_ttls_to_virtuoso(['dump.ttl.bz2'])
+        finally:
+            delete_files('dump.ttl.bz2')
+        self.assertEqual([('dump.ttl', '<http://example.com/a> <http://example.com/p> <http://example.com/b> .\n')], uploaded)
+        run_isql_mock.assert_called_with("set echo on;\n            DB.DBA.TTLP_MT_LOCAL_FILE('%s', '', 'test');" % os.path.join('/tmp', 'dump.ttl'))
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._count_triples', return_value=None)
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._remove_ttl_from_virtuoso_dir')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._copy_ttl_to_virtuoso_dir', return_value='dump.ttl')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('out', ''))
+    def test_it_should_load_the_files_into_the_given_graph(self, run_isql_mock, _copy_ttl_to_virtuoso_dir_mock, _remove_ttl_from_virtuoso_dir_mock, _count_triples_mock):
+        virtuoso = Virtuoso(self.config)
+        staging_graph = virtuoso.staging_graph()
+        self.assertEqual('urn:simple-virtuoso-migrate:staging:test', staging_graph)
+        virtuoso.upload_ttls_to_virtuoso(['dump.ttl'], graph=staging_graph)
+        run_isql_mock.assert_called_with("set echo on;\n            DB.DBA.TTLP_MT_LOCAL_FILE('%s', '', '%s');" % (os.path.join('/tmp', 'dump.ttl'), staging_graph))
+        virtuoso.upload_ttls_to_virtuoso(['dump.ttl'])
+        run_isql_mock.assert_called_with("set echo on;\n            DB.DBA.TTLP_MT_LOCAL_FILE('%s', '', 'test');" % os.path.join('/tmp', 'dump.ttl'))
+
+    def test_it_should_load_the_files_of_different_graphs_in_parallel(self):
+        loads = []
+        counts = {'test': [10, 12], 'http://example.com/a': [0, 5]}
+        virtuoso = Virtuoso(self.config)
+        with patch.object(virtuoso, '_upload_single_ttl_to_virtuoso', side_effect=lambda ttl, graph, source: loads.append((ttl, graph)) or ('out', '')):
+            with patch.object(virtuoso, '_count_triples', side_effect=lambda graph: counts[graph].pop(0)):
+                create_file('a.ttl', '')
+                create_file('b.ttl', '')
+                try:
+                    response = virtuoso.upload_ttls_to_virtuoso(['a.ttl', 'b.ttl'], graphs={'a.ttl': 'http://example.com/a', 'b.ttl': None})
+                finally:
+                    delete_files('a.ttl')
+                    delete_files('b.ttl')
+        self.assertEqual(set([('a.ttl', 'http://example.com/a'), ('b.ttl', 'test')]), set(loads))
+        self.assertEqual({'a.ttl': ('out', ''), 'b.ttl': ('out', '')}, response)
+        self.assertEqual(7, virtuoso.load_report.triples)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('', ''))
+    def test_it_should_clear_a_graph(self, run_isql_mock):
+        Virtuoso(self.config).clear_graph('urn:simple-virtuoso-migrate:staging:test')
+        run_isql_mock.assert_called_with('SPARQL CLEAR GRAPH <urn:simple-virtuoso-migrate:staging:test>;')
+
+    def test_it_should_read_a_compressed_migration_file(self):
+        import gzip
+        f = gzip.open('migration.ttl.gz', 'wb')
+        f.write('<http://example.com/a> <http://example.com/p> <http://example.com/b> .\r\n')
+        f.close()
+        try:
+            content = Virtuoso(self.config).get_ontology_from_file('migration.ttl.gz')
+        finally:
+            delete_files('migration.ttl.gz')
+        self.assertEqual('<http://example.com/a> <http://example.com/p> <http://example.com/b> .\n', content)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._count_triples', return_value=None)
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._upload_single_ttl_to_virtuoso', side_effect=lambda ttl, graph, source: ('loaded %s' % os.path.basename(ttl), 'error' if ttl.endswith('0002.ttl') else ''))
+    def test_it_should_load_the_chunks_of_big_files_in_parallel(self, _upload_single_ttl_to_virtuoso_mock, _count_triples_mock):
+        self.config.put("load_parallel", "2")
+        self.config.put("load_chunk_size", "0.0001")
+        create_file('big.ttl', "".join(['<http://example.com/s%d> <http://example.com/p> "%s" .\n' % (i, 'x' * 20) for i in range(20)]))
+        create_file('small.ttl', '<http://example.com/s> <http://example.com/p> <http://example.com/o> .\n')
+        try:
+            response = Virtuoso(self.config).upload_ttls_to_virtuoso(['big.ttl', 'small.ttl'])
+        finally:
+            delete_files('big.ttl')
+            delete_files('small.ttl')
+        self.assertEqual(['big.ttl', 'small.ttl'], sorted(response.keys()))
+        self.assertEqual(('loaded small.ttl', ''), response['small.ttl'])
+        out, err = response['big.ttl']
+        self.assertTrue('loaded big.0001.ttl' in out.splitlines())
+        self.assertTrue('loaded big.0002.ttl' in out.splitlines())
+        self.assertEqual('error', err)
+        self.assertTrue(_upload_single_ttl_to_virtuoso_mock.call_count > 3)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._count_triples', return_value=None)
+    def test_it_should_keep_apart_the_chunks_of_files_with_the_same_name(self, _count_triples_mock):
+        self.config.put("load_parallel", "2")
+        self.config.put("load_chunk_size", "0.0001")
+        loaded = []
+        virtuoso = Virtuoso(self.config)
+        for name in ['a', 'b']:
+            os.mkdir(name)
+            create_file(os.path.join(name, 'data.ttl'), "".join(['<http://example.com/%s%d> <http://example.com/p> "%s" .\n' % (name, i, 'x' * 20) for i in range(20)]))
+        try:
+            with patch.object(virtuoso, '_upload_single_ttl_to_virtuoso', side_effect=lambda ttl, graph, source: loaded.append(open(ttl).read()) or ('', '')):
+                virtuoso.upload_ttls_to_virtuoso([os.path.join('a', 'data.ttl'), os.path.join('b', 'data.ttl')])
+        finally:
+            shutil.rmtree('a')
+            shutil.rmtree('b')
+        subjects = re.findall('<http://example.com/(\w+)>', "".join(loaded))
+        self.assertEqual(sorted(['a%d' % i for i in range(20)] + ['b%d' % i for i in range(20)]), sorted([s for s in subjects if s != 'p']))
+
     @patch('simple_virtuoso_migrate.virtuoso.Utils.write_temporary_file', return_value='filename.ttl')
     @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._run_isql', return_value=('', ''))
     def test_it_should_write_a_file_with_sparql_up_when_executing_change(self, run_isql_mock, write_temporary_file_mock):
@@ -254,8 +587,8 @@ class VirtuosoTest(BaseTest):
         virtuoso.execute_change("sparql_up", "sparql_down", execution_log)
         execution_log.assert_called_with("output")
 
-    @patch('simple_virtuoso_migrate.virtuoso.Graph.query')
-    @patch('simple_virtuoso_migrate.virtuoso.Graph.namespaces', return_value=['ns0'])
+    @patch('rdflib.graph.Graph.query')
+    @patch('rdflib.graph.Graph.namespaces', return_value=['ns0'])
     def test_it_should_get_current_version_none_when_database_is_empty(self, graph_mock, graph_query_mock):
         result_mock = MagicMock()
         result_mock.__iter__.return_value = []
@@ -268,8 +601,8 @@ class VirtuosoTest(BaseTest):
         self.assertIsNone(current)
         self.assertIsNone(source)
 
-    @patch('simple_virtuoso_migrate.virtuoso.Graph.query')
-    @patch('simple_virtuoso_migrate.virtuoso.Graph.namespaces', return_value=['ns0'])
+    @patch('rdflib.graph.Graph.query')
+    @patch('rdflib.graph.Graph.namespaces', return_value=['ns0'])
     def test_it_should_get_current_version_when_database_is_not_empty(self, graph_mock, graph_query_mock):
         result_mock = MagicMock()
         result_mock.__iter__.return_value = [('2', 'git'), ('1', 'file')]
@@ -282,6 +615,222 @@ class VirtuosoTest(BaseTest):
         self.assertEqual('2', current)
         self.assertEqual('git', source)
 
+    @patch('rdflib.graph.Graph')
+    def test_it_should_query_the_endpoint(self, graph_mock):
+        graph_mock.return_value = Mock(**{'query.return_value':iter([('row',)])})
+        rows = Virtuoso(self.config).query_endpoint('select')
+        self.assertEqual([('row',)], rows)
+        graph_mock.assert_called_with(store='SPARQLStore')
+        graph_mock.return_value.open.assert_called_with('endpoint', create=False)
+        graph_mock.return_value.query.assert_called_with('select')
+        self.assertEqual(1, graph_mock.return_value.close.call_count)
+
+    def test_it_should_parse_an_ontology_once_when_it_has_an_ontology_cache(self):
+        from simple_virtuoso_migrate.migrator import OntologyCache
+        virtuoso = Virtuoso(self.config)
+        virtuoso.ontology_cache = OntologyCache()
+        graph = virtuoso.parse_ontology(self.structure_01_ttl_content)
+        self.assertTrue(graph is virtuoso.parse_ontology(self.structure_01_ttl_content))
+        self.assertFalse(graph is Virtuoso(self.config).parse_ontology(self.structure_01_ttl_content))
+
+    def test_it_should_skolemize_the_blank_nodes_of_a_parsed_ontology(self):
+        from rdflib.term import BNode
+        graph = Virtuoso._parse_ontology('<http://example.com/a> <http://example.com/p> [ <http://example.com/p> 1 ] .', 'http://example.com/.well-known/genid/')
+        self.assertEqual(2, len(graph))
+        for triple in graph:
+            self.assertFalse(isinstance(triple[0], BNode) or isinstance(triple[2], BNode))
+
+    def test_it_should_skolemize_the_blank_nodes_of_an_already_parsed_graph(self):
+        from rdflib.graph import ConjunctiveGraph
+        from rdflib.term import BNode
+        parsed = ConjunctiveGraph()
+        parsed.parse(data='<http://example.com/a> <http://example.com/p> [ <http://example.com/p> 1 ] .', format='turtle')
+        graph = Virtuoso._parse_ontology(parsed, 'http://example.com/.well-known/genid/')
+        self.assertEqual(2, len(graph))
+        for triple in graph:
+            self.assertFalse(isinstance(triple[0], BNode) or isinstance(triple[2], BNode))
+        self.assertEqual(set(graph), set(Virtuoso._parse_ontology('<http://example.com/a> <http://example.com/p> [ <http://example.com/p> 1 ] .', 'http://example.com/.well-known/genid/')))
+
+    def test_it_should_upload_a_skolemized_copy_of_a_ttl_file(self):
+        self.config.update("database_graph", "http://example.com/graph")
+        self.config.put("skolemize", True)
+        virtuoso = Virtuoso(self.config)
+        ttl = os.path.abspath('skolem_test.ttl')
+        f = open(ttl, 'w')
+        f.write('<http://example.com/a> <http://example.com/p> [ <http://example.com/p> 1 ] .')
+        f.close()
+        uploaded = []
+        try:
+            with patch.object(virtuoso, '_copy_ttl_to_virtuoso_dir', side_effect=lambda path, source: uploaded.append(open(path).read()) or 'skolem_test.ttl'), patch.object(virtuoso, '_run_isql', return_value=('out', '')), patch.object(virtuoso, '_remove_ttl_from_virtuoso_dir'):
+                virtuoso._upload_single_ttl_to_virtuoso(ttl)
+        finally:
+            os.remove(ttl)
+        self.assertTrue('_:' not in uploaded[0])
+        self.assertTrue('<http://example.com/.well-known/genid/' in uploaded[0])
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso.query_endpoint')
+    def test_it_should_read_the_live_graph_page_by_page(self, query_endpoint_mock):
+        from rdflib.term import Literal, URIRef
+        triples = [(URIRef('http://example.com/s%d' % (i / 2)), URIRef('http://example.com/p'), URIRef('http://example.com/o%d' % i)) for i in range(5)]
+        rows = [(Literal(unicode(s)), s, p, o) for s, p, o in triples]
+        query_endpoint_mock.side_effect = [rows[0:4], rows[4:]]
+
+        graph = Virtuoso(self.config).get_live_graph(page_size=2)
+        self.assertEqual(set(triples), set(graph))
+        self.assertEqual(2, query_endpoint_mock.call_count)
+        first, last = [c[0][0] for c in query_endpoint_mock.call_args_list]
+        self.assertTrue('GRAPH <test> { ?s ?p ?o }  } ORDER BY ?k }\n  } LIMIT 2 }' in first)
+        self.assertTrue('GRAPH <test> { ?s ?p ?o } FILTER(STR(?s) > "http://example.com/s1") } ORDER BY ?k }' in last)
+        self.assertTrue('OFFSET' not in last)
+
+    @patch('simple_virtuoso_migrate.virtuoso.RESULT_MAX_ROWS', 4)
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso.query_endpoint')
+    def test_it_should_read_again_with_fewer_subjects_a_page_the_server_may_have_cut(self, query_endpoint_mock):
+        from rdflib.term import Literal, URIRef
+        triples = [(URIRef('http://example.com/s%d' % (i / 2)), URIRef('http://example.com/p'), URIRef('http://example.com/o%d' % i)) for i in range(6)]
+        rows = [(Literal(unicode(s)), s, p, o) for s, p, o in triples]
+        query_endpoint_mock.side_effect = [rows[0:4], rows[0:2], rows[2:4], rows[4:], []]
+
+        graph = Virtuoso(self.config).get_live_graph(page_size=2)
+        self.assertEqual(set(triples), set(graph))
+        limits = [re.search(r'LIMIT (\d+)', c[0][0]).group(1) for c in query_endpoint_mock.call_args_list]
+        self.assertEqual(['2', '1', '1', '1', '1'], limits)
+
+    @patch('simple_virtuoso_migrate.virtuoso.RESULT_MAX_ROWS', 2)
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso.query_endpoint')
+    def test_it_should_raise_error_if_the_triples_of_a_subject_may_have_been_cut(self, query_endpoint_mock):
+        from rdflib.term import Literal, URIRef
+        s, p = URIRef('http://example.com/s'), URIRef('http://example.com/p')
+        query_endpoint_mock.return_value = [(Literal(unicode(s)), s, p, URIRef('http://example.com/o%d' % i)) for i in range(2)]
+        self.assertRaisesWithMessage(MigrationException, "a subject has 2 triples or more, which the server may not return (see ResultSetMaxRows in virtuoso.ini)", Virtuoso(self.config).get_live_graph, 1)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso.query_endpoint', return_value=[])
+    def test_it_should_leave_out_the_triples_with_blank_nodes_of_the_live_graph_if_asked(self, query_endpoint_mock):
+        Virtuoso(self.config).get_live_graph(blank_nodes=False)
+        query = query_endpoint_mock.call_args[0][0]
+        self.assertTrue('GRAPH <test> { ?s ?p ?o } FILTER(isIRI(?s)) } ORDER BY ?k }' in query)
+        self.assertTrue('GRAPH <test> { ?s ?p ?o } FILTER(!isBLANK(?o))\n}' in query)
+
+    def test_it_should_export_the_graph_dumped_by_a_local_server(self):
+        allowed = tempfile.mkdtemp()
+        export_dir = os.path.join(allowed, 'backups')
+        self.config.update("virtuoso_dirs_allowed", allowed)
+        scripts = []
+
+        def dump(script, archive):
+            scripts.append(open(script).read())
+            prefix = re.search(r"SVM_DUMP_GRAPH\('test', '([^']*)', 104857600, 0\)", scripts[-1]).group(1)
+            for segment in (1, 2):
+                create_file("%s%06d.ttl" % (prefix, segment), "<a> <b> <c> .\n")
+            return ('callret\nINTEGER\n\n2\n\n1 Rows. -- 1 msec.\n', '')
+        try:
+            with patch.object(Virtuoso, '_run_isql', side_effect=dump):
+                files = Virtuoso(self.config).export_graph(export_dir)
+            self.assertEqual(2, len(files))
+            self.assertTrue(files[0].startswith(os.path.join(export_dir, 'export-')))
+            self.assertTrue(files[1].endswith('000002.ttl'))
+            self.assertEqual("<a> <b> <c> .\n", open(files[0]).read())
+            self.assertEqual(['backups'], os.listdir(allowed))
+            self.assertTrue('CREATE PROCEDURE DB.DBA.SVM_DUMP_GRAPH' in scripts[0])
+        finally:
+            shutil.rmtree(allowed)
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._dump_graph', return_value=['export-1-000001.ttl.gz', 'export-1-000002.ttl.gz'])
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._ssh_connection')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._virtuoso_dir', new_callable=PropertyMock, return_value='/remote')
+    def test_it_should_fetch_the_graph_dumped_by_a_remote_server_in_parallel(self, _virtuoso_dir_mock, _ssh_connection_mock, _dump_graph_mock):
+        class SFTPClient(object):
+            def __init__(self, gets):
+                self.gets = gets
+                self.closed = False
+
+            def get(self, remote_path, local_path):
+                self.gets.append((remote_path, local_path))
+
+            def close(self):
+                self.closed = True
+
+        class Connection(object):
+            # mocks don't record calls from several threads reliably
+            def __init__(self):
+                self.gets = []
+                self.commands = []
+                self.clients = []
+
+            def open_sftp(self):
+                self.clients.append(SFTPClient(self.gets))
+                return self.clients[-1]
+
+            def execute(self, command):
+                self.commands.append(command)
+
+        connection = _ssh_connection_mock.return_value = Connection()
+        self.config.update("database_host", "remote")
+        self.config.remove("virtuoso_dirs_allowed")
+        export_dir = tempfile.mkdtemp()
+        try:
+            files = Virtuoso(self.config).export_graph(export_dir, True)
+        finally:
+            shutil.rmtree(export_dir)
+        self.assertEqual([os.path.join(export_dir, 'export-1-000001.ttl.gz'), os.path.join(export_dir, 'export-1-000002.ttl.gz')], files)
+        self.assertEqual(True, _dump_graph_mock.call_args[0][1])
+        self.assertEqual([('/remote/export-1-000001.ttl.gz', files[0]), ('/remote/export-1-000002.ttl.gz', files[1])], sorted(connection.gets))
+        self.assertEqual(['rm -f /remote/export-1-000001.ttl.gz', 'rm -f /remote/export-1-000002.ttl.gz'], sorted(connection.commands))
+        # a channel for each get, none shared between threads
+        self.assertEqual([True, True], [client.closed for client in connection.clients])
+
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso.query_endpoint')
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso._dump_graph', side_effect=Exception('directory not allowed'))
+    def test_it_should_export_the_graph_from_the_endpoint_when_the_server_cant_dump_it(self, _dump_graph_mock, query_endpoint_mock):
+        import gzip
+        from rdflib.term import Literal, URIRef
+        triples = [(URIRef('http://example.com/s%d' % i), URIRef('http://example.com/p'), Literal(u'\xe9%d' % i)) for i in range(3)]
+        query_endpoint_mock.side_effect = [triples[0:2], triples[2:], []]
+        execution_log = Mock()
+        export_dir = tempfile.mkdtemp()
+        try:
+            files = Virtuoso(self.config).export_graph(export_dir, True, execution_log=execution_log)
+            self.assertEqual(1, len(files))
+            self.assertTrue(files[0].endswith('-000001.nt.gz'))
+            graph = ConjunctiveGraph()
+            graph.parse(data=gzip.open(files[0]).read(), format='turtle')
+            self.assertEqual(set(triples), set(graph))
+        finally:
+            shutil.rmtree(export_dir)
+        # paged outside the sorted sub-select
+        self.assertTrue(re.search(r'ORDER BY \?s \}\s*\} LIMIT 1000 OFFSET 2000 \}', query_endpoint_mock.call_args[0][0]))
+        execution_log.assert_called_with('- The server could not dump the graph (directory not allowed), reading it from the endpoint', 'RED', log_level_limit=1)
+
+    @patch('simple_virtuoso_migrate.virtuoso.RESULT_MAX_ROWS', 2)
+    @patch('simple_virtuoso_migrate.virtuoso.Virtuoso.query_endpoint')
+    def test_it_should_export_again_with_fewer_subjects_a_page_the_server_may_have_cut(self, query_endpoint_mock):
+        from rdflib.term import URIRef
+        triples = [(URIRef('http://example.com/s%d' % i), URIRef('http://example.com/p'), URIRef('http://example.com/o')) for i in range(3)]
+        query_endpoint_mock.side_effect = [triples[0:2], triples[0:1], triples[1:2], triples[2:], []]
+        export_dir = tempfile.mkdtemp()
+        try:
+            files = Virtuoso(self.config)._construct_graph(export_dir, 'export-', False, page_size=2)
+            graph = ConjunctiveGraph()
+            graph.parse(files[0], format='nt')
+            self.assertEqual(set(triples), set(graph))
+        finally:
+            shutil.rmtree(export_dir)
+        offsets = [re.search(r'LIMIT (\d+) OFFSET (\d+)', c[0][0]).groups() for c in query_endpoint_mock.call_args_list]
+        self.assertEqual([('2', '0'), ('1', '0'), ('1', '1'), ('1', '2'), ('1', '3')], offsets)
+
+    def test_it_should_get_sparql_statments_from_a_live_graph(self):
+        live_graph = ConjunctiveGraph()
+        live_graph.parse(data=self.structure_02_ttl_content, format='turtle')
+        query_up, _ = Virtuoso(self.config).get_sparql(current_ontology=live_graph, destination_ontology=self.structure_02_ttl_content)
+        self.assertEqual(2, len(query_up.splitlines()))
+
+    def test_it_should_not_get_sparql_statments_for_literals_virtuoso_stores_the_same_way(self):
+        current = '<http://example.com/a> <http://example.com/p> "01"^^<http://www.w3.org/2001/XMLSchema#int>, "true"^^<http://www.w3.org/2001/XMLSchema#boolean>, "x"^^<http://www.w3.org/2001/XMLSchema#string>, "y"@EN, "1.50"^^<http://www.w3.org/2001/XMLSchema#decimal>, "2010-01-01T02:00:00+02:00"^^<http://www.w3.org/2001/XMLSchema#dateTime> .'
+        destination = '<http://example.com/a> <http://example.com/p> "1"^^<http://www.w3.org/2001/XMLSchema#integer>, "1"^^<http://www.w3.org/2001/XMLSchema#integer>, "x", "y"@en, "1.5"^^<http://www.w3.org/2001/XMLSchema#decimal>, "2010-01-01T00:00:00Z"^^<http://www.w3.org/2001/XMLSchema#dateTime> .'
+        query_up, query_down = Virtuoso(self.config).get_sparql(current_ontology=current, destination_ontology=destination)
+        self.assertEqual(2, len(query_up.splitlines()))
+        self.assertEqual(2, len(query_down.splitlines()))
+
     def test_it_should_get_sparql_statments_from_given_ontology(self):
 
         query_up, query_down = Virtuoso(self.config).get_sparql(destination_ontology=self.data_ttl_content, insert="data.ttl")
@@ -289,6 +838,19 @@ class VirtuosoTest(BaseTest):
         self.assertEqual('\nSPARQL INSERT INTO <http://example.com/> { [] owl:versionInfo "None"; <http://example.com/endpoint> "endpoint"; <http://example.com/usuario> "user"; <http://example.com/ambiente> "localhost"; <http://example.com/produto> "test"; <http://example.com/commited> "%s"^^xsd:dateTime; <http://example.com/origen> "None"; <http://example.com/inserted> "data.ttl".};' % datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), query_up)
         self.assertEqual('\nSPARQL DELETE FROM <http://example.com/> {?s ?p ?o} WHERE {?s owl:versionInfo "None"; <http://example.com/endpoint> "endpoint"; <http://example.com/usuario> "user"; <http://example.com/ambiente> "localhost"; <http://example.com/produto> "test"; <http://example.com/commited> "%s"^^xsd:dateTime; <http://example.com/origen> "None"; <http://example.com/inserted> "data.ttl"; ?p ?o.};'  % datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), query_down)
 
+    def test_it_should_move_the_staging_graph_to_the_graph_when_replacing(self):
+        query_up, query_down = Virtuoso(self.config).get_sparql(destination_ontology=self.data_ttl_content, insert="data.ttl", staging_graph='urn:simple-virtuoso-migrate:staging:test')
+        self.assertTrue(query_up.startswith('\nSPARQL MOVE <urn:simple-virtuoso-migrate:staging:test> TO <test>;\nSPARQL INSERT INTO <http://example.com/> {'))
+        self.assertTrue('<http://example.com/origen> "None"; <http://example.com/mode> "replace"; <http://example.com/inserted> "data.ttl".};' in query_up)
+        self.assertTrue('<http://example.com/mode> "replace"; <http://example.com/inserted> "data.ttl"; ?p ?o.};' in query_down)
+        self.assertFalse('MOVE' in query_down)
+
+    def test_it_should_record_a_load_into_another_graph_under_that_graph(self):
+        query_up, query_down = Virtuoso(self.config).get_sparql(destination_ontology=self.data_ttl_content, insert="data.ttl", staging_graph='urn:simple-virtuoso-migrate:staging:http://example.com/a', graph='http://example.com/a')
+        self.assertTrue(query_up.startswith('\nSPARQL MOVE <urn:simple-virtuoso-migrate:staging:http://example.com/a> TO <http://example.com/a>;'))
+        self.assertTrue('<http://example.com/produto> "http://example.com/a";' in query_up)
+        self.assertTrue('<http://example.com/produto> "http://example.com/a";' in query_down)
+
     def test_it_should_get_sparql_statments_from_given_ontology_when_breaking_a_blank_node_in_two(self):
         query_up, query_down = Virtuoso(self.config).get_sparql(current_ontology=self.structure_02_ttl_content,
                                                                 destination_ontology=self.structure_03_ttl_content)
@@ -438,7 +1000,7 @@ class VirtuosoTest(BaseTest):
         self.config.update('database_migrations_dir', '.')
         self.assertRaisesWithMessage(Exception, 'migration file does not exist (./ontology.ttl)', Virtuoso(self.config).get_ontology_by_version, '01')
 
-    @patch('simple_virtuoso_migrate.virtuoso.Git')
+    @patch('git.Git')
     def test_it_should_return_git_content(self, git_mock):
         execute_mock = Mock(**{'return_value':'content'})
         git_mock.return_value = Mock(**{'execute':execute_mock})
@@ -448,6 +1010,71 @@ class VirtuosoTest(BaseTest):
         git_mock.assert_called_with('.')
         execute_mock.assert_called_with(['git', 'show', 'version:test.ttl'])
 
+    @patch('git.Git')
+    def test_it_should_list_ontology_modules_changed_between_two_versions(self, git_mock):
+        execute_mock = Mock(**{'return_value':'test.ttl'})
+        git_mock.return_value = Mock(**{'execute':execute_mock})
+
+        modules = Virtuoso(self.config).get_changed_ontology_modules('01', '02')
+        self.assertEqual(['test.ttl'], modules)
+        execute_mock.assert_called_with(['git', 'diff', '--name-only', '--relative', '01', '02', '--', 'test.ttl'])
+
+    def test_it_should_list_changed_modules_relative_to_a_migrations_dir_below_the_repository_root(self):
+        from git import Git
+        repository = tempfile.mkdtemp()
+        try:
+            migrations_dir = os.path.join(repository, 'migrations')
+            os.makedirs(os.path.join(migrations_dir, 'onto'))
+            git = Git(repository)
+            git.execute(['git', 'init', '-q'])
+            for tag, content in [('01', '<a> <b> <c> .'), ('02', '<a> <b> <d> .')]:
+                create_file(os.path.join(migrations_dir, 'onto', 'a.ttl'), content)
+                git.execute(['git', 'add', '.'])
+                git.execute(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', tag])
+                git.execute(['git', 'tag', tag])
+            self.config.update('database_migrations_dir', migrations_dir)
+            self.config.update('database_ontology', 'onto')
+            virtuoso = Virtuoso(self.config)
+            self.assertEqual(['onto/a.ttl'], virtuoso.get_changed_ontology_modules('01', '02'))
+            self.assertEqual(['onto/a.ttl'], virtuoso.get_ontology_modules('02'))
+        finally:
+            shutil.rmtree(repository)
+
+    @patch('git.Git')
+    def test_it_should_not_read_any_module_when_nothing_changed(self, git_mock):
+        execute_mock = Mock(**{'return_value':''})
+        git_mock.return_value = Mock(**{'execute':execute_mock})
+
+        virtuoso = Virtuoso(self.config)
+        self.assertEqual([], virtuoso.get_changed_ontology_modules('01', '02'))
+        self.assertEqual([], virtuoso.get_ontology_by_version('02', []))
+        self.assertEqual(1, execute_mock.call_count)
+
+    @patch('git.Git')
+    def test_it_should_read_only_the_given_modules_of_an_ontology_directory(self, git_mock):
+        def execute_side_effect(cmd):
+            if cmd[1] == 'ls-tree':
+                return 'onto/a.ttl\nonto/b.ttl\nonto/README'
+            return 'content of %s' % cmd[2]
+        execute_mock = Mock(**{'side_effect':execute_side_effect})
+        git_mock.return_value = Mock(**{'execute':execute_mock})
+        os.mkdir('onto')
+        try:
+            self.config.update('database_ontology', 'onto')
+            virtuoso = Virtuoso(self.config)
+            self.assertEqual(['content of 02:onto/a.ttl', 'content of 02:onto/b.ttl'], virtuoso.get_ontology_by_version('02'))
+            self.assertEqual(['content of 02:onto/b.ttl'], virtuoso.get_ontology_by_version('02', ['onto/b.ttl', 'onto/deleted.ttl']))
+            execute_mock.assert_any_call(['git', 'ls-tree', '-r', '--name-only', '02', '--', 'onto'])
+        finally:
+            os.rmdir('onto')
+
+    def test_it_should_get_sparql_statments_from_ontology_modules(self):
+        query_up, _ = Virtuoso(self.config).get_sparql(current_ontology=[self.structure_01_ttl_content], destination_ontology=[self.structure_01_ttl_content, self.data_ttl_content], origen='git', destination_version='02')
+
+        lines_up = query_up.strip(' \t\n\r').splitlines()
+        self.assertEqual(2, len(lines_up))
+        self.assertEqual('SPARQL INSERT INTO <test> {<http://example.com/John> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://example.com/Person> . };', lines_up[0])
+
     def test_it_should_print_error_message_with_correct_encoding(self):
         graph = """
         :is_part_of rdf:type owl:ObjectProperty ;